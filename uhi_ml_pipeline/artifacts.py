@@ -0,0 +1,50 @@
+"""Artifacts module: Columnar storage for the grid, features and model matrix
+
+The grid and features are stored as GeoParquet and the model matrix as an
+uncompressed Arrow/Feather file, so readers can project columns and
+memory-map the data instead of parsing CSV/GeoJSON text. geopandas and
+pyarrow are imported on first read/write, so modules that only need
+artifact paths stay cheap to import.
+"""
+
+import os
+
+
+def resolution_path(path, resolution=None):
+    """Artifact path for a pyramid level, e.g. features.parquet -> features_1km.parquet
+
+    ``resolution=None`` returns the path unchanged (single-resolution runs).
+    """
+    if resolution is None:
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}_{resolution}{ext}"
+
+
+def write_geoparquet(gdf, path):
+    """Write a GeoDataFrame as GeoParquet"""
+    gdf.to_parquet(path, index=False)
+
+
+def read_geoparquet(path, columns=None):
+    """Read a GeoParquet file, optionally only the given columns
+
+    The geometry column is always included.
+    """
+    import geopandas as gpd
+    if columns is not None:
+        columns = list(dict.fromkeys(list(columns) + ['geometry']))
+    return gpd.read_parquet(path, columns=columns)
+
+
+def write_model_matrix(df, path):
+    """Write a plain DataFrame as uncompressed Feather (memory-mappable)"""
+    import pyarrow.feather as feather
+    feather.write_feather(df.reset_index(drop=True), path, compression='uncompressed')
+
+
+def read_model_matrix(path, columns=None):
+    """Read selected columns of a Feather file through a memory map"""
+    import pyarrow.feather as feather
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""Benchmark: every pipeline phase on a synthetic city at 1k / 100k / 1M cells
+
+For each scale a synthetic city is generated over the Bengaluru bounding
+box: LST/NDVI rasters from create_sample_data (urban heat core and hot
+spots), building footprints and a road network (GeoPackages, read through
+the local OSM path). Each phase is timed and its peak resident memory
+sampled: create_grid, extract_raster_features (LST and NDVI), buildings,
+roads, train_models, make_predictions and both map renderers.
+
+Results are written as JSON. With --baseline, they are compared against
+an earlier results file and phases that got slower or use more memory
+beyond the tolerance are flagged (exit status 1).
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime, timezone
+
+# Make the pipeline modules importable when run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import geopandas as gpd
+import shapely
+from shapely.geometry import box
+from sklearn.model_selection import train_test_split
+
+from config import (
+    BENGALURU_BOUNDS,
+    MODEL_FEATURES,
+    TARGET_COLUMN,
+    ROAD_CLASSES,
+    ROAD_LENGTH_BY_CLASS,
+    RANDOM_STATE,
+    TEST_SIZE,
+    OUTPUT_DIR,
+    N_WORKERS
+)
+from create_sample_data import create_sample_data
+from data_preparation import create_grid
+from feature_extraction import extract_raster_features, add_derived_features
+from osm_features import building_density_from_extract, road_density_from_network
+from model_training import train_models
+from visualization import make_predictions, create_static_heatmap, create_interactive_map
+from instrumentation import PeakMemory
+
+
+SCALES = {'1k': 1_000, '100k': 100_000, '1M': 1_000_000}
+
+PHASES = [
+    'create_grid', 'extract_raster_features', 'buildings', 'roads',
+    'train_models', 'make_predictions', 'static_heatmap', 'interactive_map'
+]
+
+RESULTS_JSON = os.path.join(OUTPUT_DIR, 'bench_city.json')
+
+
+def parse_scale(value):
+    """Cell count of a scale name ('100k') or a plain number"""
+    if value in SCALES:
+        return SCALES[value]
+    return int(float(value))
+
+
+def city_size(n_cells, raster_size=None, n_buildings=None, n_roads=None):
+    """Cell size and synthetic input sizes for a city of about ``n_cells`` cells"""
+    width = BENGALURU_BOUNDS['east'] - BENGALURU_BOUNDS['west']
+    height = BENGALURU_BOUNDS['north'] - BENGALURU_BOUNDS['south']
+    return {
+        'cell_size': float(np.sqrt(width * height / n_cells)),
+        # About 3x3 pixels per cell, at least the sample data's 300x300
+        'raster_size': raster_size or max(300, int(3 * np.sqrt(n_cells))),
+        'buildings': n_buildings if n_buildings is not None else n_cells,
+        'roads': n_roads if n_roads is not None else max(100, n_cells // 4)
+    }
+
+
+def _city_points(rng, n, spread=0.25):
+    """Points clustered around the city centre (and some spread uniformly)"""
+    west, south = BENGALURU_BOUNDS['west'], BENGALURU_BOUNDS['south']
+    east, north = BENGALURU_BOUNDS['east'], BENGALURU_BOUNDS['north']
+    n_core = int(n * 0.7)
+    x = np.concatenate([
+        rng.normal((west + east) / 2, spread * (east - west), n_core),
+        rng.uniform(west, east, n - n_core)
+    ])
+    y = np.concatenate([
+        rng.normal((south + north) / 2, spread * (north - south), n_core),
+        rng.uniform(south, north, n - n_core)
+    ])
+    return np.clip(x, west, east), np.clip(y, south, north)
+
+
+def write_city_buildings(path, n, seed=1):
+    """Rectangular footprints of 8-45 m, denser towards the centre"""
+    rng = np.random.default_rng(seed)
+    x, y = _city_points(rng, n)
+    half_w = rng.uniform(4e-5, 2e-4, n)
+    half_h = rng.uniform(4e-5, 2e-4, n)
+    footprints = gpd.GeoDataFrame(
+        {'building': np.full(n, 'yes')},
+        geometry=shapely.box(x - half_w, y - half_h, x + half_w, y + half_h),
+        crs='EPSG:4326'
+    )
+    footprints.to_file(path, driver='GPKG', engine='pyogrio')
+
+
+def write_city_roads(path, n, seed=2, vertices=4):
+    """Random-walk road polylines with a mix of highway classes"""
+    rng = np.random.default_rng(seed)
+    x, y = _city_points(rng, n)
+    steps = rng.normal(0, 0.003, (n, vertices - 1, 2))
+    coords = np.concatenate([np.stack([x, y], axis=1)[:, None, :], steps], axis=1).cumsum(axis=1)
+    classes = list(ROAD_CLASSES) + ['service']
+    weights = np.array([1, 2, 4, 6, 8, 40, 10], dtype=float)[:len(classes)]
+    roads = gpd.GeoDataFrame(
+        {'highway': rng.choice(classes, n, p=weights / weights.sum())},
+        geometry=shapely.linestrings(coords),
+        crs='EPSG:4326'
+    )
+    roads.to_file(path, driver='GPKG', engine='pyogrio')
+
+
+def run_scale(name, n_cells, sizes, workdir, phases, verbose=False):
+    """Generate one synthetic city and run the selected phases on it"""
+    print(f"\nScale {name}: cell size {sizes['cell_size']:.6f}°, raster "
+          f"{sizes['raster_size']}x{sizes['raster_size']}, {sizes['buildings']} buildings, "
+          f"{sizes['roads']} roads")
+    paths = {k: os.path.join(workdir, f) for k, f in (
+        ('lst', 'lst.tif'), ('ndvi', 'ndvi.tif'), ('buildings', 'buildings.gpkg'),
+        ('roads', 'roads.gpkg'), ('png', 'heatmap.png'), ('html', 'map.html')
+    )}
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+        create_sample_data(paths['lst'], paths['ndvi'], sizes['raster_size'], n_hotspots=20)
+    write_city_buildings(paths['buildings'], sizes['buildings'])
+    write_city_roads(paths['roads'], sizes['roads'])
+    print(f"  Synthetic inputs generated in {time.perf_counter() - start:.1f}s")
+
+    boundary = gpd.GeoDataFrame(
+        {'geometry': [box(
+            BENGALURU_BOUNDS['west'], BENGALURU_BOUNDS['south'],
+            BENGALURU_BOUNDS['east'], BENGALURU_BOUNDS['north']
+        )]},
+        crs='EPSG:4326'
+    )
+    state = {}
+
+    def fit():
+        data = state['grid'].dropna(subset=MODEL_FEATURES + [TARGET_COLUMN])
+        X_train, X_test, y_train, y_test = train_test_split(
+            data[MODEL_FEATURES], data[TARGET_COLUMN],
+            test_size=TEST_SIZE, random_state=RANDOM_STATE
+        )
+        results, models = train_models(X_train, X_test, y_train, y_test, MODEL_FEATURES)
+        state['model'] = models[results.loc[results['Test_R2'].idxmax(), 'Model']]
+
+    def add_columns(stats):
+        for col, values in stats.items():
+            state['grid'][col] = values
+
+    steps = {
+        'create_grid': lambda: state.update(grid=create_grid(boundary, sizes['cell_size'])),
+        'extract_raster_features': lambda: [
+            extract_raster_features(state['grid'], paths[band], band.upper())
+            for band in ('lst', 'ndvi')
+        ],
+        'buildings': lambda: add_columns(
+            building_density_from_extract(state['grid'], paths['buildings'], n_workers=N_WORKERS)
+        ),
+        'roads': lambda: add_columns(
+            road_density_from_network(state['grid'], paths['roads'], by_class=ROAD_LENGTH_BY_CLASS)
+        ),
+        'train_models': fit,
+        'make_predictions': lambda: make_predictions(state['grid'], state['model']),
+        'static_heatmap': lambda: create_static_heatmap(state['grid'], paths['png']),
+        'interactive_map': lambda: create_interactive_map(state['grid'], paths['html'])
+    }
+
+    results = []
+    for phase in PHASES:
+        if phase not in phases:
+            continue
+        if phase == 'train_models':
+            add_derived_features(state['grid'])
+        output = io.StringIO()
+        with contextlib.redirect_stdout(sys.stdout if verbose else output):
+            with PeakMemory() as memory:
+                start = time.perf_counter()
+                steps[phase]()
+                seconds = time.perf_counter() - start
+        rows = len(state['grid'])
+        result = {
+            'scale': name,
+            'cells': rows,
+            'phase': phase,
+            'seconds': seconds,
+            'rows_per_second': rows / seconds if seconds > 0 else None,
+            'peak_rss_mb': memory.peak / 1e6,
+            'phase_memory_mb': (memory.peak - memory.start) / 1e6
+        }
+        results.append(result)
+        print(f"  {phase:<24} {seconds:>9.3f} s {result['rows_per_second'] or 0:>12.0f} rows/s "
+              f"{result['peak_rss_mb']:>9.1f} MB peak {result['phase_memory_mb']:>+9.1f} MB")
+    return results
+
+
+def environment():
+    """Machine and code version the results were measured on"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def compare(results, baseline, tolerance=0.25, min_seconds=0.1, min_mb=20.0):
+    """Phases slower or larger than the baseline beyond the tolerance
+
+    A phase regresses when its time (or its phase memory) grows by more
+    than ``tolerance`` (relative) and by more than the absolute noise floor
+    ``min_seconds`` (``min_mb``). Returns a list of regression messages.
+    """
+    reference = {(r['scale'], r['phase']): r for r in baseline['results']}
+    regressions = []
+    print(f"\n{'scale':<6} {'phase':<24} {'time':>9} {'baseline':>9} {'change':>8} "
+          f"{'memory':>9} {'baseline':>9}")
+    for r in results['results']:
+        base = reference.get((r['scale'], r['phase']))
+        if base is None:
+            continue
+        change = r['seconds'] / base['seconds'] - 1 if base['seconds'] > 0 else 0.0
+        flags = []
+        if (r['seconds'] > base['seconds'] * (1 + tolerance)
+                and r['seconds'] - base['seconds'] > min_seconds):
+            flags.append('time')
+        if (r['phase_memory_mb'] > max(base['phase_memory_mb'], 0) * (1 + tolerance)
+                and r['phase_memory_mb'] - base['phase_memory_mb'] > min_mb):
+            flags.append('memory')
+        print(f"{r['scale']:<6} {r['phase']:<24} {r['seconds']:>8.3f}s {base['seconds']:>8.3f}s "
+              f"{change:>+8.0%} {r['phase_memory_mb']:>8.1f}M {base['phase_memory_mb']:>8.1f}M"
+              f"{'  REGRESSION (' + ', '.join(flags) + ')' if flags else ''}")
+        for flag in flags:
+            regressions.append(f"{r['scale']} {r['phase']}: {flag}")
+
+    if baseline.get('environment', {}).get('cpu_count') != results['environment']['cpu_count']:
+        print("  Note: baseline was measured with a different CPU count")
+    return regressions
+
+
+def run_benchmark(scales, phases=PHASES, raster_size=None, n_buildings=None, n_roads=None,
+                  verbose=False):
+    """Run the selected phases at every scale; returns the results document"""
+    print("=" * 60)
+    print("BENCHMARK: synthetic city, all pipeline phases")
+    print("=" * 60)
+
+    results = []
+    for name in scales:
+        n_cells = parse_scale(name)
+        sizes = city_size(n_cells, raster_size, n_buildings, n_roads)
+        workdir = tempfile.mkdtemp(prefix='bench_city_')
+        try:
+            results.extend(run_scale(name, n_cells, sizes, workdir, phases, verbose))
+        finally:
+            shutil.rmtree(workdir)
+    return {'environment': environment(), 'results': results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', nargs='+', default=list(SCALES),
+                        help='Grid sizes: 1k, 100k, 1M or a cell count')
+    parser.add_argument('--phases', nargs='+', default=PHASES, choices=PHASES,
+                        help='Phases to run (later phases need the earlier ones)')
+    parser.add_argument('--raster-size', type=int, help='Raster width/height in pixels')
+    parser.add_argument('--buildings', type=int, help='Building footprints per city')
+    parser.add_argument('--roads', type=int, help='Road polylines per city')
+    parser.add_argument('--output', default=RESULTS_JSON, help='Results JSON file')
+    parser.add_argument('--baseline', help='Results JSON to compare against')
+    parser.add_argument('--results', help='Compare this results JSON instead of running')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Relative slowdown / memory growth flagged as regression')
+    parser.add_argument('--min-seconds', type=float, default=0.1,
+                        help='Ignore time changes below this many seconds')
+    parser.add_argument('--min-mb', type=float, default=20.0,
+                        help='Ignore memory changes below this many MB')
+    parser.add_argument('--verbose', action='store_true', help='Show the phases\' own output')
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results) as f:
+            results = json.load(f)
+    else:
+        results = run_benchmark(args.scales, args.phases, args.raster_size,
+                                args.buildings, args.roads, args.verbose)
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_seconds, args.min_mb)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): " + '; '.join(regressions))
+            sys.exit(1)
+        print("\n✓ No regressions against the baseline")
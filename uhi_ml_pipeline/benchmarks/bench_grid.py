@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Benchmark: grid creation at 1km, 250m and 100m resolutions"""
+
+import sys
+import os
+import time
+import argparse
+
+# Make the pipeline modules importable when run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geopandas as gpd
+from shapely.geometry import box, Point
+
+from config import BENGALURU_BOUNDS
+from data_preparation import create_grid
+
+# Cell sizes in degrees (1km ≈ 0.009° at Bengaluru's latitude)
+RESOLUTIONS = {
+    '1km': 0.009,
+    '250m': 0.00225,
+    '100m': 0.0009
+}
+
+
+def make_boundaries():
+    """Bounding box plus a city-like polygon with many vertices"""
+    west, south = BENGALURU_BOUNDS['west'], BENGALURU_BOUNDS['south']
+    east, north = BENGALURU_BOUNDS['east'], BENGALURU_BOUNDS['north']
+    bbox_polygon = box(west, south, east, north)
+    
+    # Disc with ~1000 vertices stands in for a detailed administrative boundary
+    city_polygon = Point((west + east) / 2, (south + north) / 2).buffer(
+        (east - west) / 2, quad_segs=256
+    )
+    
+    return {
+        'bbox': gpd.GeoDataFrame({'geometry': [bbox_polygon]}, crs='EPSG:4326'),
+        'polygon': gpd.GeoDataFrame({'geometry': [city_polygon]}, crs='EPSG:4326')
+    }
+
+
+def run_benchmark(repeat=3):
+    """Time create_grid for every boundary/resolution combination"""
+    print("=" * 60)
+    print("BENCHMARK: create_grid")
+    print("=" * 60)
+    print(f"{'boundary':<10} {'resolution':<10} {'cells':>10} {'best (s)':>10}")
+    
+    for boundary_name, boundary in make_boundaries().items():
+        for res_name, cell_size in RESOLUTIONS.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                grid = create_grid(boundary, cell_size=cell_size)
+                timings.append(time.perf_counter() - start)
+            print(f"{boundary_name:<10} {res_name:<10} {len(grid):>10} {min(timings):>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per configuration')
+    args = parser.parse_args()
+    run_benchmark(repeat=args.repeat)
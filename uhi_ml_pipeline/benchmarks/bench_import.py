@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Benchmark: startup (import) time of every pipeline subcommand
+
+Each measurement runs in a fresh interpreter: it imports main_pipeline and
+the phase modules of one subcommand (the modules the subcommand's phases
+import when they run), and reports the wall time and which heavy
+libraries got loaded. 'eager' imports every phase module plus the heavy
+libraries they used to import at module level, i.e. the startup cost of
+the pipeline before imports were made lazy. 'cli' times the whole
+``main_pipeline.py --help`` process.
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import subprocess
+
+# Make the pipeline modules importable when run from this directory
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PIPELINE_DIR)
+
+# Libraries that dominate import time
+HEAVY = ['osmnx', 'rasterio', 'rasterstats', 'geopandas', 'sklearn', 'xgboost',
+         'matplotlib', 'seaborn', 'folium']
+
+PROBE = '''
+import sys, time, json, importlib
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+'''.format(heavy=HEAVY)
+
+
+def command_modules():
+    """{subcommand: modules its phases import}, read from main_pipeline.PHASES"""
+    import main_pipeline
+    modules = {}
+    for phase in main_pipeline.PHASES:
+        modules.setdefault(phase['command'], [])
+        if phase['run'].module not in modules[phase['command']]:
+            modules[phase['command']].append(phase['run'].module)
+    modules['all'] = list(dict.fromkeys(m for ms in list(modules.values()) for m in ms))
+    modules['eager'] = modules['all'] + ['osmnx', 'rasterstats', 'sklearn.ensemble', 'xgboost',
+                                         'matplotlib.pyplot', 'seaborn', 'folium']
+    return modules
+
+
+def time_imports(modules):
+    """Seconds to import ``modules`` in a fresh interpreter, and heavy libraries loaded"""
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE, 'main_pipeline'] + modules,
+        cwd=PIPELINE_DIR, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def time_cli():
+    """Wall time of ``main_pipeline.py --help`` as a whole process"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, 'main_pipeline.py', '--help'],
+                   cwd=PIPELINE_DIR, capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def run_benchmark(repeat=3):
+    """Best-of-``repeat`` import time of every subcommand"""
+    print("=" * 60)
+    print("BENCHMARK: import time per subcommand")
+    print("=" * 60)
+    modules = command_modules()
+    
+    results = {}
+    print(f"{'command':<10} {'best (s)':>9}  heavy libraries loaded")
+    for command in ['cli'] + list(modules):
+        if command == 'cli':
+            seconds, loaded = min(time_cli() for _ in range(repeat)), None
+        else:
+            runs = [time_imports(modules[command]) for _ in range(repeat)]
+            seconds, loaded = min(r['seconds'] for r in runs), runs[0]['loaded']
+        results[command] = seconds
+        libraries = '-' if loaded is None else (', '.join(loaded) or 'none')
+        print(f"{command:<10} {seconds:>9.2f}  {libraries}")
+    
+    print(f"\nStartup vs eager imports ({results['eager']:.2f}s):")
+    for command in list(modules)[:-2]:
+        print(f"  {command:<10} {results['eager'] / results[command]:>6.1f}x faster")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per subcommand')
+    args = parser.parse_args()
+    run_benchmark(repeat=args.repeat)
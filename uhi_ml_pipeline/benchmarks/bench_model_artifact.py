@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Benchmark: compact model artifacts vs joblib pickles (size and load time)"""
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+import argparse
+
+# Make the pipeline modules importable when run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from xgboost import XGBRegressor
+
+from config import MODEL_FEATURES, RANDOM_STATE
+from model_store import save_model, load_model
+
+
+def make_models():
+    """Pipeline models plus a deep forest, the worst case for pickles"""
+    return {
+        'Random Forest': RandomForestRegressor(
+            n_estimators=100, max_depth=10, min_samples_split=5,
+            random_state=RANDOM_STATE, n_jobs=-1
+        ),
+        'Deep Random Forest': RandomForestRegressor(
+            n_estimators=300, max_depth=None, random_state=RANDOM_STATE, n_jobs=-1
+        ),
+        'XGBoost': XGBRegressor(
+            n_estimators=100, max_depth=6, learning_rate=0.1,
+            random_state=RANDOM_STATE, n_jobs=-1
+        ),
+        'Linear Regression': LinearRegression()
+    }
+
+
+def make_data(n_samples, seed=0):
+    """Synthetic model matrix with the pipeline's feature columns"""
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.random((n_samples, len(MODEL_FEATURES))), columns=MODEL_FEATURES)
+    y = 25 + 10 * X.iloc[:, 2] - 5 * X.iloc[:, 0] + rng.normal(0, 1, n_samples)
+    return X, y
+
+
+def dir_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def best_time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_benchmark(n_samples=20000, repeat=5):
+    """Save every model both ways and time loading (and load + predict)"""
+    print("=" * 60)
+    print("BENCHMARK: model artifact formats")
+    print("=" * 60)
+
+    X, y = make_data(n_samples)
+    workdir = tempfile.mkdtemp()
+    try:
+        print(f"{'model':<20} {'format':<8} {'size (MB)':>10} {'load (ms)':>10} "
+              f"{'load+predict (ms)':>18} {'max |diff|':>11}")
+        for name, model in make_models().items():
+            model.fit(X, y)
+            expected = model.predict(X)
+
+            pickle_path = os.path.join(workdir, f'{name}.pkl')
+            compact_path = os.path.join(workdir, name)
+            joblib.dump(model, pickle_path)
+            save_model(model, compact_path, MODEL_FEATURES, name=name)
+
+            for label, path in (('pickle', pickle_path), ('compact', compact_path)):
+                load = best_time(lambda: load_model(path), repeat)
+                load_predict = best_time(lambda: load_model(path).predict(X), repeat)
+                diff = np.abs(load_model(path).predict(X) - expected).max()
+                print(f"{name:<20} {label:<8} {dir_size(path) / 1e6:>10.2f} {load * 1000:>10.1f} "
+                      f"{load_predict * 1000:>18.1f} {diff:>11.2e}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--samples', type=int, default=20000, help='Training rows')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement')
+    args = parser.parse_args()
+    run_benchmark(n_samples=args.samples, repeat=args.repeat)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Benchmark: lattice and cell-to-pixel index zonal statistics vs rasterstats
+
+Checks that the engines agree (mean/std/count per cell) and times them on
+a synthetic ~30m raster over the Bengaluru bounding box. The index engine
+is timed cold (index built and stored) and warm (stored index loaded).
+"""
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+# Make the pipeline modules importable when run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import geopandas as gpd
+import rasterio
+from rasterio.transform import from_bounds
+from rasterstats import zonal_stats
+from shapely.geometry import box
+
+from config import BENGALURU_BOUNDS
+from data_preparation import create_grid
+from grid_lattice import detect_lattice
+from raster_zonal import lattice_zonal_stats
+from pixel_index import zonal_stats_by_index
+
+
+def write_synthetic_raster(path, size, seed=0):
+    """Write a noisy float32 raster with some nodata pixels"""
+    rng = np.random.default_rng(seed)
+    data = (30 + 5 * rng.standard_normal((size, size))).astype(np.float32)
+    data[rng.random((size, size)) < 0.01] = -9999
+    
+    transform = from_bounds(
+        BENGALURU_BOUNDS['west'], BENGALURU_BOUNDS['south'],
+        BENGALURU_BOUNDS['east'], BENGALURU_BOUNDS['north'],
+        size, size
+    )
+    with rasterio.open(
+        path, 'w', driver='GTiff', height=size, width=size, count=1,
+        dtype=data.dtype, crs='EPSG:4326', transform=transform, nodata=-9999
+    ) as dst:
+        dst.write(data, 1)
+
+
+def tie_cells(lattice, raster_path):
+    """Cells next to an edge that passes exactly through pixel centres
+
+    rasterstats counts such pixels in both neighbouring cells, the lattice
+    engine in one, so these cells are reported separately.
+    """
+    with rasterio.open(raster_path) as src:
+        t = src.transform
+        xs = t.c + (np.arange(src.width) + 0.5) * t.a
+        ys = t.f + (np.arange(src.height) + 0.5) * t.e
+    
+    def tie_lines(coords, origin):
+        pos = (coords - origin) / lattice.cell_size
+        return np.unique(np.rint(pos[np.abs(pos - np.rint(pos)) < 1e-6]).astype(int))
+    
+    tie_cols = tie_lines(xs, lattice.x0)
+    tie_rows = tie_lines(ys, lattice.y0)
+    return (
+        np.isin(lattice.cols, tie_cols) | np.isin(lattice.cols + 1, tie_cols) |
+        np.isin(lattice.rows, tie_rows) | np.isin(lattice.rows + 1, tie_rows)
+    )
+
+
+def run_benchmark(raster_size, cell_size):
+    """Compare the engines on one raster/grid combination"""
+    boundary = gpd.GeoDataFrame(
+        {'geometry': [box(
+            BENGALURU_BOUNDS['west'], BENGALURU_BOUNDS['south'],
+            BENGALURU_BOUNDS['east'], BENGALURU_BOUNDS['north']
+        )]},
+        crs='EPSG:4326'
+    )
+    grid = create_grid(boundary, cell_size=cell_size)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        raster_path = os.path.join(tmp, 'synthetic.tif')
+        write_synthetic_raster(raster_path, raster_size)
+        
+        start = time.perf_counter()
+        lattice = detect_lattice(grid)
+        fast = lattice_zonal_stats(lattice, raster_path, grid.crs, nodata=-9999)
+        lattice_time = time.perf_counter() - start
+        
+        index_times = []
+        index_dir = os.path.join(tmp, 'pixel_index')
+        for _ in ('cold', 'warm'):
+            start = time.perf_counter()
+            indexed = zonal_stats_by_index(grid, {'band': raster_path}, index_dir=index_dir)['band']
+            index_times.append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        ref = zonal_stats(grid.geometry, raster_path, stats=['mean', 'std', 'count'], nodata=-9999)
+        rasterstats_time = time.perf_counter() - start
+        
+        ties = tie_cells(lattice, raster_path)
+    
+    ref_mean = np.array([s['mean'] if s['mean'] is not None else np.nan for s in ref])
+    ref_std = np.array([s['std'] if s['std'] is not None else np.nan for s in ref])
+    ref_count = np.array([s['count'] for s in ref])
+    
+    print(f"\nRaster {raster_size}x{raster_size}, {len(grid)} cells")
+    print(f"  rasterstats: {rasterstats_time:8.3f} s")
+    print(f"  lattice:     {lattice_time:8.3f} s  ({rasterstats_time / lattice_time:.0f}x faster)")
+    print(f"  index:       {index_times[0]:8.3f} s cold, {index_times[1]:.3f} s warm")
+    print(f"  cells on pixel-centre ties (excluded): {int(ties.sum())}")
+    
+    ok = ~ties
+    print(f"  count mismatches: {int((ref_count[ok] != fast['count'][ok]).sum())}")
+    print(f"  max |mean diff|:  {np.nanmax(np.abs(ref_mean[ok] - fast['mean'][ok])):.2e}")
+    print(f"  max |std diff|:   {np.nanmax(np.abs(ref_std[ok] - fast['std'][ok])):.2e}")
+    
+    equivalent = (
+        np.array_equal(ref_count[ok], fast['count'][ok]) and
+        np.allclose(ref_mean[ok], fast['mean'][ok], atol=1e-4, equal_nan=True) and
+        np.allclose(ref_std[ok], fast['std'][ok], atol=1e-4, equal_nan=True)
+    )
+    print(f"  equivalent: {'yes' if equivalent else 'NO'}")
+    
+    index_equivalent = (
+        np.array_equal(indexed['count'], fast['count']) and
+        np.allclose(indexed['mean'], fast['mean'], equal_nan=True) and
+        np.allclose(indexed['std'], fast['std'], equal_nan=True)
+    )
+    print(f"  index equals lattice: {'yes' if index_equivalent else 'NO'}")
+    return equivalent and index_equivalent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--raster-size', type=int, default=1013,
+                        help='Raster width/height in pixels (1013 ≈ 30m, chosen to avoid pixel-centre ties)')
+    parser.add_argument('--cell-size', type=float, nargs='+', default=[0.009, 0.00225],
+                        help='Grid cell sizes in degrees')
+    args = parser.parse_args()
+    
+    results = [run_benchmark(args.raster_size, cs) for cs in args.cell_size]
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Load test: concurrent requests against the local prediction service
+
+Start the service first (python prediction_service.py), then run this
+script. Requests use real cells from the features artifact: feature rows
+for POST /predict, cell centres for POST /predict/location.
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import Request, urlopen
+
+# Make the pipeline modules importable when run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from config import FEATURES_PARQUET, MODEL_FEATURES, SERVICE_HOST, SERVICE_PORT
+from artifacts import read_geoparquet, resolution_path
+
+
+def make_payloads(mode, n_requests, rows_per_request, resolution=None, seed=0):
+    """Request bodies sampled from the grid cells"""
+    gdf = read_geoparquet(resolution_path(FEATURES_PARQUET, resolution), columns=MODEL_FEATURES)
+    rng = np.random.default_rng(seed)
+
+    if mode == 'features':
+        features = gdf[MODEL_FEATURES].fillna(gdf[MODEL_FEATURES].mean()).to_numpy()
+        return [
+            {'features': features[rng.integers(0, len(features), rows_per_request)].tolist()}
+            for _ in range(n_requests)
+        ]
+
+    bounds = gdf.geometry.bounds
+    coords = np.column_stack([
+        (bounds['miny'] + bounds['maxy']) / 2,
+        (bounds['minx'] + bounds['maxx']) / 2
+    ])
+    return [
+        {'locations': coords[rng.integers(0, len(coords), rows_per_request)].tolist()}
+        for _ in range(n_requests)
+    ]
+
+
+def post(url, payload):
+    """POST a JSON payload, returning (latency in seconds, response)"""
+    data = json.dumps(payload).encode()
+    request = Request(url, data=data, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urlopen(request) as response:
+        body = json.loads(response.read())
+    return time.perf_counter() - start, body
+
+
+def run_load_test(host=SERVICE_HOST, port=SERVICE_PORT, mode='features', n_requests=2000,
+                  concurrency=16, rows_per_request=1, resolution=None):
+    """Fire requests from ``concurrency`` client threads and report latencies"""
+    base_url = f"http://{host}:{port}"
+    path = '/predict' if mode == 'features' else '/predict/location'
+    payloads = make_payloads(mode, n_requests, rows_per_request, resolution)
+
+    print("=" * 60)
+    print(f"LOAD TEST: POST {path} ({base_url})")
+    print("=" * 60)
+    print(f"Requests: {n_requests} | Concurrency: {concurrency} | Rows/request: {rows_per_request}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda p: post(base_url + path, p), payloads))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    print(f"\nElapsed: {elapsed:.2f} s")
+    print(f"Throughput: {n_requests / elapsed:.1f} requests/s, "
+          f"{n_requests * rows_per_request / elapsed:.1f} rows/s")
+    print(f"Client latency (ms): p50 {np.percentile(latencies, 50):.2f} | "
+          f"p95 {np.percentile(latencies, 95):.2f} | p99 {np.percentile(latencies, 99):.2f} | "
+          f"max {latencies.max():.2f}")
+
+    with urlopen(base_url + '/metrics') as response:
+        metrics = json.loads(response.read())
+    print("\nService metrics:")
+    for key, value in metrics.items():
+        print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default=SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    parser.add_argument('--mode', choices=['features', 'location'], default='features')
+    parser.add_argument('--requests', type=int, default=2000, help='Total requests')
+    parser.add_argument('--concurrency', type=int, default=16, help='Client threads')
+    parser.add_argument('--rows', type=int, default=1, help='Rows per request')
+    parser.add_argument('--resolution', default=None,
+                        help='Grid pyramid level the service was started with')
+    args = parser.parse_args()
+    run_load_test(args.host, args.port, args.mode, args.requests,
+                  args.concurrency, args.rows, args.resolution)
@@ -16,23 +16,207 @@ BENGALURU_BOUNDS = {
 # At Bengaluru's latitude (~13°N), 1km ≈ 0.009° latitude and 0.0092° longitude
 GRID_SIZE_DEGREES = 0.009
 
+# Multi-resolution grid pyramid: build the finest grid once, extract
+# features on it and aggregate coarser levels instead of re-extracting.
+# Level name -> aggregation factor relative to PYRAMID_BASE_CELL_DEGREES.
+# Every level gets its own artifacts (e.g. features_1km.parquet).
+PYRAMID_ENABLED = False
+PYRAMID_BASE_CELL_DEGREES = 0.00225  # ~250m
+PYRAMID_LEVELS = {'250m': 1, '500m': 2, '1km': 4}
+
+# Zonal statistics engine: 'index' reduces all bands of a pixel grid with
+# the persistent cell-to-pixel index (any grid and raster CRS), 'lattice'
+# labels pixels on the fly for regular grids in the raster's CRS,
+# 'rasterstats' rasterizes each cell; 'auto' tries them in that order
+ZONAL_STATS_ENGINE = 'auto'  # 'auto', 'index', 'lattice' or 'rasterstats'
+
+# Cell-to-pixel index, stored per grid and raster pixel grid: pixels count
+# in the cell holding their centre, or with PIXEL_INDEX_FRACTIONAL by the
+# share of their area in each cell (measured on a SUPERSAMPLE² sub-grid)
+PIXEL_INDEX_FRACTIONAL = False
+PIXEL_INDEX_SUPERSAMPLE = 4
+
+# Streaming raster reads: process rasters window by window so peak memory
+# is bounded by the window size rather than the scene size
+RASTER_STREAMING = False
+RASTER_WINDOW_SIZE = None  # pixels per window side; None = GeoTIFF internal blocks
+
 # LANDSAT data paths (relative to BASE_DIR)
 LANDSAT_LST_PATH = os.path.join(BASE_DIR, 'data', 'landsat_lst.tif')
 LANDSAT_NDVI_PATH = os.path.join(BASE_DIR, 'data', 'landsat_ndvi.tif')
 
+# Multi-temporal scene stack (scene_stack.py): dated scenes listed in
+# SCENE_MANIFEST (CSV: date, band, path) or, without a manifest, files in
+# SCENE_DIR named <band>_<date>.tif, e.g. lst_2024-03-15.tif
+SCENE_DIR = os.path.join(BASE_DIR, 'data', 'scenes')
+SCENE_MANIFEST = os.path.join(SCENE_DIR, 'scenes.csv')
+SCENE_BANDS = {'lst': 'LST', 'ndvi': 'NDVI'}  # band name -> feature column prefix
+
 # Output paths
 OUTPUT_DIR = os.path.join(BASE_DIR, 'outputs')
+GRID_PARQUET = os.path.join(OUTPUT_DIR, 'bengaluru_grid.parquet')
+FEATURES_PARQUET = os.path.join(OUTPUT_DIR, 'features.parquet')
+MODEL_MATRIX_FEATHER = os.path.join(OUTPUT_DIR, 'model_matrix.feather')
 GRID_SHAPEFILE = os.path.join(OUTPUT_DIR, 'bengaluru_grid.geojson')
 FEATURES_CSV = os.path.join(OUTPUT_DIR, 'features.csv')
+FEATURES_GEOJSON = os.path.join(OUTPUT_DIR, 'features.geojson')
+BEST_MODEL_PATH = os.path.join(OUTPUT_DIR, 'best_model.pkl')
+BEST_MODEL_DIR = os.path.join(OUTPUT_DIR, 'best_model')  # compact model artifact
 MODEL_EVALUATION_CSV = os.path.join(OUTPUT_DIR, 'model_evaluation.csv')
+TUNING_BEST_CONFIG_JSON = os.path.join(OUTPUT_DIR, 'tuning_best_config.json')
+TUNING_TRIALS_CSV = os.path.join(OUTPUT_DIR, 'tuning_trials.csv')
+SPATIAL_CV_FOLDS_CSV = os.path.join(OUTPUT_DIR, 'spatial_cv_folds.csv')
+SPATIAL_CV_SUMMARY_CSV = os.path.join(OUTPUT_DIR, 'spatial_cv_summary.csv')
 FEATURE_IMPORTANCE_PNG = os.path.join(OUTPUT_DIR, 'feature_importance.png')
+PREDICTIONS_FEATHER = os.path.join(OUTPUT_DIR, 'predictions.feather')  # cell_id, LST_predicted, UHI_intensity
 UHI_HEATMAP_PNG = os.path.join(OUTPUT_DIR, 'uhi_heatmap.png')
 UHI_INTERACTIVE_MAP = os.path.join(OUTPUT_DIR, 'uhi_interactive_map.html')
+PIPELINE_MANIFEST = os.path.join(OUTPUT_DIR, 'pipeline_manifest.json')
+UHI_TILES_DIR = os.path.join(OUTPUT_DIR, 'uhi_tiles')  # XYZ tiles: {z}/{x}/{y}.png
+INCREMENTAL_DIR = os.path.join(OUTPUT_DIR, 'incremental')  # training batches, models and state
+SCENE_FEATURES_DIR = os.path.join(OUTPUT_DIR, 'scene_features')  # (cell, date) table, one file per date
+PIXEL_INDEX_DIR = os.path.join(OUTPUT_DIR, 'pixel_index')  # cell-to-pixel indexes (.npz)
+RUN_REPORT_JSON = os.path.join(OUTPUT_DIR, 'run_report.json')  # time/memory/rows per phase and step
+RUN_REPORT_CSV = os.path.join(OUTPUT_DIR, 'run_report.csv')
+PROFILE_DIR = os.path.join(OUTPUT_DIR, 'profiles')  # per-phase profiles (PROFILE_MODE)
+
+# GeoParquet/Feather are the primary artifacts; also export the grid and
+# features as GeoJSON/CSV for inspection in other tools
+EXPORT_TEXT_ARTIFACTS = True
+
+# Static heatmap: 'raster' draws a regular grid as one image (fast at any
+# resolution), 'polygons' draws every cell; 'auto' picks raster when possible
+STATIC_HEATMAP_MODE = 'auto'
+STATIC_HEATMAP_EDGES = False  # outline cells in raster mode
+
+# Interactive map: coordinate decimals in the HTML (5 ≈ 1 m) and number of
+# colors in the colormap lookup table
+MAP_COORD_PRECISION = 5
+MAP_COLOR_STEPS = 256
+
+# Static XYZ PNG tile pyramid of the UHI map, for sharing large grids;
+# MAP_USE_TILES makes the interactive map load these tiles instead of
+# embedding every cell
+EXPORT_MAP_TILES = False
+MAP_USE_TILES = False
+TILE_ZOOM_LEVELS = [10, 11, 12, 13, 14, 15]
+
+# Model inputs
+MODEL_FEATURES = [
+    'NDVI_mean', 'NDVI_std',
+    'building_count', 'building_area',
+    'road_count', 'road_length',
+    'impervious_surface_proxy', 'vegetation_cover_proxy'
+]
+TARGET_COLUMN = 'LST_mean'
+
+# Model artifact: 'compact' stores the best model in its native compact
+# form under BEST_MODEL_DIR (fast to load), 'pickle' as BEST_MODEL_PATH
+MODEL_ARTIFACT_FORMAT = 'compact'
+
+# Candidate models: display name -> (estimator, parameters); estimators
+# are 'random_forest', 'xgboost' or 'linear_regression'
+MODEL_CANDIDATES = {
+    'Random Forest': ('random_forest', {
+        'n_estimators': 100, 'max_depth': 10, 'min_samples_split': 5
+    }),
+    'XGBoost': ('xgboost', {
+        'n_estimators': 100, 'max_depth': 6, 'learning_rate': 0.1
+    }),
+    'Linear Regression': ('linear_regression', {})
+}
 
 # Model parameters
 RANDOM_STATE = 42
 TEST_SIZE = 0.2
 
+# Hyperparameter search (model_tuning.py): successive halving over
+# TUNING_N_CONFIGS sampled configurations per model, keeping the best
+# 1/TUNING_ETA each rung. Trials stop once either budget is spent
+# (None = no limit); XGBoost stops early on a validation split.
+TUNING_ENABLED = False
+TUNING_SPACE = {
+    'Random Forest': {
+        'n_estimators': [100, 200, 400],
+        'max_depth': [8, 12, 16, None],
+        'min_samples_split': [2, 5, 10],
+        'max_features': [0.5, 1.0]
+    },
+    'XGBoost': {
+        'n_estimators': [1000],  # upper bound, early stopping picks the rounds
+        'max_depth': [3, 4, 6, 8],
+        'learning_rate': [0.03, 0.1, 0.3],
+        'subsample': [0.7, 1.0],
+        'colsample_bytree': [0.7, 1.0]
+    }
+}
+TUNING_N_CONFIGS = 27
+TUNING_ETA = 3
+TUNING_MIN_ROWS = 200  # fewest training rows in the first rung
+TUNING_VALIDATION_SIZE = 0.2  # share of the training set held out for scoring
+TUNING_EARLY_STOPPING_ROUNDS = 20
+TUNING_TIME_BUDGET = 600  # seconds of wall clock
+TUNING_CPU_BUDGET = None  # CPU seconds summed over trials
+
+# Spatial block cross-validation (spatial_cv.py): cells are grouped into
+# square blocks by centroid and whole blocks are held out per fold. When
+# enabled, the best model is chosen by mean spatial CV test R².
+SPATIAL_CV_ENABLED = False
+SPATIAL_CV_FOLDS = 5
+SPATIAL_CV_BLOCK_DEGREES = 0.05  # ~5.5km blocks
+SPATIAL_CV_TIME_BUDGET = 600  # seconds of wall clock, None = no limit
+
+# Incremental training (incremental_training.py): every new model matrix
+# (e.g. the features of a new Landsat scene) is kept as a training batch
+# and the models are updated from the new batch only: XGBoost boosts
+# INCREMENTAL_XGB_ROUNDS more rounds, Random Forest grows
+# INCREMENTAL_RF_TREES more trees, Linear Regression is re-solved from
+# accumulated sufficient statistics. All batches are retrained from
+# scratch when a column mean moves by more than INCREMENTAL_DRIFT_THRESHOLD
+# reference standard deviations, or a model's RMSE on the new batch
+# exceeds INCREMENTAL_ERROR_THRESHOLD times its reference RMSE.
+INCREMENTAL_TRAINING = False
+INCREMENTAL_XGB_ROUNDS = 50
+INCREMENTAL_RF_TREES = 20
+INCREMENTAL_DRIFT_THRESHOLD = 0.5
+INCREMENTAL_ERROR_THRESHOLD = 1.5
+
+# Local OpenStreetMap extracts (PBF or GeoPackage); used instead of
+# synthetic data when present, no network access needed
+OSM_BUILDINGS_PATH = os.path.join(BASE_DIR, 'data', 'osm_buildings.gpkg')
+OSM_BUILDINGS_LAYER = None  # None = 'multipolygons' for PBF, default layer for GeoPackage
+OSM_TILE_SIZE_DEGREES = 0.05  # spatial tile size for parallel overlay
+OSM_ROADS_PATH = os.path.join(BASE_DIR, 'data', 'osm_roads.gpkg')  # PBF, GeoPackage or osmnx .graphml
+OSM_ROADS_LAYER = None  # None = 'lines' for PBF, default layer otherwise
+ROAD_CHUNK_SIZE = 200000  # edges held in memory at once
+ROAD_CLASSES = ['motorway', 'trunk', 'primary', 'secondary', 'tertiary', 'residential']
+ROAD_LENGTH_BY_CLASS = True  # also write road_length_<class> columns
+METRIC_CRS = 'EPSG:32643'  # UTM zone 43N, for areas and lengths in meters
+ROAD_WIDTH_METERS = 7.0  # paved width per road, turns road length into impervious area
+
+# Local prediction service (prediction_service.py): requests arriving
+# within SERVICE_BATCH_WAIT_MS are predicted together, up to
+# SERVICE_MAX_BATCH rows per model call
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+SERVICE_MAX_BATCH = 4096
+SERVICE_BATCH_WAIT_MS = 2
+
+# Parallelism
+N_WORKERS = os.cpu_count() or 1
+FEATURE_WORKERS = min(4, N_WORKERS)  # processes for independent feature families
+TILE_WORKERS = N_WORKERS  # processes for map tile rendering
+TRAINING_CORES = N_WORKERS  # core budget shared by concurrently trained models
+TUNING_WORKERS = N_WORKERS  # processes for hyperparameter search trials
+SPATIAL_CV_WORKERS = N_WORKERS  # processes for spatial CV fits
+SCENE_WORKERS = N_WORKERS  # processes for scene dates
+
+# Per-phase profiling (instrumentation.py): None, 'cprofile' (<phase>.prof,
+# deterministic, higher overhead) or 'sampling' (<phase>.folded collapsed
+# stacks of every thread); main_pipeline.py --profile overrides it
+PROFILE_MODE = None
+PROFILE_SAMPLE_INTERVAL = 0.01  # seconds between stack samples
+
 # OSM query parameters
 OSM_TIMEOUT = 180  # seconds
 OSM_MAX_QUERY_AREA_SIZE = 50000000  # square meters
@@ -1,128 +1,162 @@
 #!/usr/bin/env python3
-"""Create sample LANDSAT data for demonstration purposes"""
+"""Create sample LANDSAT data for demonstration purposes
+
+Rasters of any size are generated strip by strip and written as tiled,
+compressed GeoTIFFs with overviews, so memory stays bounded even for
+Landsat-sized scenes (e.g. --size 8000). Size, seed and the number of
+hot spots are parameters, so the same generator feeds scale tests.
+"""
+
+import argparse
 
 import numpy as np
 import rasterio
+from rasterio.enums import Resampling
 from rasterio.transform import from_bounds
-from config import LANDSAT_LST_PATH, LANDSAT_NDVI_PATH, BENGALURU_BOUNDS
+from rasterio.windows import Window
+from config import LANDSAT_LST_PATH, LANDSAT_NDVI_PATH, BENGALURU_BOUNDS, RANDOM_STATE
 
-def create_sample_lst():
-    """Create sample Land Surface Temperature GeoTIFF"""
-    print("Creating sample LST data...")
-    
-    # Image dimensions
-    width = 300
-    height = 300
-    
-    # Create synthetic LST data (in Celsius)
-    # Simulate urban heat with hot spots in center
-    x = np.linspace(-1, 1, width)
-    y = np.linspace(-1, 1, height)
-    X, Y = np.meshgrid(x, y)
-    
-    # Create heat pattern (hot in center, cooler at edges)
-    R = np.sqrt(X**2 + Y**2)
-    LST = 35 - 10 * R + np.random.randn(height, width) * 2
-    
-    # Add some hot spots (buildings/urban areas)
-    for _ in range(5):
-        cx, cy = np.random.randint(50, 250, 2)
-        for i in range(height):
-            for j in range(width):
-                dist = np.sqrt((i - cy)**2 + (j - cx)**2)
-                if dist < 20:
-                    LST[i, j] += 5 * (1 - dist/20)
-    
-    # Clip to realistic range
-    LST = np.clip(LST, 20, 45)
-    
-    # Create transform
+# GeoTIFF tile size, and rows generated and written per strip
+BLOCK_SIZE = 256
+STRIP_ROWS = 4 * BLOCK_SIZE
+
+# Overviews are added by factors of 2 down to about one tile
+OVERVIEW_MIN_SIZE = BLOCK_SIZE
+
+
+def _radial_distance(row_start, n_rows, size):
+    """Distance from the raster centre in [-1, 1] coordinates, for a strip of rows"""
+    coords = np.linspace(-1, 1, size, dtype=np.float32)
+    return np.hypot(coords[None, :], coords[row_start:row_start + n_rows, None])
+
+
+def _write_raster(path, size, make_strip, nodata=-9999):
+    """Write a square float32 raster over Bengaluru strip by strip
+
+    ``make_strip(row_start, n_rows)`` returns the values of a strip of
+    rows. Returns the (min, max) of the written values.
+    """
     transform = from_bounds(
         BENGALURU_BOUNDS['west'],
         BENGALURU_BOUNDS['south'],
         BENGALURU_BOUNDS['east'],
         BENGALURU_BOUNDS['north'],
-        width,
-        height
+        size,
+        size
     )
-    
-    # Save as GeoTIFF
+
+    vmin, vmax = np.inf, -np.inf
     with rasterio.open(
-        LANDSAT_LST_PATH,
+        path,
         'w',
         driver='GTiff',
-        height=height,
-        width=width,
+        height=size,
+        width=size,
         count=1,
-        dtype=LST.dtype,
+        dtype='float32',
         crs='EPSG:4326',
         transform=transform,
-        nodata=-9999
+        nodata=nodata,
+        tiled=True,
+        blockxsize=BLOCK_SIZE,
+        blockysize=BLOCK_SIZE,
+        compress='deflate',
+        predictor=3,
+        BIGTIFF='IF_SAFER'
     ) as dst:
-        dst.write(LST, 1)
-    
-    print(f"✓ Sample LST data created: {LANDSAT_LST_PATH}")
-    print(f"  Range: [{LST.min():.2f}, {LST.max():.2f}]°C")
+        for row_start in range(0, size, STRIP_ROWS):
+            n_rows = min(STRIP_ROWS, size - row_start)
+            strip = make_strip(row_start, n_rows).astype(np.float32)
+            dst.write(strip, 1, window=Window(0, row_start, size, n_rows))
+            vmin, vmax = min(vmin, strip.min()), max(vmax, strip.max())
+
+        factors = []
+        while size // (2 ** (len(factors) + 1)) >= OVERVIEW_MIN_SIZE:
+            factors.append(2 ** (len(factors) + 1))
+        if factors:
+            dst.build_overviews(factors, Resampling.average)
+            dst.update_tags(ns='rio_overview', resampling='average')
+
+    return vmin, vmax
+
+
+def create_sample_lst(path=LANDSAT_LST_PATH, size=300, seed=RANDOM_STATE, n_hotspots=5):
+    """Create sample Land Surface Temperature GeoTIFF"""
+    print("Creating sample LST data...")
+
+    # Hot spots (buildings/urban areas): centres in the inner two thirds,
+    # radius 20 pixels at the default 300x300 size
+    hot_rng = np.random.default_rng([seed, 0])
+    centres = hot_rng.uniform(size / 6, size * 5 / 6, (n_hotspots, 2))
+    radius = 20 * size / 300
+    noise_rng = np.random.default_rng([seed, 1])
+
+    def make_strip(row_start, n_rows):
+        # Heat pattern: hot in center, cooler at edges
+        R = _radial_distance(row_start, n_rows, size)
+        LST = 35 - 10 * R + noise_rng.standard_normal(R.shape, dtype=np.float32) * 2
+
+        # Each hot spot only touches the pixels within its radius
+        for cx, cy in centres:
+            r0, r1 = max(row_start, int(cy - radius)), min(row_start + n_rows, int(cy + radius) + 2)
+            c0, c1 = max(0, int(cx - radius)), min(size, int(cx + radius) + 2)
+            if r0 >= r1 or c0 >= c1:
+                continue
+            dist = np.hypot(np.arange(r0, r1)[:, None] - cy, np.arange(c0, c1)[None, :] - cx)
+            LST[r0 - row_start:r1 - row_start, c0:c1] += 5 * np.clip(1 - dist / radius, 0, None)
+
+        # Clip to realistic range
+        return np.clip(LST, 20, 45)
+
+    vmin, vmax = _write_raster(path, size, make_strip)
+
+    print(f"✓ Sample LST data created: {path} ({size}x{size}, {n_hotspots} hot spots)")
+    print(f"  Range: [{vmin:.2f}, {vmax:.2f}]°C")
 
 
-def create_sample_ndvi():
+def create_sample_ndvi(path=LANDSAT_NDVI_PATH, size=300, seed=RANDOM_STATE):
     """Create sample NDVI GeoTIFF"""
     print("\nCreating sample NDVI data...")
-    
-    # Image dimensions
-    width = 300
-    height = 300
-    
-    # Create synthetic NDVI data (-1 to 1)
-    # Higher values at edges (more vegetation), lower in center (urban)
-    x = np.linspace(-1, 1, width)
-    y = np.linspace(-1, 1, height)
-    X, Y = np.meshgrid(x, y)
-    
-    # Create vegetation pattern (green at edges, less in center)
-    R = np.sqrt(X**2 + Y**2)
-    NDVI = 0.7 * R - 0.3 + np.random.randn(height, width) * 0.15
-    
-    # Clip to valid NDVI range
-    NDVI = np.clip(NDVI, -0.2, 0.9)
-    
-    # Create transform
-    transform = from_bounds(
-        BENGALURU_BOUNDS['west'],
-        BENGALURU_BOUNDS['south'],
-        BENGALURU_BOUNDS['east'],
-        BENGALURU_BOUNDS['north'],
-        width,
-        height
-    )
-    
-    # Save as GeoTIFF
-    with rasterio.open(
-        LANDSAT_NDVI_PATH,
-        'w',
-        driver='GTiff',
-        height=height,
-        width=width,
-        count=1,
-        dtype=NDVI.dtype,
-        crs='EPSG:4326',
-        transform=transform,
-        nodata=-9999
-    ) as dst:
-        dst.write(NDVI, 1)
-    
-    print(f"✓ Sample NDVI data created: {LANDSAT_NDVI_PATH}")
-    print(f"  Range: [{NDVI.min():.2f}, {NDVI.max():.2f}]")
+
+    noise_rng = np.random.default_rng([seed, 2])
+
+    def make_strip(row_start, n_rows):
+        # Vegetation pattern: green at edges, less in center
+        R = _radial_distance(row_start, n_rows, size)
+        NDVI = 0.7 * R - 0.3 + noise_rng.standard_normal(R.shape, dtype=np.float32) * 0.15
+
+        # Clip to valid NDVI range
+        return np.clip(NDVI, -0.2, 0.9)
+
+    vmin, vmax = _write_raster(path, size, make_strip)
+
+    print(f"✓ Sample NDVI data created: {path} ({size}x{size})")
+    print(f"  Range: [{vmin:.2f}, {vmax:.2f}]")
+
+
+def create_sample_data(lst_path=LANDSAT_LST_PATH, ndvi_path=LANDSAT_NDVI_PATH,
+                       size=300, seed=RANDOM_STATE, n_hotspots=5):
+    """Create the sample LST and NDVI rasters"""
+    create_sample_lst(lst_path, size, seed, n_hotspots)
+    create_sample_ndvi(ndvi_path, size, seed)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create sample LANDSAT data")
+    parser.add_argument('--size', type=int, default=300,
+                        help='Raster width/height in pixels (e.g. 8000 for a Landsat-sized scene)')
+    parser.add_argument('--seed', type=int, default=RANDOM_STATE, help='Random seed')
+    parser.add_argument('--hotspots', type=int, default=5, help='Number of urban hot spots')
+    parser.add_argument('--lst', default=LANDSAT_LST_PATH, help='LST output path')
+    parser.add_argument('--ndvi', default=LANDSAT_NDVI_PATH, help='NDVI output path')
+    args = parser.parse_args()
+
     print("=" * 60)
     print("Creating Sample LANDSAT Data for Demonstration")
     print("=" * 60)
-    
-    create_sample_lst()
-    create_sample_ndvi()
-    
+
+    create_sample_data(args.lst, args.ndvi, args.size, args.seed, args.hotspots)
+
     print("\n" + "=" * 60)
     print("✓ Sample data creation complete!")
     print("=" * 60)
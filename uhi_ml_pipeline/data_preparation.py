@@ -1,11 +1,22 @@
 """Data preparation module: Create grid and download boundary data"""
 
 import geopandas as gpd
-import osmnx as ox
+import shapely
 from shapely.geometry import box, Polygon
 import numpy as np
 import pandas as pd
-from config import BENGALURU_BOUNDS, GRID_SIZE_DEGREES, OUTPUT_DIR, GRID_SHAPEFILE
+from config import (
+    BENGALURU_BOUNDS,
+    GRID_SIZE_DEGREES,
+    PYRAMID_ENABLED,
+    PYRAMID_BASE_CELL_DEGREES,
+    OUTPUT_DIR,
+    GRID_PARQUET,
+    GRID_SHAPEFILE,
+    EXPORT_TEXT_ARTIFACTS
+)
+from artifacts import write_geoparquet
+from instrumentation import measure
 import os
 
 
@@ -13,6 +24,9 @@ def get_bengaluru_boundary():
     """Download Bengaluru city boundary from OpenStreetMap"""
     print("Downloading Bengaluru city boundary from OpenStreetMap...")
     try:
+        # osmnx is only needed here, so it is imported on use
+        import osmnx as ox
+        
         # Try to get city boundary
         boundary = ox.geocode_to_gdf('Bengaluru, Karnataka, India')
         print(f"✓ Successfully downloaded boundary")
@@ -35,36 +49,43 @@ def get_bengaluru_boundary():
 
 
 def create_grid(boundary_gdf, cell_size=GRID_SIZE_DEGREES):
-    """Create a uniform grid over the boundary"""
-    print(f"Creating grid with cell size ~{cell_size}° (~1km)...")
+    """Create a uniform grid over the boundary
+
+    All candidate boxes are built in one vectorized call and filtered
+    against an STR-tree of the boundary geometries in a single bulk query.
+    Cells are numbered column by column (west to east, south to north).
+    """
+    print(f"Creating grid with cell size ~{cell_size}° (~{cell_size * 111:.2g}km)...")
     
     # Get bounds
     bounds = boundary_gdf.total_bounds
     minx, miny, maxx, maxy = bounds
     
-    # Create grid cells
-    grid_cells = []
+    # Lower-left corners of every candidate cell, x-major order
     x_coords = np.arange(minx, maxx, cell_size)
     y_coords = np.arange(miny, maxy, cell_size)
+    xs, ys = np.meshgrid(x_coords, y_coords, indexing='ij')
+    xs = xs.ravel()
+    ys = ys.ravel()
+    
+    # Create all grid cell polygons at once
+    cells = shapely.box(xs, ys, xs + cell_size, ys + cell_size)
     
-    cell_id = 0
-    for x in x_coords:
-        for y in y_coords:
-            # Create a grid cell polygon
-            cell = box(x, y, x + cell_size, y + cell_size)
-            
-            # Check if cell intersects with boundary
-            if boundary_gdf.geometry.intersects(cell).any():
-                grid_cells.append({
-                    'cell_id': cell_id,
-                    'geometry': cell,
-                    'centroid_lon': x + cell_size/2,
-                    'centroid_lat': y + cell_size/2
-                })
-                cell_id += 1
+    # Keep cells that intersect any boundary geometry
+    tree = shapely.STRtree(cells)
+    _, cell_idx = tree.query(boundary_gdf.geometry.values, predicate='intersects')
+    keep = np.unique(cell_idx)
     
     # Create GeoDataFrame
-    grid_gdf = gpd.GeoDataFrame(grid_cells, crs='EPSG:4326')
+    grid_gdf = gpd.GeoDataFrame(
+        {
+            'cell_id': np.arange(len(keep)),
+            'geometry': cells[keep],
+            'centroid_lon': xs[keep] + cell_size/2,
+            'centroid_lat': ys[keep] + cell_size/2
+        },
+        crs='EPSG:4326'
+    )
     print(f"✓ Created grid with {len(grid_gdf)} cells")
     
     return grid_gdf
@@ -80,14 +101,23 @@ def prepare_data():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
     # Get boundary
-    boundary = get_bengaluru_boundary()
+    with measure('boundary'):
+        boundary = get_bengaluru_boundary()
     
-    # Create grid
-    grid = create_grid(boundary)
+    # Create grid (the finest pyramid level when the pyramid is enabled)
+    cell_size = PYRAMID_BASE_CELL_DEGREES if PYRAMID_ENABLED else GRID_SIZE_DEGREES
+    with measure('create_grid') as step:
+        grid = create_grid(boundary, cell_size=cell_size)
+        step['rows'] = len(grid)
     
     # Save grid
-    grid.to_file(GRID_SHAPEFILE, driver='GeoJSON')
-    print(f"✓ Grid saved to: {GRID_SHAPEFILE}")
+    with measure('save_grid', rows=len(grid)):
+        write_geoparquet(grid, GRID_PARQUET)
+        print(f"✓ Grid saved to: {GRID_PARQUET}")
+        
+        if EXPORT_TEXT_ARTIFACTS:
+            grid.to_file(GRID_SHAPEFILE, driver='GeoJSON')
+            print(f"✓ Grid exported to: {GRID_SHAPEFILE}")
     
     print("\n✓ Data preparation complete!\n")
     return grid, boundary
@@ -0,0 +1,75 @@
+"""Grid lattice module: Row/column indexing for regular grids"""
+
+from collections import namedtuple
+
+import numpy as np
+import shapely
+
+
+# Regular lattice of square, axis-aligned cells.
+# Row 0 is the southernmost row, column 0 the westernmost column.
+# rows/cols give the lattice position of every grid cell (in grid order).
+GridLattice = namedtuple(
+    'GridLattice',
+    ['x0', 'y0', 'cell_size', 'n_rows', 'n_cols', 'rows', 'cols']
+)
+
+
+def detect_lattice(grid_gdf, rel_tol=1e-4):
+    """Return a GridLattice if the grid is a regular lattice, otherwise None
+
+    A grid qualifies when every cell is an axis-aligned square of the same
+    size and all cell corners fall on a common lattice. Cells may be missing
+    (e.g. clipped to the city boundary). ``rel_tol`` is relative to the cell
+    size and absorbs coordinate rounding from GeoJSON round-trips.
+    """
+    if len(grid_gdf) == 0:
+        return None
+
+    bounds = grid_gdf.geometry.bounds
+    minx = bounds['minx'].to_numpy()
+    miny = bounds['miny'].to_numpy()
+    widths = bounds['maxx'].to_numpy() - minx
+    heights = bounds['maxy'].to_numpy() - miny
+
+    cell_size = float(np.median(widths))
+    tol = cell_size * rel_tol
+    if cell_size <= 0:
+        return None
+    if not (np.allclose(widths, cell_size, atol=tol) and
+            np.allclose(heights, cell_size, atol=tol)):
+        return None
+
+    # Rotated or non-rectangular cells have a smaller area than their bounds
+    areas = shapely.area(grid_gdf.geometry.values)
+    if not np.allclose(areas, widths * heights, rtol=rel_tol):
+        return None
+
+    x0 = float(minx.min())
+    y0 = float(miny.min())
+    cols = np.rint((minx - x0) / cell_size).astype(np.int64)
+    rows = np.rint((miny - y0) / cell_size).astype(np.int64)
+    if not (np.allclose(x0 + cols * cell_size, minx, atol=tol) and
+            np.allclose(y0 + rows * cell_size, miny, atol=tol)):
+        return None
+
+    n_rows = int(rows.max()) + 1
+    n_cols = int(cols.max()) + 1
+    if len(np.unique(rows * n_cols + cols)) != len(rows):
+        return None
+
+    return GridLattice(x0, y0, cell_size, n_rows, n_cols, rows, cols)
+
+
+def cell_lookup(lattice):
+    """2D array (n_rows, n_cols) of positional cell indices, -1 where empty"""
+    lookup = np.full((lattice.n_rows, lattice.n_cols), -1, dtype=np.int64)
+    lookup[lattice.rows, lattice.cols] = np.arange(len(lattice.rows))
+    return lookup
+
+
+def lattice_positions(lattice, lon, lat):
+    """Map coordinates to (row, col) lattice positions (may be out of range)"""
+    cols = np.floor((np.asarray(lon) - lattice.x0) / lattice.cell_size).astype(np.int64)
+    rows = np.floor((np.asarray(lat) - lattice.y0) / lattice.cell_size).astype(np.int64)
+    return rows, cols
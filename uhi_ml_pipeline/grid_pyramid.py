@@ -0,0 +1,140 @@
+"""Grid pyramid module: Coarser grid levels aggregated from the finest grid
+
+Features are extracted once on the finest grid. Each coarser level merges
+factor × factor blocks of fine cells by combining their accumulators:
+raster statistics through their moments (count, sum, sum of squares),
+extensive quantities (counts, areas, lengths) by summing, and anything
+else by averaging. road_count counts distinct edges, which summing would
+repeat for every fine cell an edge crosses; it comes from the
+road_count_x<factor> columns the network extraction records for each
+level, and is only summed (an upper bound) when they are missing, e.g.
+for synthetic roads. Coarse cells on the city edge only include the fine
+cells that intersect the boundary.
+"""
+
+import numpy as np
+import geopandas as gpd
+import shapely
+
+from grid_lattice import detect_lattice
+
+
+# Extensive per-cell quantities, aggregated by summing
+SUM_COLUMNS = ['building_count', 'building_area', 'road_count', 'road_length']
+SUM_PREFIXES = ['road_length_']
+
+# Grid bookkeeping columns, rebuilt for every level
+GRID_COLUMNS = ['cell_id', 'geometry', 'centroid_lon', 'centroid_lat']
+
+# Per-level distinct road edge counts (road_count_x<factor>), not features
+BLOCK_COUNT_PREFIX = 'road_count_x'
+
+
+def _block_count_columns(columns):
+    return [col for col in columns if col.startswith(BLOCK_COUNT_PREFIX)]
+
+
+def _moment_prefixes(columns):
+    """Feature names with both <name>_mean and <name>_std columns"""
+    return [
+        col[:-5] for col in columns
+        if col.endswith('_mean') and f'{col[:-5]}_std' in columns
+    ]
+
+
+def aggregate_level(fine_gdf, factor):
+    """Aggregate a fine lattice grid into blocks of factor × factor cells
+
+    Returns a new GeoDataFrame with the same schema, numbered like
+    create_grid (west to east, south to north). ``<name>_count`` columns give the pixel weights of
+    ``<name>_mean``/``<name>_std``; without them every fine cell counts once.
+    """
+    lattice = detect_lattice(fine_gdf)
+    if lattice is None:
+        raise ValueError("Grid is not a regular lattice; cannot build pyramid")
+
+    parent_rows = lattice.rows // factor
+    parent_cols = lattice.cols // factor
+    n_parent_rows = int(parent_rows.max()) + 1
+    parents, parent_idx = np.unique(parent_cols * n_parent_rows + parent_rows, return_inverse=True)
+    parent_idx = parent_idx.ravel()
+    n = len(parents)
+
+    def block_sum(values):
+        return np.bincount(parent_idx, weights=values, minlength=n)
+
+    cell_size = lattice.cell_size * factor
+    x = lattice.x0 + (parents // n_parent_rows) * cell_size
+    y = lattice.y0 + (parents % n_parent_rows) * cell_size
+    columns = {
+        'cell_id': np.arange(n),
+        'geometry': shapely.box(x, y, x + cell_size, y + cell_size),
+        'centroid_lon': x + cell_size / 2,
+        'centroid_lat': y + cell_size / 2
+    }
+
+    handled = set(GRID_COLUMNS) | set(_block_count_columns(fine_gdf.columns))
+    block_count_col = f'{BLOCK_COUNT_PREFIX}{factor}'
+    if 'road_count' in fine_gdf.columns and block_count_col in fine_gdf.columns:
+        columns['road_count'] = block_sum(fine_gdf[block_count_col].to_numpy(dtype=float)).astype(np.int64)
+        handled.add('road_count')
+
+    for prefix in _moment_prefixes(fine_gdf.columns):
+        mean = fine_gdf[f'{prefix}_mean'].to_numpy(dtype=float)
+        std = fine_gdf[f'{prefix}_std'].to_numpy(dtype=float)
+        count_col = f'{prefix}_count'
+        if count_col in fine_gdf.columns:
+            count = fine_gdf[count_col].fillna(1).to_numpy(dtype=float)
+        else:
+            count = np.ones(len(fine_gdf))
+        weight = np.where(np.isnan(mean), 0, count)
+
+        total = block_sum(weight)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            block_mean = block_sum(np.where(weight > 0, mean * weight, 0)) / total
+            block_sq = block_sum(np.where(weight > 0, (std ** 2 + mean ** 2) * weight, 0)) / total
+        block_std = np.sqrt(np.clip(block_sq - block_mean ** 2, 0, None))
+        block_std[total == 0] = np.nan
+
+        columns[f'{prefix}_mean'] = block_mean
+        columns[f'{prefix}_std'] = block_std
+        handled |= {f'{prefix}_mean', f'{prefix}_std'}
+        if count_col in fine_gdf.columns:
+            columns[count_col] = total
+            handled.add(count_col)
+
+    for col in fine_gdf.columns:
+        if col in handled or not np.issubdtype(fine_gdf[col].dtype, np.number):
+            continue
+        values = fine_gdf[col].to_numpy(dtype=float)
+        present = ~np.isnan(values)
+        if col in SUM_COLUMNS or any(col.startswith(p) for p in SUM_PREFIXES):
+            columns[col] = block_sum(np.where(present, values, 0))
+            if np.issubdtype(fine_gdf[col].dtype, np.integer):
+                columns[col] = columns[col].astype(np.int64)
+        else:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                columns[col] = block_sum(np.where(present, values, 0)) / block_sum(present)
+
+    # Keep the fine grid's column order
+    order = [c for c in fine_gdf.columns if c in columns]
+    return gpd.GeoDataFrame({c: columns[c] for c in order}, geometry='geometry', crs=fine_gdf.crs)
+
+
+def build_pyramid(fine_gdf, levels):
+    """Aggregate every pyramid level, returning {name: (gdf, cell_size)}
+
+    ``levels`` maps level names to aggregation factors (1 = finest grid).
+    """
+    lattice = detect_lattice(fine_gdf)
+    if lattice is None:
+        raise ValueError("Grid is not a regular lattice; cannot build pyramid")
+
+    pyramid = {}
+    for name, factor in levels.items():
+        if factor == 1:
+            level_gdf = fine_gdf.drop(columns=_block_count_columns(fine_gdf.columns))
+        else:
+            level_gdf = aggregate_level(fine_gdf, factor)
+        pyramid[name] = (level_gdf, lattice.cell_size * factor)
+    return pyramid
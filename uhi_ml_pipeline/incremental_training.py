@@ -0,0 +1,366 @@
+"""Incremental training module: Update models from new training batches
+
+Every model matrix handed to this module (the features of a new Landsat
+scene, or new cells) is copied into the batch store under INCREMENTAL_DIR.
+Updates read only the batches the models have not seen yet:
+
+- XGBoost continues boosting from the saved booster
+- Random Forest grows more trees on the new rows (``warm_start`` for
+  sklearn forests; compact forests get the new trees appended)
+- Linear Regression is re-solved from sufficient statistics (XᵀX, Xᵀy)
+  accumulated over all batches
+
+New rows are scored by the current models before they are trained on,
+which gives an honest error estimate and, together with the shift of the
+column means, decides whether the update is safe. Past the drift
+thresholds every batch is retrained from scratch instead.
+"""
+
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from config import (
+    MODEL_FEATURES,
+    TARGET_COLUMN,
+    MODEL_MATRIX_FEATHER,
+    MODEL_EVALUATION_CSV,
+    FEATURE_IMPORTANCE_PNG,
+    MODEL_ARTIFACT_FORMAT,
+    MODEL_CANDIDATES,
+    RANDOM_STATE,
+    TEST_SIZE,
+    TRAINING_CORES,
+    TUNING_ENABLED,
+    INCREMENTAL_DIR,
+    INCREMENTAL_XGB_ROUNDS,
+    INCREMENTAL_RF_TREES,
+    INCREMENTAL_DRIFT_THRESHOLD,
+    INCREMENTAL_ERROR_THRESHOLD
+)
+from artifacts import read_model_matrix, resolution_path
+from pipeline_cache import file_digest
+from model_store import save_model, load_model, best_model_path, concat_forests
+from model_training import build_model, train_models, evaluate_model, plot_feature_importance
+from model_tuning import tune_models
+from instrumentation import measure
+
+
+STATE_FILE = 'state.json'
+BATCH_DIR = 'batches'
+MODEL_DIR = 'models'
+LINEAR_STATS = 'linear_stats.npz'
+COLUMNS = MODEL_FEATURES + [TARGET_COLUMN]
+
+
+def incremental_dir(resolution=None):
+    return resolution_path(INCREMENTAL_DIR, resolution)
+
+
+def state_path(resolution=None):
+    """State file: batches seen, column statistics, reference errors"""
+    return os.path.join(incremental_dir(resolution), STATE_FILE)
+
+
+def load_state(resolution=None):
+    path = state_path(resolution)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, resolution=None):
+    path = state_path(resolution)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def list_batches(resolution=None):
+    """Batch files in arrival order"""
+    batch_dir = os.path.join(incremental_dir(resolution), BATCH_DIR)
+    if not os.path.isdir(batch_dir):
+        return []
+    return sorted(f for f in os.listdir(batch_dir) if f.endswith('.feather'))
+
+
+def add_batch(matrix_path, resolution=None):
+    """Copy a model matrix into the batch store; returns its batch name
+
+    Batches are named by arrival number and content hash, so adding the
+    same matrix twice is a no-op.
+    """
+    digest = file_digest(matrix_path, {'files': {}})[:16]
+    batches = list_batches(resolution)
+    for name in batches:
+        if name.endswith(f'_{digest}.feather'):
+            return name
+    name = f'batch_{len(batches):05d}_{digest}.feather'
+    batch_dir = os.path.join(incremental_dir(resolution), BATCH_DIR)
+    os.makedirs(batch_dir, exist_ok=True)
+    shutil.copyfile(matrix_path, os.path.join(batch_dir, name))
+    return name
+
+
+def read_batches(names, resolution=None):
+    """Model columns of the given batches, rows with missing values dropped"""
+    batch_dir = os.path.join(incremental_dir(resolution), BATCH_DIR)
+    df = pd.concat(
+        [read_model_matrix(os.path.join(batch_dir, name), columns=COLUMNS) for name in names],
+        ignore_index=True
+    ).dropna()
+    return df[MODEL_FEATURES], df[TARGET_COLUMN]
+
+
+def column_stats(df):
+    """Count, mean and sum of squared deviations of every column"""
+    values = df.to_numpy(dtype=np.float64)
+    mean = values.mean(axis=0)
+    return {
+        'count': len(values),
+        'mean': mean.tolist(),
+        'm2': ((values - mean) ** 2).sum(axis=0).tolist()
+    }
+
+
+def merge_stats(a, b):
+    """Column statistics of two row sets combined (Chan et al.)"""
+    n = a['count'] + b['count']
+    mean_a, mean_b = np.array(a['mean']), np.array(b['mean'])
+    delta = mean_b - mean_a
+    return {
+        'count': n,
+        'mean': (mean_a + delta * b['count'] / n).tolist(),
+        'm2': (np.array(a['m2']) + np.array(b['m2']) +
+               delta ** 2 * a['count'] * b['count'] / n).tolist()
+    }
+
+
+def mean_shift(reference, new):
+    """Largest shift of a column mean, in reference standard deviations"""
+    std = np.sqrt(np.array(reference['m2']) / max(reference['count'], 1))
+    shift = np.abs(np.array(new['mean']) - np.array(reference['mean'])) / np.where(std > 0, std, 1)
+    return float(shift.max())
+
+
+def linear_stats(X, y):
+    """Sufficient statistics of least squares with an intercept column"""
+    A = np.column_stack([np.asarray(X, dtype=np.float64), np.ones(len(X))])
+    return A.T @ A, A.T @ np.asarray(y, dtype=np.float64)
+
+
+def solve_linear(xtx, xty):
+    """LinearRegression from accumulated XᵀX and Xᵀy"""
+    from sklearn.linear_model import LinearRegression
+    
+    beta = np.linalg.lstsq(xtx, xty, rcond=None)[0]
+    model = LinearRegression()
+    model.coef_ = beta[:-1]
+    model.intercept_ = float(beta[-1])
+    model.n_features_in_ = len(MODEL_FEATURES)
+    model.feature_names_in_ = np.array(MODEL_FEATURES, dtype=object)
+    return model
+
+
+def grow_forest(model, params, X, y):
+    """Add INCREMENTAL_RF_TREES trees fitted on the new rows"""
+    from sklearn.ensemble import RandomForestRegressor
+    
+    if isinstance(model, RandomForestRegressor):
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + INCREMENTAL_RF_TREES,
+                         n_jobs=TRAINING_CORES)
+        model.fit(X, y)
+        return model
+    new_trees = build_model('random_forest', dict(params, n_estimators=INCREMENTAL_RF_TREES),
+                            n_jobs=TRAINING_CORES)
+    new_trees.fit(X, y)
+    return concat_forests(model, new_trees, MODEL_FEATURES)
+
+
+def continue_boosting(model, params, X, y):
+    """Boost INCREMENTAL_XGB_ROUNDS more rounds from the saved booster"""
+    updated = build_model('xgboost', dict(params, n_estimators=INCREMENTAL_XGB_ROUNDS),
+                          n_jobs=TRAINING_CORES)
+    updated.fit(X, y, xgb_model=model.get_booster())
+    return updated
+
+
+def model_path(name, resolution=None):
+    """Artifact path of a candidate in the incremental model store"""
+    slug = name.lower().replace(' ', '_')
+    path = os.path.join(incremental_dir(resolution), MODEL_DIR, slug)
+    return path if MODEL_ARTIFACT_FORMAT == 'compact' else path + '.pkl'
+
+
+def store_model(model, path, name):
+    if MODEL_ARTIFACT_FORMAT == 'compact':
+        save_model(model, path, MODEL_FEATURES, name=name)
+    else:
+        import joblib
+        joblib.dump(model, path)
+
+
+def full_retrain(batches, resolution=None):
+    """Train every candidate from scratch on all batches; returns (results_df, models, state)"""
+    print(f"\nFull retrain on {len(batches)} batch(es)...")
+    X, y = read_batches(batches, resolution)
+    from sklearn.model_selection import train_test_split
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
+    )
+    print(f"✓ Train size: {len(X_train)}, Test size: {len(X_test)}")
+
+    candidates = MODEL_CANDIDATES
+    if TUNING_ENABLED:
+        candidates = tune_models(X_train, y_train, candidates, resolution)
+    results_df, models = train_models(
+        X_train, X_test, y_train, y_test, MODEL_FEATURES, candidates=candidates
+    )
+
+    xtx, xty = linear_stats(X_train, y_train)
+    np.savez(os.path.join(incremental_dir(resolution), LINEAR_STATS), xtx=xtx, xty=xty)
+    state = {
+        'batches': list(batches),
+        'candidates': {name: list(candidate) for name, candidate in candidates.items()},
+        'stats': column_stats(pd.concat([X, y], axis=1)),
+        'reference_rmse': dict(zip(results_df['Model'], results_df['Test_RMSE'])),
+        'rows_trained': len(X_train),
+        'mode': 'full'
+    }
+    results_df.insert(1, 'Mode', 'full')
+    results_df.insert(2, 'Rows', len(X_train))
+    return results_df, models, state
+
+
+def incremental_update(state, new_batches, resolution=None, force_full=False):
+    """Update the stored models from new batches, or retrain past the drift thresholds
+
+    Returns (results_df, models, state), or None when there is nothing new.
+    """
+    if state is None or force_full:
+        return full_retrain(list_batches(resolution), resolution)
+    if not new_batches:
+        return None
+
+    X_new, y_new = read_batches(new_batches, resolution)
+    print(f"\nNew batch(es): {', '.join(new_batches)} ({len(X_new)} rows)")
+    new_stats = column_stats(pd.concat([X_new, y_new], axis=1))
+    shift = mean_shift(state['stats'], new_stats)
+
+    # Score the new rows before training on them
+    candidates = {name: tuple(candidate) for name, candidate in state['candidates'].items()}
+    models = {name: load_model(model_path(name, resolution)) for name in candidates}
+    before = {name: evaluate_model(name, model, X_new, X_new, y_new, y_new)
+              for name, model in models.items()}
+    error_ratio = max(before[name]['Test_RMSE'] / state['reference_rmse'][name]
+                      for name in candidates)
+    print(f"  Mean shift: {shift:.2f} std (threshold {INCREMENTAL_DRIFT_THRESHOLD}) | "
+          f"RMSE ratio: {error_ratio:.2f} (threshold {INCREMENTAL_ERROR_THRESHOLD})")
+
+    if shift > INCREMENTAL_DRIFT_THRESHOLD or error_ratio > INCREMENTAL_ERROR_THRESHOLD:
+        print("  Drift threshold exceeded, retraining from scratch")
+        return full_retrain(list_batches(resolution), resolution)
+
+    print("\nUpdating models from the new rows...")
+    stats_path = os.path.join(incremental_dir(resolution), LINEAR_STATS)
+    linear = np.load(stats_path)
+    xtx_new, xty_new = linear_stats(X_new, y_new)
+    xtx, xty = linear['xtx'] + xtx_new, linear['xty'] + xty_new
+
+    results = []
+    for name, (estimator, params) in candidates.items():
+        with measure(f'update:{name}', rows=len(X_new)):
+            if estimator == 'xgboost':
+                models[name] = continue_boosting(models[name], params, X_new, y_new)
+            elif estimator == 'random_forest':
+                models[name] = grow_forest(models[name], params, X_new, y_new)
+            elif estimator == 'linear_regression':
+                models[name] = solve_linear(xtx, xty)
+            else:
+                raise ValueError(f"No incremental update for estimator '{estimator}'")
+
+        # Train_* = after the update, Test_* = new rows before the update
+        after = evaluate_model(name, models[name], X_new, X_new, y_new, y_new)
+        result = {key: value for key, value in after.items() if not key.startswith('Test_')}
+        result.update({key: value for key, value in before[name].items() if key.startswith('Test_')})
+        results.append(result)
+        print(f"  ✓ {name}: R² on new rows {before[name]['Test_R2']:.4f} before, "
+              f"{after['Train_R2']:.4f} after the update")
+
+    np.savez(stats_path, xtx=xtx, xty=xty)
+    state = dict(
+        state,
+        batches=state['batches'] + list(new_batches),
+        stats=merge_stats(state['stats'], new_stats),
+        rows_trained=state['rows_trained'] + len(X_new),
+        mode='incremental'
+    )
+    results_df = pd.DataFrame(results)
+    results_df.insert(1, 'Mode', 'incremental')
+    results_df.insert(2, 'Rows', state['rows_trained'])
+    return results_df, models, state
+
+
+def update_models(resolution=None, matrix_path=None, force_full=False):
+    """Add the current model matrix as a batch and update the models
+
+    ``matrix_path`` defaults to the pipeline's model matrix. The best model
+    (by test R², on the new rows for incremental updates) is written where
+    the full training phase writes it.
+    """
+    print("=" * 60)
+    print("PHASE 3: INCREMENTAL MODEL TRAINING")
+    if resolution is not None:
+        print(f"Resolution: {resolution}")
+    print("=" * 60)
+
+    os.makedirs(os.path.join(incremental_dir(resolution), MODEL_DIR), exist_ok=True)
+    matrix_path = matrix_path or resolution_path(MODEL_MATRIX_FEATHER, resolution)
+    print(f"✓ Training batch: {add_batch(matrix_path, resolution)}")
+
+    state = load_state(resolution)
+    seen = set(state['batches']) if state else set()
+    new_batches = [name for name in list_batches(resolution) if name not in seen]
+    update = incremental_update(state, new_batches, resolution, force_full)
+    if update is None:
+        print("✓ No new batches, models are up to date\n")
+        return None
+    results_df, models, state = update
+
+    for name, model in models.items():
+        store_model(model, model_path(name, resolution), name)
+    save_state(state, resolution)
+
+    evaluation_path = resolution_path(MODEL_EVALUATION_CSV, resolution)
+    results_df.to_csv(evaluation_path, index=False)
+    print(f"\n✓ Model evaluation results saved to: {evaluation_path}")
+
+    best = results_df.loc[results_df['Test_R2'].idxmax()]
+    best_model = models[best['Model']]
+    model_path_out = best_model_path(resolution)
+    store_model(best_model, model_path_out, best['Model'])
+    print(f"\n✓ Best model: {best['Model']} (Test R²: {best['Test_R2']:.4f})")
+    print(f"✓ Best model saved to: {model_path_out}")
+
+    plot_feature_importance(
+        best_model, MODEL_FEATURES, best['Model'],
+        output_path=resolution_path(FEATURE_IMPORTANCE_PNG, resolution)
+    )
+    print(f"\n✓ Models trained on {state['rows_trained']} rows "
+          f"from {len(state['batches'])} batch(es)\n")
+    return best_model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the UHI models from new training batches")
+    parser.add_argument('matrix', nargs='?', default=None,
+                        help='Model matrix (Feather) to add as a batch; default: the pipeline output')
+    parser.add_argument('--resolution', default=None, help='Grid pyramid level')
+    parser.add_argument('--full', action='store_true', help='Retrain from scratch on all batches')
+    args = parser.parse_args()
+    update_models(args.resolution, args.matrix, args.full)
@@ -0,0 +1,290 @@
+"""Instrumentation module: Time, memory and throughput of pipeline steps
+
+Phases and their sub-steps (grid build, each feature extractor, each model
+fit, each renderer) run inside ``measure``, which records wall time, CPU
+time, peak resident memory and rows per second. Records are kept per
+process: steps run in worker processes hand theirs back to the parent
+with collect_records / add_records. write_report saves the records of a
+run as JSON and CSV.
+
+With PROFILE_MODE set, every phase also runs under a profiler and its
+profile is written to PROFILE_DIR: 'cprofile' writes <phase>.prof (for
+pstats or snakeviz), 'sampling' samples the stack of every thread each
+PROFILE_SAMPLE_INTERVAL seconds and writes <phase>.folded collapsed
+stacks (for flamegraph.pl or speedscope) at a much lower overhead.
+cProfile only traces the main thread. Neither profiler sees worker
+processes: their time shows up as the parent waiting on the pool, and
+their steps only appear in the run report.
+"""
+
+import csv
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import PROFILE_MODE, PROFILE_SAMPLE_INTERVAL, PROFILE_DIR
+
+
+# Resident memory is sampled this often while a step runs (seconds)
+MEMORY_SAMPLE_INTERVAL = 0.005
+
+REPORT_COLUMNS = [
+    'phase', 'step', 'status', 'rows', 'wall_seconds', 'cpu_seconds',
+    'peak_rss_mb', 'rows_per_second', 'pid'
+]
+
+# Records of this process, and the phase new records belong to
+_records = []
+_lock = threading.Lock()
+_current_phase = None
+
+
+def rss_bytes():
+    """Current resident set size of this process (Linux), None elsewhere"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+class PeakMemory:
+    """Peak resident memory of this process while the block runs
+
+    RSS is sampled from a background thread; where it cannot be read, the
+    process's lifetime peak (getrusage) is reported instead. Memory of
+    worker processes is not included.
+    """
+
+    def __init__(self, interval=MEMORY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.start = self.peak = None
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __enter__(self):
+        self.start = self.peak = rss_bytes()
+        if self.start is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True,
+                                            name='instrumentation-memory')
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is None:
+            peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.start, self.peak = 0, peak_kb * 1024
+            return False
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+        return False
+
+
+def _cpu_seconds():
+    """CPU time of this process and its finished child processes"""
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+@contextmanager
+def measure(step, rows=None):
+    """Record wall time, CPU time, peak memory and throughput of a block
+
+    Yields the record; set ``record['rows']`` inside the block when the
+    row count is only known there. CPU time and memory are those of the
+    whole process (plus worker processes that finished during the block),
+    so steps running concurrently in threads share them.
+    """
+    record = {'phase': _current_phase, 'step': step, 'status': 'ok', 'rows': rows,
+              'pid': os.getpid()}
+    cpu_start = _cpu_seconds()
+    memory = PeakMemory()
+    start = time.perf_counter()
+    try:
+        with memory:
+            yield record
+    except BaseException:
+        record['status'] = 'failed'
+        raise
+    finally:
+        wall = time.perf_counter() - start
+        record['wall_seconds'] = wall
+        record['cpu_seconds'] = _cpu_seconds() - cpu_start
+        record['peak_rss_mb'] = memory.peak / 1e6
+        record['rows_per_second'] = record['rows'] / wall if record['rows'] and wall > 0 else None
+        with _lock:
+            _records.append(record)
+
+
+def collect_records():
+    """Remove and return the records made in this process (to send them to the parent)
+
+    Forked worker processes start with a copy of the parent's records;
+    those are dropped, not returned.
+    """
+    pid = os.getpid()
+    with _lock:
+        records = [r for r in _records if r['pid'] == pid]
+        _records.clear()
+    return records
+
+
+def add_records(records):
+    """Add records from a worker process to the current phase"""
+    with _lock:
+        for record in records:
+            _records.append(dict(record, phase=_current_phase))
+
+
+def reset():
+    """Drop all records (start of a run)"""
+    with _lock:
+        _records.clear()
+
+
+class StackSampler:
+    """Sampling profiler: counts every thread's stacks from a background thread
+
+    Each stack starts with a 'thread:<name>' frame, so threads can be told
+    apart (or folded together) in the flame graph. Instrumentation's own
+    threads are left out.
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, str(ident))
+                if name.startswith('instrumentation-'):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    stack.append(f"thread:{name}")
+                    self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='instrumentation-sampler')
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        """Write collapsed stacks: '<frame;frame;...> <samples>' per line"""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def phase(name, profile=PROFILE_MODE, profile_dir=PROFILE_DIR):
+    """Measure a pipeline phase, optionally under a profiler
+
+    Records made during the phase (also in threads, and those added from
+    worker processes) belong to it. The phase's rows are the largest row
+    count among its steps.
+    """
+    global _current_phase
+    if profile not in (None, 'cprofile', 'sampling'):
+        raise ValueError(f"Unknown profile mode: {profile}")
+
+    _current_phase = name
+    profiler = None
+    if profile == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif profile == 'sampling':
+        profiler = StackSampler()
+        profiler.start()
+    try:
+        with measure('total') as record:
+            yield record
+        # Steps sample memory on their own schedule; keep the phase's peak
+        # at least as high as theirs
+        with _lock:
+            steps = [r for r in _records if r['phase'] == name and r is not record]
+        rows = [r['rows'] for r in steps if r['rows']]
+        record['rows'] = max(rows) if rows else None
+        own_peaks = [r['peak_rss_mb'] for r in steps if r['pid'] == record['pid']]
+        record['peak_rss_mb'] = max([record['peak_rss_mb']] + own_peaks)
+        if record['rows']:
+            record['rows_per_second'] = record['rows'] / record['wall_seconds']
+    finally:
+        if profiler is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+            if profile == 'cprofile':
+                profiler.disable()
+                path = os.path.join(profile_dir, f'{name}.prof')
+                profiler.dump_stats(path)
+            else:
+                profiler.stop()
+                path = os.path.join(profile_dir, f'{name}.folded')
+                profiler.dump(path)
+            print(f"  Profile saved to: {path}")
+        _current_phase = None
+
+
+def record_skipped(name):
+    """Record a phase skipped because its outputs are up to date"""
+    with _lock:
+        _records.append({'phase': name, 'step': 'total', 'status': 'skipped', 'rows': None,
+                         'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'peak_rss_mb': None,
+                         'rows_per_second': None, 'pid': os.getpid()})
+
+
+def write_report(json_path, csv_path, started, **meta):
+    """Write this run's records as JSON (with run metadata) and CSV"""
+    with _lock:
+        records = list(_records)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report = {
+        'started': started.isoformat(timespec='seconds'),
+        'finished': datetime.now().isoformat(timespec='seconds'),
+        'peak_rss_mb': peak_kb * 1024 / 1e6,
+        **meta,
+        'steps': records
+    }
+    with open(json_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(records)
+    return records
+
+
+def print_summary(records):
+    """Table of phase totals"""
+    print(f"{'phase':<24} {'wall (s)':>9} {'cpu (s)':>9} {'peak MB':>9} {'rows/s':>11}")
+    for r in records:
+        if r['step'] != 'total':
+            continue
+        if r['status'] == 'skipped':
+            print(f"{r['phase']:<24} {'skipped':>9}")
+            continue
+        peak = f"{r['peak_rss_mb']:.0f}" if r['peak_rss_mb'] is not None else '-'
+        rate = f"{r['rows_per_second']:.0f}" if r['rows_per_second'] else '-'
+        print(f"{r['phase']:<24} {r['wall_seconds']:>9.2f} {r['cpu_seconds']:>9.2f} "
+              f"{peak:>9} {rate:>11}")
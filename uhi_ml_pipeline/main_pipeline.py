@@ -1,19 +1,260 @@
 #!/usr/bin/env python3
-"""Main pipeline script: End-to-end UHI prediction workflow"""
+"""Main pipeline script: End-to-end UHI prediction workflow
+
+Each step of the pipeline is a subcommand (grid, features, train, predict,
+render; 'all' runs every step). Phase modules are imported only when their
+phase runs, so a subcommand loads just the libraries it needs (no osmnx
+or XGBoost to render maps, no matplotlib or folium to build the grid).
+"""
 
 import sys
 import os
 import time
+import argparse
+import importlib
 from datetime import datetime
 
 # Add current directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from data_preparation import prepare_data
-from feature_extraction import extract_all_features
-from model_training import train_and_evaluate
-from visualization import create_visualizations
-from config import OUTPUT_DIR, LANDSAT_LST_PATH, LANDSAT_NDVI_PATH
+from config import (
+    BASE_DIR,
+    OUTPUT_DIR,
+    LANDSAT_LST_PATH,
+    LANDSAT_NDVI_PATH,
+    GRID_PARQUET,
+    FEATURES_PARQUET,
+    MODEL_MATRIX_FEATHER,
+    GRID_SHAPEFILE,
+    FEATURES_CSV,
+    FEATURES_GEOJSON,
+    EXPORT_TEXT_ARTIFACTS,
+    MODEL_EVALUATION_CSV,
+    FEATURE_IMPORTANCE_PNG,
+    PREDICTIONS_FEATHER,
+    UHI_HEATMAP_PNG,
+    UHI_INTERACTIVE_MAP,
+    OSM_BUILDINGS_PATH,
+    OSM_ROADS_PATH,
+    PIPELINE_MANIFEST,
+    PYRAMID_ENABLED,
+    PYRAMID_LEVELS,
+    UHI_TILES_DIR,
+    EXPORT_MAP_TILES,
+    TUNING_ENABLED,
+    TUNING_BEST_CONFIG_JSON,
+    TUNING_TRIALS_CSV,
+    SPATIAL_CV_ENABLED,
+    SPATIAL_CV_FOLDS_CSV,
+    SPATIAL_CV_SUMMARY_CSV,
+    INCREMENTAL_TRAINING,
+    RUN_REPORT_JSON,
+    RUN_REPORT_CSV,
+    PROFILE_MODE
+)
+from artifacts import resolution_path
+import instrumentation
+from model_store import best_model_path, model_artifact_file
+from pipeline_cache import (
+    load_manifest,
+    save_manifest,
+    phase_key,
+    is_phase_current,
+    record_phase
+)
+
+
+def _sources(*modules):
+    """Source files of pipeline modules (code changes invalidate a phase)"""
+    return [os.path.join(BASE_DIR, f'{m}.py') for m in ('config', 'artifacts') + modules]
+
+
+def _lazy(module, function, *args):
+    """Phase runner that imports ``module`` only when the phase runs"""
+    def run():
+        return getattr(importlib.import_module(module), function)(*args)
+    run.module = module
+    return run
+
+
+def _text_exports(*paths):
+    """Optional CSV/GeoJSON exports, tracked only when enabled"""
+    return list(paths) if EXPORT_TEXT_ARTIFACTS else []
+
+
+# Grid resolutions the model is trained and mapped at (None = single grid)
+RESOLUTIONS = list(PYRAMID_LEVELS) if PYRAMID_ENABLED else [None]
+
+
+def _per_level(*paths):
+    """Artifact paths for every grid resolution"""
+    return [resolution_path(p, res) for res in RESOLUTIONS for p in paths]
+
+
+def _tile_manifest(resolution):
+    """Tile pyramid manifest (digests of all tiles), tracked when tiles are exported"""
+    if not EXPORT_MAP_TILES:
+        return []
+    from map_tiles import TILE_MANIFEST
+    return [os.path.join(resolution_path(UHI_TILES_DIR, resolution), TILE_MANIFEST)]
+
+
+def _tuning_outputs(resolution):
+    """Hyperparameter search results, tracked when tuning is enabled"""
+    if not TUNING_ENABLED:
+        return []
+    return [
+        resolution_path(TUNING_BEST_CONFIG_JSON, resolution),
+        resolution_path(TUNING_TRIALS_CSV, resolution)
+    ]
+
+
+def _spatial_cv_outputs(resolution):
+    """Spatial cross-validation results, tracked when spatial CV is enabled"""
+    if not SPATIAL_CV_ENABLED or INCREMENTAL_TRAINING:
+        return []
+    return [
+        resolution_path(SPATIAL_CV_FOLDS_CSV, resolution),
+        resolution_path(SPATIAL_CV_SUMMARY_CSV, resolution)
+    ]
+
+
+def _level_phase(name, title, resolution):
+    """Phase name and title qualified by the grid resolution"""
+    if resolution is None:
+        return name, title
+    return f'{name}_{resolution}', f'{title} ({resolution})'
+
+
+def _train_phase(resolution):
+    name, title = _level_phase('train', 'MODEL TRAINING', resolution)
+    if INCREMENTAL_TRAINING:
+        # Each new model matrix becomes a batch the stored models learn from
+        from incremental_training import state_path
+        run = _lazy('incremental_training', 'update_models', resolution)
+        state = [state_path(resolution)]
+    else:
+        run, state = _lazy('model_training', 'train_and_evaluate', resolution), []
+    return {
+        'name': name,
+        'title': title,
+        'command': 'train',
+        'run': run,
+        'config': [
+            'RANDOM_STATE', 'TEST_SIZE', 'MODEL_CANDIDATES', 'MODEL_ARTIFACT_FORMAT',
+            'TUNING_ENABLED', 'TUNING_SPACE', 'TUNING_N_CONFIGS', 'TUNING_ETA',
+            'TUNING_MIN_ROWS', 'TUNING_VALIDATION_SIZE', 'TUNING_EARLY_STOPPING_ROUNDS',
+            'TUNING_TIME_BUDGET', 'TUNING_CPU_BUDGET', 'SPATIAL_CV_ENABLED',
+            'SPATIAL_CV_FOLDS', 'SPATIAL_CV_BLOCK_DEGREES', 'SPATIAL_CV_TIME_BUDGET',
+            'INCREMENTAL_TRAINING', 'INCREMENTAL_XGB_ROUNDS', 'INCREMENTAL_RF_TREES',
+            'INCREMENTAL_DRIFT_THRESHOLD', 'INCREMENTAL_ERROR_THRESHOLD'
+        ],
+        'inputs': [resolution_path(MODEL_MATRIX_FEATHER, resolution)] +
+                  _sources('model_training', 'model_store', 'model_tuning', 'spatial_cv',
+                           'incremental_training'),
+        'outputs': [
+            resolution_path(MODEL_EVALUATION_CSV, resolution),
+            model_artifact_file(best_model_path(resolution)),
+            resolution_path(FEATURE_IMPORTANCE_PNG, resolution)
+        ] + _tuning_outputs(resolution) + _spatial_cv_outputs(resolution) + state
+    }
+
+
+def _predict_phase(resolution):
+    name, title = _level_phase('predict', 'PREDICTION', resolution)
+    return {
+        'name': name,
+        'title': title,
+        'command': 'predict',
+        'run': _lazy('visualization', 'predict_uhi', resolution),
+        'config': ['MODEL_FEATURES', 'TARGET_COLUMN'],
+        'inputs': [
+            resolution_path(FEATURES_PARQUET, resolution),
+            model_artifact_file(best_model_path(resolution))
+        ] + _sources('visualization', 'model_store'),
+        'outputs': [resolution_path(PREDICTIONS_FEATHER, resolution)]
+    }
+
+
+def _visualize_phase(resolution):
+    name, title = _level_phase('visualize', 'VISUALIZATION', resolution)
+    return {
+        'name': name,
+        'title': title,
+        'command': 'render',
+        'run': _lazy('visualization', 'create_visualizations', resolution),
+        'config': [
+            'STATIC_HEATMAP_MODE', 'STATIC_HEATMAP_EDGES',
+            'MAP_COORD_PRECISION', 'MAP_COLOR_STEPS', 'EXPORT_MAP_TILES',
+            'MAP_USE_TILES', 'TILE_ZOOM_LEVELS'
+        ],
+        'inputs': [
+            resolution_path(FEATURES_PARQUET, resolution),
+            resolution_path(PREDICTIONS_FEATHER, resolution)
+        ] + _sources('visualization', 'map_tiles', 'grid_lattice'),
+        'outputs': [
+            resolution_path(UHI_HEATMAP_PNG, resolution),
+            resolution_path(UHI_INTERACTIVE_MAP, resolution)
+        ] + _tile_manifest(resolution)
+    }
+
+
+# Pipeline phases in execution order. Each phase is keyed by the config
+# values and input files it reads; it is skipped while the key and its
+# outputs are unchanged since the last run. With the grid pyramid enabled,
+# training, prediction and visualization run once per resolution level.
+# 'command' is the CLI subcommand that runs the phase.
+PHASES = [
+    {
+        'name': 'prepare',
+        'title': 'DATA PREPARATION',
+        'command': 'grid',
+        'run': _lazy('data_preparation', 'prepare_data'),
+        'config': [
+            'BENGALURU_BOUNDS', 'GRID_SIZE_DEGREES', 'PYRAMID_ENABLED',
+            'PYRAMID_BASE_CELL_DEGREES', 'EXPORT_TEXT_ARTIFACTS'
+        ],
+        'inputs': _sources('data_preparation'),
+        'outputs': [GRID_PARQUET] + _text_exports(GRID_SHAPEFILE)
+    },
+    {
+        'name': 'features',
+        'title': 'FEATURE EXTRACTION',
+        'command': 'features',
+        'run': _lazy('feature_extraction', 'extract_all_features'),
+        'config': [
+            'GRID_SIZE_DEGREES', 'PYRAMID_ENABLED', 'PYRAMID_BASE_CELL_DEGREES',
+            'PYRAMID_LEVELS', 'ZONAL_STATS_ENGINE', 'RASTER_STREAMING',
+            'PIXEL_INDEX_FRACTIONAL', 'PIXEL_INDEX_SUPERSAMPLE', 'OSM_BUILDINGS_LAYER',
+            'OSM_ROADS_LAYER', 'ROAD_CLASSES', 'ROAD_LENGTH_BY_CLASS', 'METRIC_CRS',
+            'ROAD_WIDTH_METERS', 'MODEL_FEATURES', 'TARGET_COLUMN', 'EXPORT_TEXT_ARTIFACTS'
+        ],
+        'inputs': [
+            GRID_PARQUET, LANDSAT_LST_PATH, LANDSAT_NDVI_PATH,
+            OSM_BUILDINGS_PATH, OSM_ROADS_PATH
+        ] + _sources('feature_extraction', 'grid_lattice', 'raster_zonal', 'pixel_index',
+                   'osm_features', 'grid_pyramid'),
+        'outputs': _per_level(FEATURES_PARQUET, MODEL_MATRIX_FEATHER) +
+                   _text_exports(*_per_level(FEATURES_CSV, FEATURES_GEOJSON))
+    }
+] + [_train_phase(res) for res in RESOLUTIONS] + [_predict_phase(res) for res in RESOLUTIONS] + \
+    [_visualize_phase(res) for res in RESOLUTIONS]
+PHASE_NAMES = [phase['name'] for phase in PHASES]
+
+# CLI subcommands in pipeline order ('all' runs every phase)
+COMMANDS = list(dict.fromkeys(phase['command'] for phase in PHASES))
+
+
+def check_upstream(phase, phases=PHASES):
+    """Raise FileNotFoundError when an artifact another step writes is missing"""
+    for path in phase['inputs']:
+        if os.path.exists(path):
+            continue
+        for upstream in phases:
+            if path in upstream['outputs']:
+                raise FileNotFoundError(
+                    f"{path} not found; run 'python main_pipeline.py {upstream['command']}' first"
+                )
 
 
 def print_header():
@@ -46,13 +287,29 @@ def check_data_availability():
     
     if lst_exists and ndvi_exists:
         print("✓ LANDSAT data files found\n")
-    
-    time.sleep(2)
 
 
-def run_pipeline():
-    """Execute the complete UHI prediction pipeline"""
+def write_run_report(started, status):
+    """Write the instrumentation records of this run to RUN_REPORT_JSON/CSV"""
+    return instrumentation.write_report(
+        RUN_REPORT_JSON, RUN_REPORT_CSV, started,
+        status=status, argv=sys.argv, cpu_count=os.cpu_count()
+    )
+
+
+def run_pipeline(force=False, from_phase=None, profile=PROFILE_MODE, commands=None):
+    """Execute the complete UHI prediction pipeline
     
+    Phases whose inputs and outputs are unchanged since the last run are
+    skipped. ``force`` re-runs every phase; ``from_phase`` re-runs the named
+    phase and all phases after it. ``commands`` limits the run to the
+    phases of these subcommands (None = all). Time, memory and throughput
+    of every phase and step go to the run report; ``profile`` ('cprofile'
+    or 'sampling') also writes a profile per phase.
+    """
+    
+    started = datetime.now()
+    instrumentation.reset()
     try:
         start_time = time.time()
         
@@ -60,23 +317,33 @@ def run_pipeline():
         print_header()
         
         # Check data availability
-        check_data_availability()
-        
-        # Phase 1: Data Preparation
-        print("\n" + "▶" * 3 + " STARTING PHASE 1: DATA PREPARATION " + "▶" * 3)
-        grid, boundary = prepare_data()
-        
-        # Phase 2: Feature Extraction
-        print("\n" + "▶" * 3 + " STARTING PHASE 2: FEATURE EXTRACTION " + "▶" * 3)
-        grid_with_features = extract_all_features()
+        if commands is None or 'features' in commands:
+            check_data_availability()
         
-        # Phase 3: Model Training
-        print("\n" + "▶" * 3 + " STARTING PHASE 3: MODEL TRAINING " + "▶" * 3)
-        model, features, X, y = train_and_evaluate()
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        manifest = load_manifest(PIPELINE_MANIFEST)
+        rerun_from = PHASE_NAMES.index(from_phase) if from_phase else len(PHASES)
         
-        # Phase 4: Visualization
-        print("\n" + "▶" * 3 + " STARTING PHASE 4: VISUALIZATION " + "▶" * 3)
-        gdf_with_predictions = create_visualizations()
+        for number, phase in enumerate(PHASES, start=1):
+            if commands is not None and phase['command'] not in commands:
+                continue
+            check_upstream(phase)
+            
+            # Keys are computed in order, so upstream outputs are final here
+            key = phase_key(phase['config'], phase['inputs'], manifest)
+            
+            if (not force and number - 1 < rerun_from and
+                    is_phase_current(manifest, phase['name'], key, phase['outputs'])):
+                print(f"\n✓ Skipping PHASE {number}: {phase['title']} (outputs up to date)")
+                instrumentation.record_skipped(phase['name'])
+                continue
+            
+            print("\n" + "▶" * 3 + f" STARTING PHASE {number}: {phase['title']} " + "▶" * 3)
+            with instrumentation.phase(phase['name'], profile=profile):
+                phase['run']()
+            
+            record_phase(manifest, phase['name'], key, phase['outputs'])
+            save_manifest(manifest, PIPELINE_MANIFEST)
         
         # Success summary
         elapsed_time = time.time() - start_time
@@ -84,17 +351,30 @@ def run_pipeline():
         print("\n" + "=" * 60)
         print("✅ PIPELINE EXECUTION COMPLETE!")
         print("=" * 60)
-        print(f"Total execution time: {elapsed_time:.2f} seconds ({elapsed_time/60:.2f} minutes)")
+        print(f"Total execution time: {elapsed_time:.2f} seconds ({elapsed_time/60:.2f} minutes)\n")
+        instrumentation.print_summary(write_run_report(started, 'complete'))
+        print(f"✓ Run report saved to: {RUN_REPORT_JSON}, {RUN_REPORT_CSV}")
+        if commands is not None:
+            print(f"\nSteps run: {', '.join(commands)}; outputs saved to: {OUTPUT_DIR}\n")
+            return True
         print(f"\nAll outputs saved to: {OUTPUT_DIR}")
         print("\nGenerated files:")
-        print(f"  1. bengaluru_grid.geojson - Grid cells")
-        print(f"  2. features.csv - Extracted features")
-        print(f"  3. features.geojson - Features with geometry")
+        print(f"  1. bengaluru_grid.parquet - Grid cells (GeoParquet)")
+        print(f"  2. features.parquet - Features with geometry (GeoParquet)")
+        print(f"  3. model_matrix.feather - Model features and target (Feather)")
         print(f"  4. model_evaluation.csv - Model performance metrics")
-        print(f"  5. best_model.pkl - Trained model")
+        print(f"  5. {os.path.basename(best_model_path())} - Trained model")
         print(f"  6. feature_importance.png - Feature importance plot")
-        print(f"  7. uhi_heatmap.png - Static UHI intensity map")
-        print(f"  8. uhi_interactive_map.html - Interactive map (open in browser)")
+        print(f"  7. predictions.feather - Predicted UHI intensity per cell")
+        print(f"  8. uhi_heatmap.png - Static UHI intensity map")
+        print(f"  9. uhi_interactive_map.html - Interactive map (open in browser)")
+        if EXPORT_TEXT_ARTIFACTS:
+            print(f"  Also exported: bengaluru_grid.geojson, features.csv, features.geojson")
+        if EXPORT_MAP_TILES:
+            print(f"  Also rendered: uhi_tiles/ - XYZ PNG tile pyramid of the UHI map")
+        if PYRAMID_ENABLED:
+            print(f"  Files 2-9 are written per resolution with suffixes: "
+                  f"{', '.join('_' + res for res in RESOLUTIONS)}")
         
         print("\n" + "=" * 60)
         print("✓ Next Steps:")
@@ -111,9 +391,47 @@ def run_pipeline():
         print(f"Error message: {str(e)}")
         import traceback
         traceback.print_exc()
+        if os.path.isdir(OUTPUT_DIR):
+            write_run_report(started, 'failed')
+            print(f"Run report (up to the failure) saved to: {RUN_REPORT_JSON}")
         return False
 
 
+COMMAND_HELP = {
+    'grid': 'Build the analysis grid',
+    'features': 'Extract raster and OSM features per cell',
+    'train': 'Train and evaluate the models',
+    'predict': 'Predict UHI intensity for every cell',
+    'render': 'Draw the static, tiled and interactive maps',
+    'all': 'Run every step (default)'
+}
+
+
+def parse_args(argv=None):
+    """Parse the CLI; without a subcommand the whole pipeline runs"""
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument('--force', action='store_true',
+                         help='Re-run every phase even if its outputs are up to date')
+    options.add_argument('--from-phase', choices=PHASE_NAMES,
+                         help='Re-run this phase and all later phases')
+    options.add_argument('--profile', choices=['cprofile', 'sampling'], default=PROFILE_MODE,
+                         help='Write a profile of every phase run to the profiles directory')
+    
+    parser = argparse.ArgumentParser(description="Run the UHI prediction pipeline")
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    for command in COMMANDS + ['all']:
+        subparsers.add_parser(command, parents=[options], help=COMMAND_HELP[command])
+    
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or (argv[0].startswith('-') and argv[0] not in ('-h', '--help')):
+        argv = ['all'] + argv
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    success = run_pipeline()
+    args = parse_args()
+    commands = None if args.command == 'all' else [args.command]
+    
+    success = run_pipeline(force=args.force, from_phase=args.from_phase,
+                           profile=args.profile, commands=commands)
     sys.exit(0 if success else 1)
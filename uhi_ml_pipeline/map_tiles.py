@@ -0,0 +1,193 @@
+"""Map tiles module: Static XYZ PNG tile pyramid of the UHI map
+
+Renders per-cell colors of a regular grid into 256×256 Web Mercator tiles
+({z}/{x}/{y}.png), which any slippy map (Leaflet, folium) can load. Every
+tile pixel takes the color of the grid cell containing its centre.
+
+Tiles render in parallel across a process pool. A manifest in the tile
+directory stores a digest of the cell colors behind each tile, so tiles
+whose cells did not change since the last export are not re-rendered.
+"""
+
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from grid_lattice import detect_lattice
+
+
+TILE_SIZE = 256
+TILE_MANIFEST = 'tiles.json'
+
+
+def lonlat_to_tile(lon, lat, zoom):
+    """Fractional XYZ tile coordinates of a point"""
+    n = 2 ** zoom
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+    return x, y
+
+
+def tile_pixel_centres(zoom, x, y):
+    """Longitudes of the pixel columns and latitudes of the pixel rows of a tile"""
+    world = TILE_SIZE * 2 ** zoom
+    offsets = np.arange(TILE_SIZE) + 0.5
+    lons = (x * TILE_SIZE + offsets) / world * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y * TILE_SIZE + offsets) / world))))
+    return lons, lats
+
+
+def tile_range(bounds, zoom):
+    """All tiles (zoom, x, y) covering (west, south, east, north) bounds"""
+    west, south, east, north = bounds
+    x_min, y_min = lonlat_to_tile(west, north, zoom)
+    x_max, y_max = lonlat_to_tile(east, south, zoom)
+    last = 2 ** zoom - 1
+    return [
+        (zoom, x, y)
+        for x in range(max(int(x_min), 0), min(int(x_max), last) + 1)
+        for y in range(max(int(y_min), 0), min(int(y_max), last) + 1)
+    ]
+
+
+def color_grid(lattice, color_idx):
+    """2D array (n_rows, n_cols) of per-cell color indices, -1 where empty"""
+    grid = np.full((lattice.n_rows, lattice.n_cols), -1, dtype=np.int32)
+    grid[lattice.rows, lattice.cols] = color_idx
+    return grid
+
+
+def _tile_cells(lattice, lons, lats):
+    """Lattice rows/cols under the pixel rows/columns of a tile (-1 outside)"""
+    cols = np.floor((lons - lattice.x0) / lattice.cell_size).astype(np.int64)
+    rows = np.floor((lats - lattice.y0) / lattice.cell_size).astype(np.int64)
+    cols[(cols < 0) | (cols >= lattice.n_cols)] = -1
+    rows[(rows < 0) | (rows >= lattice.n_rows)] = -1
+    return rows, cols
+
+
+def tile_digest(lattice, colors, tile, lut_digest):
+    """Digest of the cell colors a tile is rendered from, None if it has no cells"""
+    rows, cols = _tile_cells(lattice, *tile_pixel_centres(*tile))
+    rows = np.unique(rows[rows >= 0])
+    cols = np.unique(cols[cols >= 0])
+    if len(rows) == 0 or len(cols) == 0:
+        return None
+    window = colors[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+    if not (window >= 0).any():
+        return None
+
+    h = hashlib.sha1()
+    h.update(lut_digest.encode())
+    h.update(np.array([lattice.x0, lattice.y0, lattice.cell_size]).tobytes())
+    h.update(np.array([rows[0], cols[0], *window.shape], dtype=np.int64).tobytes())
+    h.update(np.ascontiguousarray(window).tobytes())
+    return h.hexdigest()
+
+
+def render_tile(lattice, colors, lut, tile):
+    """RGBA array of one tile; ``lut`` maps color index + 1 to RGBA (0 = transparent)"""
+    rows, cols = _tile_cells(lattice, *tile_pixel_centres(*tile))
+    idx = colors[np.maximum(rows, 0)[:, None], np.maximum(cols, 0)[None, :]]
+    idx[rows < 0, :] = -1
+    idx[:, cols < 0] = -1
+    return lut[idx + 1]
+
+
+# Worker state, set once per process by _init_tile_worker
+_worker_state = {}
+
+
+def _init_tile_worker(lattice, colors, lut, tiles_dir):
+    _worker_state.update(lattice=lattice, colors=colors, lut=lut, tiles_dir=tiles_dir)
+
+
+def _render_tiles(tiles):
+    """Render and write a batch of tiles"""
+    state = _worker_state
+    for tile in tiles:
+        zoom, x, y = tile
+        path = os.path.join(state['tiles_dir'], str(zoom), str(x), f'{y}.png')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        rgba = render_tile(state['lattice'], state['colors'], state['lut'], tile)
+        Image.fromarray(rgba).save(path)
+    return len(tiles)
+
+
+def _load_tile_manifest(tiles_dir):
+    path = os.path.join(tiles_dir, TILE_MANIFEST)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def export_tiles(grid_gdf, color_idx, lut_rgba, tiles_dir, zoom_levels, n_workers=1):
+    """Write the XYZ tile pyramid of per-cell colors
+
+    ``color_idx`` gives each grid cell's index into ``lut_rgba`` (an
+    (n, 4) uint8 array). Only tiles whose cell colors changed since the
+    last export are rendered; tiles that no longer cover any cell are
+    removed. Returns (rendered, skipped) tile counts.
+    """
+    lattice = detect_lattice(grid_gdf)
+    if lattice is None:
+        raise ValueError("Grid is not a regular lattice; cannot render map tiles")
+
+    colors = color_grid(lattice, color_idx)
+    lut = np.vstack([np.zeros((1, 4), dtype=np.uint8), np.asarray(lut_rgba, dtype=np.uint8)])
+    lut_digest = hashlib.sha1(lut.tobytes()).hexdigest()
+
+    bounds = (
+        lattice.x0, lattice.y0,
+        lattice.x0 + lattice.n_cols * lattice.cell_size,
+        lattice.y0 + lattice.n_rows * lattice.cell_size
+    )
+    previous = _load_tile_manifest(tiles_dir)
+    current = {}
+    pending = []
+    for zoom in zoom_levels:
+        for tile in tile_range(bounds, zoom):
+            digest = tile_digest(lattice, colors, tile, lut_digest)
+            if digest is None:
+                continue
+            key = '{}/{}/{}'.format(*tile)
+            current[key] = digest
+            path = os.path.join(tiles_dir, f'{key}.png')
+            if previous.get(key) != digest or not os.path.exists(path):
+                pending.append(tile)
+
+    # Remove tiles left over from earlier exports
+    for key in set(previous) - set(current):
+        path = os.path.join(tiles_dir, f'{key}.png')
+        if os.path.exists(path):
+            os.remove(path)
+
+    os.makedirs(tiles_dir, exist_ok=True)
+    if pending:
+        n_workers = max(1, min(n_workers, len(pending)))
+        batches = [pending[i::n_workers * 4] for i in range(n_workers * 4)]
+        batches = [batch for batch in batches if batch]
+        initargs = (lattice, colors, lut, tiles_dir)
+        if n_workers == 1:
+            _init_tile_worker(*initargs)
+            for batch in batches:
+                _render_tiles(batch)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_init_tile_worker,
+                initargs=initargs
+            ) as executor:
+                list(executor.map(_render_tiles, batches))
+
+    # Written last, so an interrupted export re-renders its tiles next time
+    with open(os.path.join(tiles_dir, TILE_MANIFEST), 'w') as f:
+        json.dump(current, f, indent=0, sort_keys=True)
+
+    return len(pending), len(current) - len(pending)
@@ -0,0 +1,255 @@
+"""Model store module: Compact, fast-loading model artifacts
+
+A model artifact is a directory with a small JSON header (``meta.json``:
+model kind, name and feature order) and the model in its most compact
+native form:
+
+- XGBoost: the booster in XGBoost's binary UBJSON format
+- Random Forest / Extra Trees: all trees flattened into a few .npy arrays,
+  loaded with ``mmap_mode`` so loading does not copy or unpickle anything
+- Linear models: coefficients and intercept
+- Anything else: a joblib pickle
+
+Loaded models expose ``predict`` and ``feature_importances_``/``coef_``
+like the originals, and reorder DataFrame columns to the stored feature
+order before predicting. Loading a compact forest needs only numpy;
+sklearn, XGBoost and joblib are imported only for the kinds that use them.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from config import BEST_MODEL_PATH, BEST_MODEL_DIR, MODEL_ARTIFACT_FORMAT
+from artifacts import resolution_path
+
+
+FORMAT_VERSION = 1
+MODEL_META = 'meta.json'
+
+# Flattened forest arrays: one entry per node of all trees, concatenated
+FOREST_ARRAYS = ['children_left', 'children_right', 'feature', 'threshold', 'value']
+
+
+def best_model_path(resolution=None):
+    """Path of the best model artifact for the configured format"""
+    if MODEL_ARTIFACT_FORMAT == 'compact':
+        return resolution_path(BEST_MODEL_DIR, resolution)
+    return resolution_path(BEST_MODEL_PATH, resolution)
+
+
+def model_artifact_file(path):
+    """File that changes whenever the artifact at ``path`` changes
+
+    For compact artifacts this is the header, which records checksums of
+    all payload files.
+    """
+    if os.path.splitext(path)[1]:
+        return path
+    return os.path.join(path, MODEL_META)
+
+
+def flatten_forest(model):
+    """Concatenate the node arrays of all trees of a fitted sklearn forest"""
+    parts = {name: [] for name in FOREST_ARRAYS}
+    roots = []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        left = tree.children_left
+        right = tree.children_right
+        is_leaf = left < 0
+        # Leaves point to themselves, so finished rows stay put
+        node_ids = np.arange(tree.node_count) + offset
+        parts['children_left'].append(np.where(is_leaf, node_ids, left + offset).astype(np.int32))
+        parts['children_right'].append(np.where(is_leaf, node_ids, right + offset).astype(np.int32))
+        parts['feature'].append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        parts['threshold'].append(tree.threshold.astype(np.float64))
+        parts['value'].append(tree.value[:, 0, 0].astype(np.float64))
+        roots.append(offset)
+        offset += tree.node_count
+    arrays = {name: np.concatenate(values) for name, values in parts.items()}
+    arrays['roots'] = np.array(roots, dtype=np.int32)
+    return arrays
+
+
+class CompactForest:
+    """Tree ensemble predicting from flattened node arrays
+
+    All trees are walked together, one tree level per step, so prediction
+    is a handful of vectorized numpy operations per level over the
+    (tree, row) pairs that have not reached a leaf yet.
+    Splits follow sklearn's rule: left when ``x <= threshold`` with the
+    inputs cast to float32.
+    """
+
+    def __init__(self, arrays, roots, feature_names, feature_importances=None):
+        for name in FOREST_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.roots = roots
+        self.feature_names_in_ = np.array(feature_names, dtype=object)
+        self.n_features_in_ = len(feature_names)
+        if feature_importances is not None:
+            self.feature_importances_ = feature_importances
+
+    def predict(self, X, max_pairs=4_000_000):
+        """Mean of the trees' leaf values, in row chunks of at most
+        ``max_pairs`` (row, tree) pairs to bound memory"""
+        if hasattr(X, 'columns'):
+            X = X[list(self.feature_names_in_)]
+        X = np.asarray(X, dtype=np.float32)
+        chunk = max(1, max_pairs // len(self.roots))
+        return np.concatenate([
+            self._predict_chunk(X[start:start + chunk])
+            for start in range(0, len(X), chunk)
+        ] + [np.empty(0)])
+
+    def _predict_chunk(self, X):
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        values = X.ravel()
+
+        # One entry per (tree, row) pair, tree-major for locality in the node arrays
+        node = np.repeat(np.asarray(self.roots, dtype=np.int64), n_rows)
+        row_offset = np.tile(np.arange(n_rows, dtype=np.int64) * n_features, n_trees)
+        active = np.arange(len(node))
+        while len(active):
+            current = node[active]
+            go_left = values[row_offset[active] + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.children_left[current], self.children_right[current])
+            node[active] = current
+            # Only pairs that have not reached a leaf take another step
+            active = active[self.children_left[current] != current]
+        return self.value[node].reshape(n_trees, n_rows).mean(axis=0)
+
+
+def forest_arrays(model):
+    """Flattened node arrays (and roots) of a sklearn forest or CompactForest"""
+    if isinstance(model, CompactForest):
+        return {name: np.asarray(getattr(model, name)) for name in FOREST_ARRAYS + ['roots']}
+    return flatten_forest(model)
+
+
+def concat_forests(first, second, feature_names):
+    """CompactForest with the trees of both forests, every tree weighted equally"""
+    a, b = forest_arrays(first), forest_arrays(second)
+    offset = len(a['value'])
+    arrays = {
+        name: np.concatenate([a[name], b[name] + offset if name.startswith('children') else b[name]])
+        for name in FOREST_ARRAYS
+    }
+    roots = np.concatenate([a['roots'], b['roots'] + offset]).astype(np.int32)
+    n_a, n_b = len(a['roots']), len(b['roots'])
+    importances = (n_a * np.asarray(first.feature_importances_) +
+                   n_b * np.asarray(second.feature_importances_)) / (n_a + n_b)
+    return CompactForest(arrays, roots, feature_names, importances)
+
+
+def _checksum(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def save_model(model, path, feature_names, name=None):
+    """Write a compact model artifact directory"""
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor
+    from sklearn.linear_model import LinearRegression
+    from xgboost import XGBRegressor
+
+    os.makedirs(path, exist_ok=True)
+    # Drop the payload of a previous artifact (it may be a different kind)
+    if os.path.exists(os.path.join(path, MODEL_META)):
+        with open(os.path.join(path, MODEL_META)) as f:
+            for old_file in json.load(f).get('files', {}):
+                if os.path.exists(os.path.join(path, old_file)):
+                    os.remove(os.path.join(path, old_file))
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'name': name,
+        'features': list(feature_names)
+    }
+    files = []
+
+    if isinstance(model, XGBRegressor):
+        meta['kind'] = 'xgboost'
+        files.append('model.ubj')
+        model.save_model(os.path.join(path, 'model.ubj'))
+    elif isinstance(model, (RandomForestRegressor, ExtraTreesRegressor, CompactForest)):
+        meta['kind'] = 'forest'
+        arrays = forest_arrays(model)
+        arrays['feature_importances'] = np.asarray(model.feature_importances_, dtype=np.float64)
+        for array_name, array in arrays.items():
+            files.append(f'{array_name}.npy')
+            np.save(os.path.join(path, f'{array_name}.npy'), array)
+    elif isinstance(model, LinearRegression):
+        meta['kind'] = 'linear'
+        meta['intercept'] = float(model.intercept_)
+        files.append('coef.npy')
+        np.save(os.path.join(path, 'coef.npy'), np.asarray(model.coef_, dtype=np.float64))
+    else:
+        meta['kind'] = 'pickle'
+        files.append('model.joblib')
+        joblib.dump(model, os.path.join(path, 'model.joblib'))
+
+    meta['files'] = {f: _checksum(os.path.join(path, f)) for f in files}
+    # Header last: a half-written artifact has no (or a stale) header
+    with open(os.path.join(path, MODEL_META), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def read_model_meta(path):
+    """Header of a compact model artifact"""
+    with open(os.path.join(path, MODEL_META)) as f:
+        meta = json.load(f)
+    if meta.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact version in {path}")
+    return meta
+
+
+def load_model(path, mmap=True):
+    """Load a model saved by save_model, or a joblib pickle file
+
+    ``mmap`` memory-maps forest arrays instead of reading them into memory.
+    """
+    if os.path.isfile(path):
+        import joblib
+        return joblib.load(path)
+
+    meta = read_model_meta(path)
+    kind = meta['kind']
+    features = meta['features']
+
+    if kind == 'xgboost':
+        from xgboost import XGBRegressor
+        model = XGBRegressor()
+        model.load_model(os.path.join(path, 'model.ubj'))
+        return model
+
+    if kind == 'forest':
+        mmap_mode = 'r' if mmap else None
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in FOREST_ARRAYS + ['roots', 'feature_importances']
+        }
+        return CompactForest(arrays, arrays['roots'], features, arrays['feature_importances'])
+
+    if kind == 'linear':
+        from sklearn.linear_model import LinearRegression
+        model = LinearRegression()
+        model.coef_ = np.load(os.path.join(path, 'coef.npy'))
+        model.intercept_ = meta['intercept']
+        model.n_features_in_ = len(features)
+        model.feature_names_in_ = np.array(features, dtype=object)
+        return model
+
+    if kind == 'pickle':
+        import joblib
+        return joblib.load(os.path.join(path, 'model.joblib'))
+
+    raise ValueError(f"Unknown model kind '{kind}' in {path}")
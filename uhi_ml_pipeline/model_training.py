@@ -1,45 +1,53 @@
 """Model training module: Train and evaluate ML models"""
 
+import importlib
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import LinearRegression
-from xgboost import XGBRegressor
-from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error
-import matplotlib.pyplot as plt
-import seaborn as sns
-import joblib
+import threading
 import warnings
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from threadpoolctl import threadpool_limits
 warnings.filterwarnings('ignore')
 
 from config import (
-    FEATURES_CSV,
+    MODEL_MATRIX_FEATHER,
+    MODEL_FEATURES,
+    TARGET_COLUMN,
     MODEL_EVALUATION_CSV,
     FEATURE_IMPORTANCE_PNG,
     OUTPUT_DIR,
+    MODEL_ARTIFACT_FORMAT,
     RANDOM_STATE,
-    TEST_SIZE
+    TEST_SIZE,
+    MODEL_CANDIDATES,
+    TRAINING_CORES,
+    TUNING_ENABLED,
+    SPATIAL_CV_ENABLED
 )
+from artifacts import read_model_matrix, resolution_path
+from instrumentation import measure
+from model_store import save_model, best_model_path
+from model_tuning import tune_models
+from spatial_cv import run_spatial_cv
 
 
-def load_and_prepare_data():
+def load_and_prepare_data(resolution=None):
     """Load features and prepare for modeling"""
     print("Loading features...")
-    df = pd.read_csv(FEATURES_CSV)
     
     # Define features and target
-    feature_cols = [
-        'NDVI_mean', 'NDVI_std',
-        'building_count', 'building_area',
-        'road_count', 'road_length',
-        'impervious_surface_proxy', 'vegetation_cover_proxy'
-    ]
+    feature_cols = list(MODEL_FEATURES)
+    target_col = TARGET_COLUMN
     
-    target_col = 'LST_mean'
+    # Read only the model columns, memory-mapped
+    df = read_model_matrix(
+        resolution_path(MODEL_MATRIX_FEATHER, resolution),
+        columns=feature_cols + [target_col]
+    )
     
     # Remove rows with any missing values
-    df_clean = df[feature_cols + [target_col]].dropna()
+    df_clean = df.dropna()
     
     X = df_clean[feature_cols]
     y = df_clean[target_col]
@@ -50,69 +58,131 @@ def load_and_prepare_data():
     return X, y, feature_cols
 
 
-def train_models(X_train, X_test, y_train, y_test, feature_cols):
-    """Train multiple regression models"""
-    print("\nTraining machine learning models...")
-    
-    models = {
-        'Random Forest': RandomForestRegressor(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=5,
-            random_state=RANDOM_STATE,
-            n_jobs=-1
-        ),
-        'XGBoost': XGBRegressor(
-            n_estimators=100,
-            max_depth=6,
-            learning_rate=0.1,
-            random_state=RANDOM_STATE,
-            n_jobs=-1
-        ),
-        'Linear Regression': LinearRegression()
+# Estimators available as training candidates (see MODEL_CANDIDATES), as
+# (module, class); the module is imported when a candidate is built
+ESTIMATORS = {
+    'random_forest': ('sklearn.ensemble', 'RandomForestRegressor'),
+    'xgboost': ('xgboost', 'XGBRegressor'),
+    'linear_regression': ('sklearn.linear_model', 'LinearRegression')
+}
+
+# Estimators that parallelize across cores through n_jobs
+PARALLEL_ESTIMATORS = {'random_forest', 'xgboost'}
+
+
+def build_model(estimator, params, n_jobs=1):
+    """Instantiate a candidate estimator with its parameters and core count"""
+    params = dict(params)
+    if estimator in PARALLEL_ESTIMATORS:
+        params.setdefault('random_state', RANDOM_STATE)
+        params['n_jobs'] = n_jobs
+    module, cls = ESTIMATORS[estimator]
+    return getattr(importlib.import_module(module), cls)(**params)
+
+
+def allocate_cores(candidates, budget):
+    """Split a core budget between candidates
+    
+    Serial estimators get one core each; parallel ones share the rest, so
+    when the budget covers every candidate they can all train at once.
+    """
+    parallel = [name for name, (estimator, _) in candidates.items()
+                if estimator in PARALLEL_ESTIMATORS]
+    spare = max(budget - (len(candidates) - len(parallel)), len(parallel))
+    cores = {name: 1 for name in candidates}
+    for i, name in enumerate(parallel):
+        cores[name] = spare // len(parallel) + (i < spare % len(parallel))
+    return cores
+
+
+class CoreBudget:
+    """Counting lock over CPU cores: a task starts once its cores are free"""
+    
+    def __init__(self, cores):
+        self.total = cores
+        self.free = cores
+        self.condition = threading.Condition()
+    
+    @contextmanager
+    def reserve(self, cores):
+        cores = min(cores, self.total)
+        with self.condition:
+            self.condition.wait_for(lambda: self.free >= cores)
+            self.free -= cores
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.free += cores
+                self.condition.notify_all()
+
+
+def evaluate_model(name, model, X_train, X_test, y_train, y_test):
+    """Metrics of a fitted model on the train and test sets"""
+    from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error
+    
+    y_train_pred = model.predict(X_train)
+    y_test_pred = model.predict(X_test)
+    
+    return {
+        'Model': name,
+        'Train_R2': r2_score(y_train, y_train_pred),
+        'Test_R2': r2_score(y_test, y_test_pred),
+        'Train_RMSE': np.sqrt(mean_squared_error(y_train, y_train_pred)),
+        'Test_RMSE': np.sqrt(mean_squared_error(y_test, y_test_pred)),
+        'Train_MAE': mean_absolute_error(y_train, y_train_pred),
+        'Test_MAE': mean_absolute_error(y_test, y_test_pred)
     }
+
+
+def train_models(X_train, X_test, y_train, y_test, feature_cols,
+                 candidates=MODEL_CANDIDATES, core_budget=TRAINING_CORES):
+    """Train candidate regression models concurrently within a core budget
+    
+    Each candidate gets a share of ``core_budget`` cores (its n_jobs) and
+    starts as soon as those cores are free. Fitting runs in threads (the
+    estimators release the GIL); BLAS is limited to one thread per call
+    so nested parallelism cannot oversubscribe the budget.
+    """
+    print(f"\nTraining machine learning models ({core_budget} cores)...")
+    
+    cores = allocate_cores(candidates, core_budget)
+    budget = CoreBudget(core_budget)
     
+    def fit(name):
+        estimator, params = candidates[name]
+        model = build_model(estimator, params, n_jobs=cores[name])
+        with budget.reserve(cores[name]):
+            with measure(f'fit:{name}', rows=len(X_train)) as step:
+                model.fit(X_train, y_train)
+                result = evaluate_model(name, model, X_train, X_test, y_train, y_test)
+        return model, result, step['wall_seconds']
+    
+    # Largest allocations first, so small ones fill the remaining cores
+    order = sorted(candidates, key=lambda name: -cores[name])
+    with threadpool_limits(limits=1, user_api='blas'):
+        with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+            futures = {name: executor.submit(fit, name) for name in order}
+            for future in as_completed(futures.values()):
+                model, result, elapsed = future.result()
+                print(f"\n  {result['Model']} ({cores[result['Model']]} cores, {elapsed:.2f}s)")
+                print(f"    Train R²: {result['Train_R2']:.4f} | Test R²: {result['Test_R2']:.4f}")
+                print(f"    Train RMSE: {result['Train_RMSE']:.4f} | Test RMSE: {result['Test_RMSE']:.4f}")
+    
+    # Results in candidate order, whatever order training finished in
     results = []
     trained_models = {}
-    
-    for name, model in models.items():
-        print(f"\n  Training {name}...")
-        
-        # Train model
-        model.fit(X_train, y_train)
-        
-        # Make predictions
-        y_train_pred = model.predict(X_train)
-        y_test_pred = model.predict(X_test)
-        
-        # Calculate metrics
-        train_r2 = r2_score(y_train, y_train_pred)
-        test_r2 = r2_score(y_test, y_test_pred)
-        train_rmse = np.sqrt(mean_squared_error(y_train, y_train_pred))
-        test_rmse = np.sqrt(mean_squared_error(y_test, y_test_pred))
-        train_mae = mean_absolute_error(y_train, y_train_pred)
-        test_mae = mean_absolute_error(y_test, y_test_pred)
-        
-        results.append({
-            'Model': name,
-            'Train_R2': train_r2,
-            'Test_R2': test_r2,
-            'Train_RMSE': train_rmse,
-            'Test_RMSE': test_rmse,
-            'Train_MAE': train_mae,
-            'Test_MAE': test_mae
-        })
-        
+    for name in candidates:
+        model, result, _ = futures[name].result()
+        results.append(result)
         trained_models[name] = model
-        
-        print(f"    Train R²: {train_r2:.4f} | Test R²: {test_r2:.4f}")
-        print(f"    Train RMSE: {train_rmse:.4f} | Test RMSE: {test_rmse:.4f}")
     
     results_df = pd.DataFrame(results)
     return results_df, trained_models
 
 
-def plot_feature_importance(model, feature_cols, model_name='Random Forest'):
+def plot_feature_importance(model, feature_cols, model_name='Random Forest',
+                            output_path=FEATURE_IMPORTANCE_PNG):
     """Plot feature importance"""
     print(f"\nPlotting feature importance for {model_name}...")
     
@@ -130,14 +200,16 @@ def plot_feature_importance(model, feature_cols, model_name='Random Forest'):
     }).sort_values('Importance', ascending=False)
     
     # Plot
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     plt.figure(figsize=(10, 6))
     sns.barplot(data=importance_df, x='Importance', y='Feature', palette='viridis')
     plt.title(f'Feature Importance - {model_name}', fontsize=14, fontweight='bold')
     plt.xlabel('Importance', fontsize=12)
     plt.ylabel('Feature', fontsize=12)
     plt.tight_layout()
-    plt.savefig(FEATURE_IMPORTANCE_PNG, dpi=300, bbox_inches='tight')
-    print(f"✓ Feature importance plot saved to: {FEATURE_IMPORTANCE_PNG}")
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    print(f"✓ Feature importance plot saved to: {output_path}")
     
     # Print top features
     print("\nTop 5 most important features:")
@@ -147,30 +219,59 @@ def plot_feature_importance(model, feature_cols, model_name='Random Forest'):
     plt.close()
 
 
-def train_and_evaluate():
-    """Main function to train and evaluate models"""
+def train_and_evaluate(resolution=None):
+    """Main function to train and evaluate models
+    
+    ``resolution`` selects a grid pyramid level (None = single-resolution
+    artifacts).
+    """
     print("=" * 60)
     print("PHASE 3: MODEL TRAINING AND EVALUATION")
+    if resolution is not None:
+        print(f"Resolution: {resolution}")
     print("=" * 60)
     
     # Load data
-    X, y, feature_cols = load_and_prepare_data()
+    with measure('load_matrix') as step:
+        X, y, feature_cols = load_and_prepare_data(resolution)
+        step['rows'] = len(X)
     
     # Split data
     print(f"\nSplitting data: {int((1-TEST_SIZE)*100)}% train, {int(TEST_SIZE*100)}% test")
+    from sklearn.model_selection import train_test_split
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
     )
     print(f"✓ Train size: {len(X_train)}, Test size: {len(X_test)}")
     
+    # Tune hyperparameters on the training set only
+    candidates = MODEL_CANDIDATES
+    if TUNING_ENABLED:
+        with measure('tuning', rows=len(X_train)):
+            candidates = tune_models(X_train, y_train, candidates, resolution)
+    
+    # Spatial block CV over all cells, for a leakage-free model comparison
+    cv_summary = None
+    if SPATIAL_CV_ENABLED:
+        centroids = read_model_matrix(
+            resolution_path(MODEL_MATRIX_FEATHER, resolution),
+            columns=['centroid_lat', 'centroid_lon']
+        ).loc[X.index]
+        with measure('spatial_cv', rows=len(X)):
+            _, cv_summary = run_spatial_cv(
+                X, y, centroids['centroid_lat'], centroids['centroid_lon'],
+                candidates, resolution
+            )
+    
     # Train models
     results_df, trained_models = train_models(
-        X_train, X_test, y_train, y_test, feature_cols
+        X_train, X_test, y_train, y_test, feature_cols, candidates=candidates
     )
     
     # Save results
-    results_df.to_csv(MODEL_EVALUATION_CSV, index=False)
-    print(f"\n✓ Model evaluation results saved to: {MODEL_EVALUATION_CSV}")
+    evaluation_path = resolution_path(MODEL_EVALUATION_CSV, resolution)
+    results_df.to_csv(evaluation_path, index=False)
+    print(f"\n✓ Model evaluation results saved to: {evaluation_path}")
     
     # Display results table
     print("\n" + "=" * 60)
@@ -179,21 +280,35 @@ def train_and_evaluate():
     print(results_df.to_string(index=False))
     print("=" * 60)
     
-    # Select best model based on Test R2
+    # Select best model based on Test R2 (spatial CV test R2 when available)
     best_model_name = results_df.loc[results_df['Test_R2'].idxmax(), 'Model']
+    if cv_summary is not None:
+        best_model_name = cv_summary.loc[cv_summary['Test_R2'].idxmax(), 'Model']
     best_model = trained_models[best_model_name]
+    best_result = results_df.set_index('Model').loc[best_model_name]
     
     print(f"\n✓ Best model: {best_model_name}")
-    print(f"  Test R²: {results_df.loc[results_df['Test_R2'].idxmax(), 'Test_R2']:.4f}")
-    print(f"  Test RMSE: {results_df.loc[results_df['Test_R2'].idxmax(), 'Test_RMSE']:.4f}")
+    if cv_summary is not None:
+        print(f"  Spatial CV test R²: {cv_summary['Test_R2'].max():.4f}")
+    print(f"  Test R²: {best_result['Test_R2']:.4f}")
+    print(f"  Test RMSE: {best_result['Test_RMSE']:.4f}")
     
     # Save best model
-    best_model_path = f"{OUTPUT_DIR}/best_model.pkl"
-    joblib.dump(best_model, best_model_path)
-    print(f"\n✓ Best model saved to: {best_model_path}")
+    model_path = best_model_path(resolution)
+    with measure('save_model'):
+        if MODEL_ARTIFACT_FORMAT == 'compact':
+            save_model(best_model, model_path, feature_cols, name=best_model_name)
+        else:
+            import joblib
+            joblib.dump(best_model, model_path)
+    print(f"\n✓ Best model saved to: {model_path}")
     
     # Plot feature importance for best model
-    plot_feature_importance(best_model, feature_cols, best_model_name)
+    with measure('render:feature_importance'):
+        plot_feature_importance(
+            best_model, feature_cols, best_model_name,
+            output_path=resolution_path(FEATURE_IMPORTANCE_PNG, resolution)
+        )
     
     print("\n✓ Model training and evaluation complete!\n")
     
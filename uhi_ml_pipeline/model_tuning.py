@@ -0,0 +1,299 @@
+"""Model tuning module: Budgeted hyperparameter search
+
+Searches TUNING_SPACE with successive halving: every sampled configuration
+is trained on a small share of the training rows, and only the best
+1/TUNING_ETA of each model's configurations move on to the next rung,
+which uses TUNING_ETA times more rows; the last rung uses all of them.
+Configurations are scored on a held-out validation split, which XGBoost
+also uses for early stopping.
+
+Trials run in parallel worker processes that read the training matrix
+from shared memory instead of receiving copies. The search stops starting
+new trials once the wall-clock or CPU-seconds budget is spent and keeps
+the best configuration found so far.
+"""
+
+import itertools
+import json
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from threadpoolctl import threadpool_limits
+
+from config import (
+    MODEL_CANDIDATES,
+    RANDOM_STATE,
+    TUNING_SPACE,
+    TUNING_N_CONFIGS,
+    TUNING_ETA,
+    TUNING_MIN_ROWS,
+    TUNING_VALIDATION_SIZE,
+    TUNING_EARLY_STOPPING_ROUNDS,
+    TUNING_TIME_BUDGET,
+    TUNING_CPU_BUDGET,
+    TUNING_WORKERS,
+    TUNING_BEST_CONFIG_JSON,
+    TUNING_TRIALS_CSV
+)
+from artifacts import resolution_path
+
+
+def sample_configs(space, n_configs, rng):
+    """Up to ``n_configs`` distinct parameter combinations from a grid space"""
+    names = sorted(space)
+    grid = list(itertools.product(*(space[name] for name in names)))
+    picks = rng.permutation(len(grid))[:n_configs]
+    return [dict(zip(names, grid[i])) for i in picks]
+
+
+def rung_rows(n_rows, n_configs, eta=TUNING_ETA, min_rows=TUNING_MIN_ROWS):
+    """Training rows per rung; the last rung uses all rows"""
+    n_rungs = max(1, int(math.log(max(n_configs, 1), eta) + 1e-9) + 1)
+    return [
+        min(n_rows, max(min_rows, int(n_rows / eta ** (n_rungs - 1 - rung))))
+        for rung in range(n_rungs)
+    ]
+
+
+class SharedMatrix:
+    """Numpy array copied once into shared memory for worker processes"""
+
+    def __init__(self, array):
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        self.shape = array.shape
+        self.shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf)[:] = array
+
+    @property
+    def handle(self):
+        return self.shm.name, self.shape
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach(handle):
+    """Open a shared matrix in a worker; returns (shared memory, array view)"""
+    name, shape = handle
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+
+
+# Worker state, set once per process by _init_trial_worker
+_worker_state = {}
+
+
+def _init_trial_worker(X_handle, y_handle, train_idx, val_idx):
+    x_shm, X = attach(X_handle)
+    y_shm, y = attach(y_handle)
+    _worker_state.update(
+        shm=(x_shm, y_shm), X=X, y=y, train_idx=train_idx, val_idx=val_idx
+    )
+
+
+def run_trial(trial):
+    """Fit one configuration on its rung's rows and score it on validation"""
+    # Imported here so worker processes only pay for what they use
+    from model_training import build_model
+    from sklearn.metrics import r2_score, mean_squared_error
+
+    state = _worker_state
+    X, y = state['X'], state['y']
+    rows = state['train_idx'][:trial['n_rows']]
+    X_val, y_val = X[state['val_idx']], y[state['val_idx']]
+    estimator = trial['estimator']
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    with threadpool_limits(limits=1):
+        model = build_model(estimator, trial['params'], n_jobs=1)
+        best_iteration = None
+        if estimator == 'xgboost':
+            model.set_params(early_stopping_rounds=TUNING_EARLY_STOPPING_ROUNDS)
+            model.fit(X[rows], y[rows], eval_set=[(X_val, y_val)], verbose=False)
+            best_iteration = int(model.best_iteration)
+        else:
+            model.fit(X[rows], y[rows])
+        y_pred = model.predict(X_val)
+
+    return dict(
+        trial,
+        val_rmse=float(np.sqrt(mean_squared_error(y_val, y_pred))),
+        val_r2=float(r2_score(y_val, y_pred)),
+        best_iteration=best_iteration,
+        fit_seconds=time.perf_counter() - wall_start,
+        cpu_seconds=time.process_time() - cpu_start
+    )
+
+
+def successive_halving(X, y, space=TUNING_SPACE, n_configs=TUNING_N_CONFIGS,
+                       eta=TUNING_ETA, time_budget=TUNING_TIME_BUDGET,
+                       cpu_budget=TUNING_CPU_BUDGET, n_workers=TUNING_WORKERS,
+                       estimators=None):
+    """Run the search for every model in ``space``; returns the trial log
+
+    Rungs run one after another; within a rung, the trials of all models
+    run in parallel. ``time_budget`` (seconds of wall clock) and
+    ``cpu_budget`` (CPU seconds summed over trials) stop new trials from
+    starting; None disables a budget. ``estimators`` maps model names to
+    estimator keys (default: those of MODEL_CANDIDATES).
+    """
+    if estimators is None:
+        estimators = {model: MODEL_CANDIDATES[model][0] for model in space}
+    rng = np.random.default_rng(RANDOM_STATE)
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Shuffled train/validation split; rungs take prefixes of the train rows
+    order = rng.permutation(len(X))
+    n_val = max(1, int(len(X) * TUNING_VALIDATION_SIZE))
+    val_idx, train_idx = order[:n_val], order[n_val:]
+
+    alive = {model: sample_configs(space[model], n_configs, rng) for model in space}
+    rows = {model: rung_rows(len(train_idx), len(configs), eta) for model, configs in alive.items()}
+
+    deadline = time.perf_counter() + time_budget if time_budget else None
+    cpu_used = 0.0
+    log = []
+
+    def out_of_budget():
+        return ((deadline is not None and time.perf_counter() >= deadline) or
+                (cpu_budget is not None and cpu_used >= cpu_budget))
+
+    shared_X, shared_y = SharedMatrix(X), SharedMatrix(y)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_trial_worker,
+            initargs=(shared_X.handle, shared_y.handle, train_idx, val_idx)
+        ) as executor:
+            rung = 0
+            while any(rung < len(rows[model]) and alive[model] for model in alive):
+                # Interleave models so a tight budget still tries every model
+                queues = [
+                    [(model, params) for params in alive[model]]
+                    for model in alive if rung < len(rows[model])
+                ]
+                trials = [
+                    {'trial': len(log) + i, 'model': model, 'estimator': estimators[model],
+                     'rung': rung, 'n_rows': rows[model][rung], 'params': params}
+                    for i, (model, params) in enumerate(
+                        entry for entries in itertools.zip_longest(*queues)
+                        for entry in entries if entry is not None
+                    )
+                ]
+
+                # Keep at most n_workers trials in flight, so the budget
+                # check happens before each new trial starts
+                pending = iter(trials)
+                running = set()
+                results = []
+                while True:
+                    while len(running) < n_workers and not out_of_budget():
+                        trial = next(pending, None)
+                        if trial is None:
+                            break
+                        running.add(executor.submit(run_trial, trial))
+                    if not running:
+                        break
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        result = future.result()
+                        cpu_used += result['cpu_seconds']
+                        results.append(result)
+                log.extend(results)
+
+                if out_of_budget() or len(results) < len(trials):
+                    break
+
+                # Promote the best 1/eta of every model's configurations
+                for model in alive:
+                    scored = sorted(
+                        (r for r in results if r['model'] == model),
+                        key=lambda r: r['val_rmse']
+                    )
+                    keep = max(1, math.ceil(len(scored) / eta))
+                    alive[model] = [r['params'] for r in scored[:keep]]
+                rung += 1
+    finally:
+        shared_X.close()
+        shared_y.close()
+
+    return sorted(log, key=lambda r: r['trial'])
+
+
+def best_configs(log):
+    """Best trial of every model: highest rung reached, then lowest RMSE
+
+    For XGBoost, n_estimators is set to the early-stopped number of rounds.
+    """
+    best = {}
+    for result in log:
+        current = best.get(result['model'])
+        key = (-result['rung'], result['val_rmse'])
+        if current is None or key < (-current['rung'], current['val_rmse']):
+            best[result['model']] = result
+
+    configs = {}
+    for model, result in best.items():
+        params = dict(result['params'])
+        if result['best_iteration'] is not None:
+            params['n_estimators'] = result['best_iteration'] + 1
+        configs[model] = {
+            'params': params,
+            'val_rmse': result['val_rmse'],
+            'val_r2': result['val_r2'],
+            'rung': result['rung'],
+            'n_rows': result['n_rows'],
+            'trial': result['trial']
+        }
+    return configs
+
+
+def tune_models(X_train, y_train, candidates=MODEL_CANDIDATES, resolution=None):
+    """Tune the candidates in TUNING_SPACE; returns candidates with the best parameters
+
+    The best configurations and the full trial log are written next to the
+    model evaluation CSV. Candidates without a search space, or whose
+    trials did not run within the budget, are returned unchanged.
+    """
+    space = {model: TUNING_SPACE[model] for model in candidates if model in TUNING_SPACE}
+    budget = []
+    if TUNING_TIME_BUDGET:
+        budget.append(f"{TUNING_TIME_BUDGET}s wall clock")
+    if TUNING_CPU_BUDGET:
+        budget.append(f"{TUNING_CPU_BUDGET} CPU seconds")
+    print(f"\nTuning hyperparameters: {', '.join(space)} "
+          f"({TUNING_WORKERS} workers, budget: {', '.join(budget) or 'none'})...")
+
+    start = time.perf_counter()
+    log = []
+    if space:
+        estimators = {model: candidates[model][0] for model in space}
+        log = successive_halving(X_train, y_train, space=space, estimators=estimators)
+    configs = best_configs(log)
+    print(f"✓ Ran {len(log)} trials in {time.perf_counter() - start:.1f}s")
+
+    trials_df = pd.DataFrame(log)
+    if len(trials_df):
+        trials_df['params'] = trials_df['params'].map(lambda p: json.dumps(p, sort_keys=True))
+    trials_path = resolution_path(TUNING_TRIALS_CSV, resolution)
+    trials_df.to_csv(trials_path, index=False)
+
+    best_path = resolution_path(TUNING_BEST_CONFIG_JSON, resolution)
+    with open(best_path, 'w') as f:
+        json.dump(configs, f, indent=2, default=int)
+    print(f"✓ Best configurations saved to: {best_path}")
+    print(f"✓ Trial log saved to: {trials_path}")
+
+    tuned = dict(candidates)
+    for model, config in configs.items():
+        estimator, params = candidates[model]
+        tuned[model] = (estimator, dict(params, **config['params']))
+        print(f"  {model}: {config['params']} (validation RMSE {config['val_rmse']:.4f})")
+    return tuned
@@ -0,0 +1,481 @@
+"""OSM features module: Buildings and roads from local OpenStreetMap extracts
+
+Reads footprints from a local PBF or GeoPackage file (no network access),
+splits the grid into spatial tiles and processes the tiles across a
+process pool. Each worker loads only the footprints overlapping its tile
+and overlays them on its cells through an STR-tree spatial join.
+
+Road networks (PBF, GeoPackage or a saved osmnx GraphML graph) are read in
+fixed-size chunks, clipped to the cells with vectorized operations and
+summed per cell, so memory stays bounded for the full city graph. GraphML
+files are parsed incrementally into a GeoPackage cache once, then streamed
+like the other sources.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import geopandas as gpd
+import pyogrio
+import shapely
+from pyproj import Transformer
+
+from config import (
+    OSM_BUILDINGS_LAYER,
+    OSM_TILE_SIZE_DEGREES,
+    OSM_ROADS_LAYER,
+    ROAD_CHUNK_SIZE,
+    ROAD_CLASSES,
+    METRIC_CRS,
+    N_WORKERS
+)
+from grid_lattice import detect_lattice, cell_lookup, lattice_positions
+
+
+def prepare_building_source(path, layer=OSM_BUILDINGS_LAYER):
+    """Return (path, layer) of an indexed footprint source
+
+    GeoPackages are used as they are. OSM PBF files can only be scanned
+    sequentially, so their building polygons are streamed once in batches
+    into a GeoPackage cache next to the PBF (which carries an R-tree
+    spatial index) and reused while it is newer than the PBF.
+    """
+    if not path.lower().endswith('.pbf'):
+        return path, layer
+
+    cache_path = os.path.splitext(path)[0] + '_buildings.gpkg'
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        return cache_path, 'buildings'
+
+    print(f"  Indexing building footprints from {path} (one-time)...")
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+
+    n_written = 0
+    with pyogrio.open_arrow(
+        path,
+        layer=layer or 'multipolygons',
+        columns=['building'],
+        where="building IS NOT NULL",
+        batch_size=100000,
+        use_pyarrow=True
+    ) as (meta, reader):
+        geom_col = meta['geometry_name'] or 'wkb_geometry'
+        for batch in reader:
+            footprints = gpd.GeoDataFrame(
+                {'building': batch.column('building').to_numpy(zero_copy_only=False)},
+                geometry=shapely.from_wkb(batch.column(geom_col).to_numpy(zero_copy_only=False)),
+                crs='EPSG:4326'
+            )
+            pyogrio.write_dataframe(
+                footprints, cache_path, layer='buildings',
+                driver='GPKG', append=n_written > 0
+            )
+            n_written += len(footprints)
+
+    print(f"  ✓ Indexed {n_written} footprints into {cache_path}")
+    return cache_path, 'buildings'
+
+
+def make_tiles(grid_gdf, tile_size=OSM_TILE_SIZE_DEGREES):
+    """Group grid cells into square spatial tiles by centroid
+
+    Returns a list of positional index arrays, one per non-empty tile.
+    Every cell belongs to exactly one tile.
+    """
+    tile_x = np.floor(grid_gdf['centroid_lon'].to_numpy() / tile_size).astype(np.int64)
+    tile_y = np.floor(grid_gdf['centroid_lat'].to_numpy() / tile_size).astype(np.int64)
+    keys = np.stack([tile_x, tile_y], axis=1)
+    _, tile_of_cell = np.unique(keys, axis=0, return_inverse=True)
+    tile_of_cell = tile_of_cell.ravel()
+
+    order = np.argsort(tile_of_cell, kind='stable')
+    splits = np.flatnonzero(np.diff(tile_of_cell[order])) + 1
+    return np.split(order, splits)
+
+
+def _building_tile_stats(task):
+    """Worker: footprint count and clipped area for the cells of one tile"""
+    source_path, layer, cell_wkb, grid_crs = task
+    cells = gpd.GeoSeries(shapely.from_wkb(cell_wkb), crs=grid_crs)
+    n_cells = len(cells)
+
+    footprints = gpd.read_file(
+        source_path, layer=layer, bbox=tuple(cells.total_bounds),
+        columns=[], engine='pyogrio'
+    )
+    cell_geoms = cells.to_crs(METRIC_CRS).to_numpy()
+    cell_area = shapely.area(cell_geoms)
+    if len(footprints) == 0:
+        return np.zeros(n_cells, dtype=np.int64), np.zeros(n_cells), cell_area
+
+    fp_geoms = shapely.make_valid(footprints.geometry.to_crs(METRIC_CRS).to_numpy())
+
+    # Clipped footprint area per cell
+    fp_tree = shapely.STRtree(fp_geoms)
+    cell_idx, fp_idx = fp_tree.query(cell_geoms, predicate='intersects')
+    clipped = shapely.area(shapely.intersection(cell_geoms[cell_idx], fp_geoms[fp_idx]))
+    area = np.bincount(cell_idx, weights=clipped, minlength=n_cells)
+
+    # Each footprint is counted once, in the cell holding its representative point
+    points = shapely.point_on_surface(fp_geoms)
+    cell_tree = shapely.STRtree(cell_geoms)
+    _, owner = cell_tree.query(points, predicate='within')
+    count = np.bincount(owner, minlength=n_cells)
+
+    return count, area, cell_area
+
+
+def cell_areas(grid_gdf):
+    """Area of every grid cell in m², measured in METRIC_CRS"""
+    return shapely.area(grid_gdf.geometry.to_crs(METRIC_CRS).to_numpy())
+
+
+def building_density_from_extract(grid_gdf, path, n_workers=N_WORKERS):
+    """Per-cell building_count, building_area (m²) and built_up_fraction
+
+    Returns a dict of arrays aligned with the grid rows.
+    """
+    source_path, layer = prepare_building_source(path)
+
+    tiles = make_tiles(grid_gdf)
+    cell_wkb = shapely.to_wkb(grid_gdf.geometry.values)
+    tasks = [(source_path, layer, cell_wkb[idx], grid_gdf.crs.to_wkt()) for idx in tiles]
+
+    n = len(grid_gdf)
+    count = np.zeros(n, dtype=np.int64)
+    area = np.zeros(n)
+    cell_area = np.zeros(n)
+
+    n_workers = max(1, min(n_workers, len(tiles)))
+    print(f"  Overlaying footprints on {n} cells in {len(tiles)} tiles ({n_workers} workers)...")
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(_building_tile_stats, tasks))
+    else:
+        results = map(_building_tile_stats, tasks)
+    for idx, (tile_count, tile_area, tile_cell_area) in zip(tiles, results):
+        count[idx] = tile_count
+        area[idx] = tile_area
+        cell_area[idx] = tile_cell_area
+
+    return {
+        'building_count': count,
+        'building_area': area,
+        'built_up_fraction': np.clip(area / cell_area, 0, 1)
+    }
+
+
+def _road_class(highway):
+    """Normalize an OSM highway tag to one of ROAD_CLASSES or 'other'
+
+    osmnx stores merged edges as lists (or their string form); the first
+    tag is used. Link roads count with their parent class.
+    """
+    if isinstance(highway, (list, tuple)):
+        highway = highway[0] if highway else None
+    if highway is None or (isinstance(highway, float) and np.isnan(highway)):
+        return 'other'
+    highway = str(highway).strip("[]").split(',')[0].strip(" '\"")
+    highway = highway[:-5] if highway.endswith('_link') else highway
+    return highway if highway in ROAD_CLASSES else 'other'
+
+
+def _graphml_edge_batches(path, batch_size=ROAD_CHUNK_SIZE):
+    """Yield (geometries, highway tags, crs) batches of the edges of an osmnx GraphML file
+
+    The XML is parsed incrementally: only node coordinates (for edges
+    without a geometry attribute) and one batch of edges are held in memory.
+    """
+    import xml.etree.ElementTree as ET
+
+    keys = {}  # key id -> (domain, attribute name)
+    coords = {}
+    crs = 'EPSG:4326'
+    graph = None
+    geoms, tags = [], []
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        tag = elem.tag.rsplit('}', 1)[-1]
+        if event == 'start':
+            if tag == 'graph':
+                graph = elem
+            continue
+        if tag == 'key':
+            keys[elem.get('id')] = (elem.get('for'), elem.get('attr.name'))
+        elif tag == 'data' and keys.get(elem.get('key')) == ('graph', 'crs'):
+            crs = elem.text
+        elif tag in ('node', 'edge'):
+            data = {keys.get(d.get('key'), (None, None))[1]: d.text for d in elem}
+            if tag == 'node':
+                coords[elem.get('id')] = (float(data['x']), float(data['y']))
+            else:
+                if data.get('geometry'):
+                    geoms.append(shapely.from_wkt(data['geometry']))
+                else:
+                    geoms.append(shapely.LineString([coords[elem.get('source')],
+                                                     coords[elem.get('target')]]))
+                tags.append(data.get('highway'))
+                if len(geoms) == batch_size:
+                    yield geoms, tags, crs
+                    geoms, tags = [], []
+            # Drop parsed elements so the tree does not grow
+            graph.clear()
+    if geoms:
+        yield geoms, tags, crs
+
+
+def prepare_road_source(path, layer=OSM_ROADS_LAYER):
+    """Return (path, layer) of a road source that can be read in chunks
+
+    OGR sources (PBF, GeoPackage) are used as they are. osmnx GraphML files
+    are converted once, batch by batch, into a GeoPackage cache next to the
+    GraphML file, reused while it is newer than the GraphML.
+    """
+    if not path.lower().endswith('.graphml'):
+        return path, layer
+
+    cache_path = os.path.splitext(path)[0] + '_edges.gpkg'
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        return cache_path, 'edges'
+
+    print(f"  Converting road network from {path} (one-time)...")
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+
+    n_written = 0
+    for geoms, tags, crs in _graphml_edge_batches(path):
+        edges = gpd.GeoDataFrame({'highway': tags}, geometry=geoms, crs=crs)
+        pyogrio.write_dataframe(edges, cache_path, layer='edges', driver='GPKG',
+                                append=n_written > 0)
+        n_written += len(edges)
+
+    print(f"  ✓ Converted {n_written} edges into {cache_path}")
+    return cache_path, 'edges'
+
+
+def iter_road_chunks(path, bounds, crs, layer=OSM_ROADS_LAYER, chunk_size=ROAD_CHUNK_SIZE):
+    """Yield (geometries, highway tags) chunks of road edges within bounds
+
+    Geometries are returned in ``crs`` (the grid CRS, which ``bounds`` uses).
+    Supports OSM PBF ('lines' layer), GeoPackage/other OGR sources (e.g. an
+    osmnx edges layer) and osmnx GraphML files (through prepare_road_source).
+    """
+    path, layer = prepare_road_source(path, layer)
+    is_pbf = path.lower().endswith('.pbf')
+    layer = layer or ('lines' if is_pbf else None)
+    source_crs = pyogrio.read_info(path, layer=layer)['crs'] or 'EPSG:4326'
+    source_bounds = Transformer.from_crs(crs, source_crs, always_xy=True).transform_bounds(*bounds)
+    with pyogrio.open_arrow(
+        path,
+        layer=layer,
+        columns=['highway'],
+        where="highway IS NOT NULL" if is_pbf else None,
+        bbox=tuple(source_bounds),
+        batch_size=chunk_size,
+        use_pyarrow=True
+    ) as (meta, reader):
+        geom_col = meta['geometry_name'] or 'wkb_geometry'
+        for batch in reader:
+            geoms = gpd.GeoSeries(
+                shapely.from_wkb(batch.column(geom_col).to_numpy(zero_copy_only=False)),
+                crs=source_crs
+            ).to_crs(crs).to_numpy()
+            yield geoms, batch.column('highway').to_numpy(zero_copy_only=False)
+
+
+def _segments(geoms):
+    """Explode lines into straight segments
+
+    Returns segment start/end coordinates and the index of the source
+    geometry of every segment.
+    """
+    parts, part_geom = shapely.get_parts(geoms, return_index=True)
+    coords, part_idx = shapely.get_coordinates(parts, return_index=True)
+    same_part = part_idx[1:] == part_idx[:-1]
+    start = coords[:-1][same_part]
+    end = coords[1:][same_part]
+    return start, end, part_geom[part_idx[:-1][same_part]]
+
+
+def _clip_segments(start, end, bounds):
+    """Liang-Barsky clip of segments to axis-aligned rectangles
+
+    Returns the clipped start/end points; segments missing their rectangle
+    collapse to a point.
+    """
+    d = end - start
+    t0 = np.zeros(len(start))
+    t1 = np.ones(len(start))
+    outside = np.zeros(len(start), dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for p, q in (
+            (-d[:, 0], start[:, 0] - bounds[:, 0]),
+            (d[:, 0], bounds[:, 2] - start[:, 0]),
+            (-d[:, 1], start[:, 1] - bounds[:, 1]),
+            (d[:, 1], bounds[:, 3] - start[:, 1])
+        ):
+            r = q / p
+            t0 = np.where(p < 0, np.maximum(t0, r), t0)
+            t1 = np.where(p > 0, np.minimum(t1, r), t1)
+            outside |= (p == 0) & (q < 0)
+    t1 = np.where(outside | (t1 < t0), t0, t1)
+    return start + t0[:, None] * d, start + t1[:, None] * d
+
+
+def _longest_lines(pieces):
+    """Longest linear part of every clipped piece
+
+    Pieces of a road touching a cell at a vertex are Points, or
+    GeometryCollections mixing points and lines; only their lines have a
+    midpoint. Pieces without a line give None.
+    """
+    parts, piece_idx = shapely.get_parts(pieces, return_index=True)
+    lengths = np.where(
+        np.isin(shapely.get_type_id(parts), [1, 2]),  # LineString, LinearRing
+        shapely.length(parts), -1.0
+    )
+    # Sort parts by piece, longest first, and take the first part of each piece
+    order = np.lexsort((-lengths, piece_idx))
+    _, first = np.unique(piece_idx[order], return_index=True)
+    first = order[first]
+    longest = np.full(len(pieces), None, dtype=object)
+    has_line = lengths[first] > 0
+    longest[piece_idx[first][has_line]] = parts[first][has_line]
+    return longest
+
+
+def _edge_owners(part_idx, cell_idx, owner, n):
+    """Keep each clipped piece only in the cell owning its midpoint
+
+    A piece lying on an edge shared by two cells is clipped into both;
+    ``owner`` is the cell holding the piece's midpoint (-1 if none). Pieces
+    are kept in their owner when the owner is one of the piece's candidate
+    cells, and everywhere otherwise (e.g. on the outer edge of the grid).
+    """
+    candidates = part_idx * n + cell_idx
+    owned = (owner >= 0) & np.isin(part_idx * n + np.maximum(owner, 0), candidates)
+    return ~owned | (owner == cell_idx)
+
+
+def _block_first_cells(edge_idx, cell_idx, lattice, factor):
+    """Lowest-index cell of every (edge, block of factor × factor cells) pair"""
+    n_block_cols = lattice.n_cols // factor + 1
+    n_blocks = (lattice.n_rows // factor + 1) * n_block_cols
+    block = (lattice.rows[cell_idx] // factor) * n_block_cols + lattice.cols[cell_idx] // factor
+    key = edge_idx.astype(np.int64) * n_blocks + block
+    order = np.lexsort((cell_idx, key))
+    _, first = np.unique(key[order], return_index=True)
+    return cell_idx[order][first]
+
+
+def road_density_from_network(grid_gdf, path, by_class=True, count_factors=()):
+    """Per-cell road_count and road_length (m), optionally per road class
+
+    Edges are split at cell boundaries and the clipped lengths summed per
+    cell. On regular grids the cells are axis-aligned boxes, so edges are
+    exploded into segments that are clipped to their cells in one numpy
+    pass in the grid CRS; only the clipped end points are projected to
+    METRIC_CRS for measuring. Other grids use shapely intersections.
+    Pieces lying on an edge shared by two cells count once, in the cell
+    holding their midpoint (half-open cell bounds on regular grids, the
+    lowest cell index otherwise). road_count is the number of edges with a
+    non-zero length in each cell. Returns a dict of arrays aligned with
+    the grid rows.
+
+    On regular grids, every factor in ``count_factors`` also gives a
+    road_count_x<factor> column counting each edge once per block of
+    factor × factor cells, in the block's lowest-index cell it crosses:
+    summed over a block it is the block's distinct edge count, which is
+    how grid_pyramid aggregates road_count.
+    """
+    n = len(grid_gdf)
+    grid_crs = grid_gdf.crs
+    cells = grid_gdf.geometry.to_numpy()
+    cell_tree = shapely.STRtree(cells)
+    lattice = detect_lattice(grid_gdf)
+    is_lattice = lattice is not None
+    if is_lattice:
+        cell_bounds = shapely.bounds(cells)
+        lookup = cell_lookup(lattice)
+        to_metric = Transformer.from_crs(grid_crs, METRIC_CRS, always_xy=True)
+    else:
+        cells_metric = grid_gdf.geometry.to_crs(METRIC_CRS).to_numpy()
+
+    classes = list(ROAD_CLASSES) + ['other']
+    count = np.zeros(n, dtype=np.int64)
+    block_counts = {
+        factor: np.zeros(n, dtype=np.int64) for factor in count_factors if is_lattice and factor > 1
+    }
+    length = np.zeros(n)
+    class_length = np.zeros((len(classes), n))
+
+    n_edges = 0
+    for geoms, highway in iter_road_chunks(path, grid_gdf.total_bounds, grid_crs):
+        if is_lattice:
+            start, end, seg_edge = _segments(geoms)
+            seg_idx, cell_idx = cell_tree.query(
+                shapely.linestrings(np.stack([start, end], axis=1)), predicate='intersects'
+            )
+            clip_start, clip_end = _clip_segments(start[seg_idx], end[seg_idx], cell_bounds[cell_idx])
+            x0, y0 = to_metric.transform(clip_start[:, 0], clip_start[:, 1])
+            x1, y1 = to_metric.transform(clip_end[:, 0], clip_end[:, 1])
+            clipped = np.hypot(np.asarray(x1) - x0, np.asarray(y1) - y0)
+            
+            # Owner of each piece: the lattice cell holding its midpoint
+            mid = (clip_start + clip_end) / 2
+            rows, cols = lattice_positions(lattice, mid[:, 0], mid[:, 1])
+            inside = (rows >= 0) & (rows < lattice.n_rows) & (cols >= 0) & (cols < lattice.n_cols)
+            owner = np.full(len(mid), -1, dtype=np.int64)
+            owner[inside] = lookup[rows[inside], cols[inside]]
+            keep = (clipped > 0) & _edge_owners(seg_idx, cell_idx, owner, n)
+            edge_idx, cell_idx, clipped = seg_edge[seg_idx][keep], cell_idx[keep], clipped[keep]
+            touched = np.unique(edge_idx * n + cell_idx) % n
+            for factor, block_count in block_counts.items():
+                block_count += np.bincount(
+                    _block_first_cells(edge_idx, cell_idx, lattice, factor), minlength=n
+                )
+        else:
+            edges = gpd.GeoSeries(geoms, crs=grid_crs).to_crs(METRIC_CRS).to_numpy()
+            metric_tree = shapely.STRtree(cells_metric)
+            edge_idx, cell_idx = metric_tree.query(edges, predicate='intersects')
+            pieces = shapely.intersection(edges[edge_idx], cells_metric[cell_idx])
+            clipped = shapely.length(pieces)
+            linear = clipped > 0
+            edge_idx, cell_idx = edge_idx[linear], cell_idx[linear]
+            pieces, clipped = pieces[linear], clipped[linear]
+            
+            # Owner of each piece: the lowest-index cell covering the
+            # midpoint of its longest line
+            mid = shapely.line_interpolate_point(_longest_lines(pieces), 0.5, normalized=True)
+            piece_idx, cover_idx = metric_tree.query(mid, predicate='covered_by')
+            owner = np.full(len(pieces), np.iinfo(np.int64).max)
+            np.minimum.at(owner, piece_idx, cover_idx)
+            owner[owner == np.iinfo(np.int64).max] = -1
+            keep = _edge_owners(edge_idx, cell_idx, owner, n)
+            edge_idx, cell_idx, clipped = edge_idx[keep], cell_idx[keep], clipped[keep]
+            touched = cell_idx
+
+        count += np.bincount(touched, minlength=n)
+        length += np.bincount(cell_idx, weights=clipped, minlength=n)
+
+        if by_class:
+            # Classify each distinct tag once
+            tags, tag_idx = np.unique(highway.astype(str), return_inverse=True)
+            tag_class = np.array([classes.index(_road_class(t)) for t in tags])
+            edge_class = tag_class[tag_idx.ravel()]
+            flat = edge_class[edge_idx] * n + cell_idx
+            class_length += np.bincount(
+                flat, weights=clipped, minlength=len(classes) * n
+            ).reshape(len(classes), n)
+
+        n_edges += len(geoms)
+        print(f"  Processed {n_edges} road edges...")
+
+    stats = {'road_count': count, 'road_length': length}
+    for factor, block_count in block_counts.items():
+        stats[f'road_count_x{factor}'] = block_count
+    if by_class:
+        for i, name in enumerate(classes):
+            stats[f'road_length_{name}'] = class_length[i]
+    return stats
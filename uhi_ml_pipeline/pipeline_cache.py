@@ -0,0 +1,87 @@
+"""Pipeline cache module: Content hashes for incremental pipeline runs
+
+Each phase is keyed by a hash of its inputs (config values, input files,
+upstream artifacts and its own source code). The key and digests of the
+phase outputs are stored in a JSON manifest; a phase can be skipped while
+its key is unchanged and its outputs still match the recorded digests.
+"""
+
+import hashlib
+import json
+import os
+
+import config
+
+
+def load_manifest(path):
+    """Load the manifest, or an empty one"""
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {'files': {}, 'phases': {}}
+
+
+def save_manifest(manifest, path):
+    """Write the manifest atomically"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def file_digest(path, manifest):
+    """SHA-256 of a file's content, 'missing' if it does not exist
+
+    Digests are memoized in the manifest by size and modification time, so
+    large unchanged inputs (rasters, OSM extracts) are not re-read.
+    """
+    if not os.path.exists(path):
+        return 'missing'
+
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    memo = manifest['files'].get(path)
+    if memo and memo['size'] == stat.st_size and memo['mtime_ns'] == stat.st_mtime_ns:
+        return memo['sha256']
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    manifest['files'][path] = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest
+    }
+    return digest
+
+
+def phase_key(config_names, input_files, manifest):
+    """Hash of a phase's config values and input file contents"""
+    payload = {
+        'config': {name: getattr(config, name) for name in config_names},
+        'files': {os.path.abspath(p): file_digest(p, manifest) for p in input_files}
+    }
+    blob = json.dumps(payload, sort_keys=True, default=repr)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def is_phase_current(manifest, name, key, outputs):
+    """True if the phase ran with this key and its outputs are unchanged"""
+    record = manifest['phases'].get(name)
+    if record is None or record['key'] != key:
+        return False
+    return all(
+        record['outputs'].get(os.path.abspath(p)) == file_digest(p, manifest)
+        for p in outputs
+    )
+
+
+def record_phase(manifest, name, key, outputs):
+    """Store the phase key and the digests of its outputs"""
+    manifest['phases'][name] = {
+        'key': key,
+        'outputs': {os.path.abspath(p): file_digest(p, manifest) for p in outputs}
+    }
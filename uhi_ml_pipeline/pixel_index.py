@@ -0,0 +1,248 @@
+"""Pixel index module: Persistent sparse cell-to-pixel index
+
+The index of a grid on a raster pixel grid is a sparse matrix W of shape
+(n_cells, n_pixels) over the raster window covering the grid: W[i, j] is
+the weight of pixel j in cell i. With the default pixel centre rule (the
+rule rasterstats uses) every pixel has weight 1 in the cell containing its
+centre; with fractional weights it has the share of its area inside each
+cell, estimated on PIXEL_INDEX_SUPERSAMPLE² sub-pixels.
+
+Zonal sums are then matrix products: W @ [v, v², valid] gives every cell's
+sum, sum of squares and (weighted) pixel count, and all bands on the same
+pixel grid share one product. The index only depends on the grid geometry
+and the raster's CRS, transform and size, so it is built once, stored under
+PIXEL_INDEX_DIR and reused by every raster on that pixel grid (LST, NDVI,
+all scene dates). A changed grid or transform gives a different key; the
+index of an outdated grid for the same pixel grid is removed.
+"""
+
+import hashlib
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+import rasterio
+import shapely
+from affine import Affine
+from rasterio.features import rasterize
+from rasterio.windows import Window, from_bounds
+from scipy import sparse
+
+from config import PIXEL_INDEX_DIR, PIXEL_INDEX_FRACTIONAL, PIXEL_INDEX_SUPERSAMPLE
+from grid_lattice import detect_lattice, cell_lookup
+from raster_zonal import raster_matches_grid, pixel_labels, finalize, clip_window
+
+
+INDEX_VERSION = 1
+
+# Pixels (or sub-pixels) handled per row strip, bounding memory
+STRIP_PIXELS = 4_000_000
+
+# matrix: scipy CSC matrix (n_cells, width * height), pixels row-major
+# window: (col_off, row_off, width, height) of the raster covered
+# fractional: True for area weights, False for the pixel centre rule
+PixelIndex = namedtuple('PixelIndex', ['matrix', 'window', 'fractional'])
+
+
+def grid_digest(grid_gdf):
+    """SHA-256 of the grid's cell geometries (in order) and CRS"""
+    h = hashlib.sha256()
+    h.update(str(grid_gdf.crs).encode())
+    h.update(b''.join(shapely.to_wkb(grid_gdf.geometry.values)))
+    return h.hexdigest()
+
+
+def raster_grid_key(src):
+    """Identity of a raster's pixel grid: rasters with equal keys share an index"""
+    crs = src.crs.to_wkt() if src.crs else None
+    return (crs, tuple(src.transform)[:6], src.width, src.height)
+
+
+def raster_grid_digest(src):
+    return hashlib.sha256(repr(raster_grid_key(src)).encode()).hexdigest()
+
+
+def _strip_labels(src, window, start, n_rows, k, lattice=None, lookup=None, cells=None):
+    """Cell index of every sub-pixel centre in a strip of the window, -1 outside"""
+    col_off, row_off = int(window.col_off), int(window.row_off)
+    width = int(window.width)
+    if lattice is not None:
+        t = src.transform
+        sub = Affine(t.a / k, t.b, t.c, t.d, t.e / k, t.f)
+        return pixel_labels(lattice, lookup, sub, (row_off + start) * k, col_off * k,
+                            n_rows * k, width * k)
+    transform = src.window_transform(Window(col_off, row_off + start, width, n_rows))
+    return rasterize(
+        zip(cells, np.arange(len(cells), dtype=np.int32)),
+        out_shape=(n_rows * k, width * k),
+        transform=transform * Affine.scale(1 / k),
+        fill=-1,
+        dtype='int32'
+    )
+
+
+def build_pixel_index(grid_gdf, src, fractional=PIXEL_INDEX_FRACTIONAL,
+                      supersample=PIXEL_INDEX_SUPERSAMPLE):
+    """Cell-to-pixel index of a grid on an open raster's pixel grid
+
+    Regular grids in the raster's CRS are labelled on the lattice; any other
+    grid is reprojected to the raster CRS and rasterized. Raises ValueError
+    when the raster does not overlap the grid.
+    """
+    lattice = detect_lattice(grid_gdf) if raster_matches_grid(src, grid_gdf.crs) else None
+    lookup = cells = None
+    if lattice is not None:
+        lookup = cell_lookup(lattice)
+        bounds = (lattice.x0, lattice.y0,
+                  lattice.x0 + lattice.n_cols * lattice.cell_size,
+                  lattice.y0 + lattice.n_rows * lattice.cell_size)
+    else:
+        geometry = grid_gdf.geometry.to_crs(src.crs) if src.crs and grid_gdf.crs else grid_gdf.geometry
+        cells = geometry.values
+        bounds = geometry.total_bounds
+    window = clip_window(from_bounds(*bounds, transform=src.transform), src)
+    if window is None:
+        raise ValueError("Raster does not overlap the grid")
+
+    k = supersample if fractional else 1
+    n_cells = len(grid_gdf)
+    width, height = int(window.width), int(window.height)
+    strip = max(1, STRIP_PIXELS // (width * k * k))
+    parts = []
+    for start in range(0, height, strip):
+        n_rows = min(strip, height - start)
+        labels = _strip_labels(src, window, start, n_rows, k, lattice, lookup, cells)
+        sub_rows, sub_cols = np.nonzero(labels >= 0)
+        pixels = (sub_rows // k) * width + sub_cols // k
+        # Duplicate (cell, pixel) sub-pixel entries are summed into fractions
+        parts.append(sparse.csc_matrix(
+            (np.full(len(pixels), 1 / (k * k), dtype=np.float32),
+             (labels[sub_rows, sub_cols], pixels)),
+            shape=(n_cells, n_rows * width)
+        ))
+    matrix = sparse.hstack(parts, format='csc') if parts else sparse.csc_matrix((n_cells, 0))
+    return PixelIndex(matrix, (int(window.col_off), int(window.row_off), width, height),
+                      bool(fractional))
+
+
+def index_path(src, grid_hash, fractional=PIXEL_INDEX_FRACTIONAL,
+               supersample=PIXEL_INDEX_SUPERSAMPLE, index_dir=PIXEL_INDEX_DIR):
+    """File of an index: <pixel grid digest>_<grid digest>_<weighting>.npz"""
+    weighting = f'frac{supersample}' if fractional else 'centre'
+    return os.path.join(index_dir, f'{raster_grid_digest(src)[:16]}_{grid_hash[:16]}_{weighting}.npz')
+
+
+def save_pixel_index(index, path):
+    """Write an index atomically, removing indexes of other grids on this pixel grid"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez(
+        tmp_path,
+        version=INDEX_VERSION,
+        data=index.matrix.data, indices=index.matrix.indices, indptr=index.matrix.indptr,
+        shape=np.array(index.matrix.shape), window=np.array(index.window),
+        fractional=index.fractional
+    )
+    os.replace(tmp_path, path)
+
+    raster_part, _, weighting = os.path.basename(path).split('_')
+    for name in os.listdir(os.path.dirname(path)):
+        parts = name.split('_')
+        if (len(parts) == 3 and parts[0] == raster_part and parts[2] == weighting
+                and name != os.path.basename(path)):
+            os.remove(os.path.join(os.path.dirname(path), name))
+
+
+def load_pixel_index(path):
+    """Read a stored index, None if missing or from another format version"""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as f:
+        if int(f['version']) != INDEX_VERSION:
+            return None
+        matrix = sparse.csc_matrix((f['data'], f['indices'], f['indptr']), shape=tuple(f['shape']))
+        return PixelIndex(matrix, tuple(int(v) for v in f['window']), bool(f['fractional']))
+
+
+def get_pixel_index(grid_gdf, src, grid_hash=None, fractional=PIXEL_INDEX_FRACTIONAL,
+                    supersample=PIXEL_INDEX_SUPERSAMPLE, index_dir=PIXEL_INDEX_DIR):
+    """Stored index for the grid and the raster's pixel grid, built on first use"""
+    grid_hash = grid_hash or grid_digest(grid_gdf)
+    path = index_path(src, grid_hash, fractional, supersample, index_dir)
+    index = load_pixel_index(path)
+    if index is not None:
+        print(f"  Cell-to-pixel index: loaded {os.path.basename(path)}")
+        return index
+
+    start = time.perf_counter()
+    index = build_pixel_index(grid_gdf, src, fractional, supersample)
+    save_pixel_index(index, path)
+    print(f"  Cell-to-pixel index: built {os.path.basename(path)} "
+          f"({index.matrix.nnz} entries, {time.perf_counter() - start:.2f}s)")
+    return index
+
+
+def index_zonal_stats(index, sources, nodata=-9999):
+    """Mean/std/count per cell for rasters sharing the index's pixel grid
+
+    ``sources`` maps names to open rasterio datasets. All bands are reduced
+    in one sparse product per row strip. Counts are pixel counts (weighted
+    sums with fractional weights). Returns {name: {'mean', 'std', 'count'}}.
+    """
+    col_off, row_off, width, height = index.window
+    n_cells = index.matrix.shape[0]
+    names = list(sources)
+    sums = np.zeros((n_cells, 3 * len(names)))
+    strip = max(1, STRIP_PIXELS // max(width, 1))
+
+    for start in range(0, height, strip):
+        n_rows = min(strip, height - start)
+        block = index.matrix[:, start * width:(start + n_rows) * width]
+        if block.nnz == 0:
+            continue
+        window = Window(col_off, row_off + start, width, n_rows)
+        columns = []
+        for name in names:
+            src = sources[name]
+            values = src.read(1, window=window).ravel().astype(np.float64)
+            band_nodata = src.nodata if src.nodata is not None else nodata
+            valid = np.isfinite(values)
+            if band_nodata is not None:
+                valid &= values != band_nodata
+            values = np.where(valid, values, 0.0)
+            columns += [values, values * values, valid.astype(np.float64)]
+        sums += block @ np.column_stack(columns)
+
+    results = {}
+    for i, name in enumerate(names):
+        count = sums[:, 3 * i + 2]
+        results[name] = finalize({
+            'sum': sums[:, 3 * i],
+            'sumsq': sums[:, 3 * i + 1],
+            'count': count if index.fractional else np.rint(count).astype(np.int64)
+        })
+    return results
+
+
+def zonal_stats_by_index(grid_gdf, raster_paths, nodata=-9999, index_dir=PIXEL_INDEX_DIR):
+    """Mean/std/count per cell for several rasters through stored indexes
+
+    ``raster_paths`` maps names to raster files. Rasters on the same pixel
+    grid share one index and one pass. Returns {name: {'mean', 'std', 'count'}}.
+    """
+    sources = {name: rasterio.open(path) for name, path in raster_paths.items()}
+    try:
+        groups = {}
+        for name, src in sources.items():
+            groups.setdefault(raster_grid_key(src), []).append(name)
+
+        grid_hash = grid_digest(grid_gdf)
+        results = {}
+        for names in groups.values():
+            index = get_pixel_index(grid_gdf, sources[names[0]], grid_hash, index_dir=index_dir)
+            results.update(index_zonal_stats(index, {name: sources[name] for name in names}, nodata))
+        return results
+    finally:
+        for src in sources.values():
+            src.close()
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""Prediction service: Local HTTP API for UHI predictions
+
+Loads the trained model and the feature grid once and serves predictions
+over HTTP on localhost:
+
+    GET  /health                      service status
+    GET  /metrics                     latency and throughput metrics
+    GET  /predict?lat=..&lon=..       prediction for the cell at a location
+    POST /predict                     {"features": [{name: value, ...}, ...]}
+                                      or rows of values in MODEL_FEATURES order
+    POST /predict/location            {"locations": [[lat, lon], ...]}
+
+Locations resolve to grid cells through an in-memory lattice index.
+Concurrent requests are grouped into micro-batches, so the model runs one
+predict call per batch instead of one per request.
+"""
+
+import json
+import queue
+import threading
+import time
+import argparse
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from config import (
+    FEATURES_PARQUET,
+    MODEL_FEATURES,
+    TARGET_COLUMN,
+    SERVICE_HOST,
+    SERVICE_PORT,
+    SERVICE_MAX_BATCH,
+    SERVICE_BATCH_WAIT_MS
+)
+from artifacts import read_geoparquet, resolution_path
+from grid_lattice import detect_lattice, cell_lookup, lattice_positions
+from model_store import load_model, best_model_path
+
+
+class GridIndex:
+    """In-memory lookup from coordinates to grid cells and their features"""
+
+    def __init__(self, gdf):
+        self.cell_ids = gdf['cell_id'].to_numpy()
+        # Missing features are filled with column means, as in make_predictions
+        features = gdf[MODEL_FEATURES]
+        self.features = features.fillna(features.mean()).to_numpy(dtype=float)
+        self.observed = gdf[TARGET_COLUMN].to_numpy(dtype=float)
+
+        self.lattice = detect_lattice(gdf)
+        if self.lattice is not None:
+            self.lookup = cell_lookup(self.lattice)
+            self.tree = None
+        else:
+            self.lookup = None
+            self.tree = shapely.STRtree(gdf.geometry.to_numpy())
+
+    def __len__(self):
+        return len(self.cell_ids)
+
+    def locate(self, lat, lon):
+        """Positional cell index of every location, -1 outside the grid"""
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        if self.lattice is not None:
+            rows, cols = lattice_positions(self.lattice, lon, lat)
+            inside = ((rows >= 0) & (rows < self.lattice.n_rows) &
+                      (cols >= 0) & (cols < self.lattice.n_cols))
+            idx = np.full(len(lat), -1, dtype=np.int64)
+            idx[inside] = self.lookup[rows[inside], cols[inside]]
+            return idx
+
+        points_idx, cells_idx = self.tree.query(shapely.points(lon, lat), predicate='intersects')
+        # A point on a shared edge matches two cells; keep the first
+        points_idx, first = np.unique(points_idx, return_index=True)
+        idx = np.full(len(lat), -1, dtype=np.int64)
+        idx[points_idx] = cells_idx[first]
+        return idx
+
+
+class ServiceMetrics:
+    """Thread-safe request latency and throughput counters"""
+
+    def __init__(self, window=10000):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.rows = 0
+        self.batches = 0
+        self.batch_rows = 0
+        self.latencies = deque(maxlen=window)  # seconds, most recent requests
+
+    def record_request(self, latency, rows, error=False):
+        with self.lock:
+            self.requests += 1
+            self.rows += rows
+            self.errors += int(error)
+            self.latencies.append(latency)
+
+    def record_batch(self, rows):
+        with self.lock:
+            self.batches += 1
+            self.batch_rows += rows
+
+    def snapshot(self):
+        with self.lock:
+            uptime = time.time() - self.started
+            latencies = np.array(self.latencies) * 1000
+            snapshot = {
+                'uptime_s': round(uptime, 3),
+                'requests': self.requests,
+                'errors': self.errors,
+                'rows': self.rows,
+                'batches': self.batches,
+                'mean_batch_rows': round(self.batch_rows / self.batches, 2) if self.batches else None,
+                'requests_per_s': round(self.requests / uptime, 2) if uptime else None,
+                'rows_per_s': round(self.rows / uptime, 2) if uptime else None
+            }
+        for q in (50, 95, 99):
+            snapshot[f'latency_p{q}_ms'] = (
+                round(float(np.percentile(latencies, q)), 3) if len(latencies) else None
+            )
+        return snapshot
+
+
+class MicroBatcher:
+    """Group concurrent prediction requests into batched model calls
+
+    Requests queue their feature rows; a worker thread takes whatever is
+    waiting (up to ``max_batch`` rows, waiting at most ``max_wait``
+    seconds for more), runs one predict call and hands each request its
+    slice of the result. If the batched call fails, its requests are
+    re-run one by one, so only the request that causes the error fails.
+    """
+
+    def __init__(self, predict, max_batch=SERVICE_MAX_BATCH,
+                 max_wait=SERVICE_BATCH_WAIT_MS / 1000, metrics=None):
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.metrics = metrics
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, X):
+        """Queue a (n, n_features) array; returns a Future of n predictions"""
+        future = Future()
+        self.queue.put((X, future))
+        return future
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def _collect(self, first):
+        """Gather queued requests into one batch, starting with ``first``"""
+        batch = [first]
+        rows = len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self.queue.put(None)  # stop after this batch
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run_each(self, batch):
+        """Predict every request of a failed batch on its own"""
+        for X, future in batch:
+            try:
+                predictions = self.predict(X)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            if self.metrics is not None:
+                self.metrics.record_batch(len(X))
+            future.set_result(predictions)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = self._collect(item)
+            sizes = [len(X) for X, _ in batch]
+            try:
+                predictions = self.predict(np.vstack([X for X, _ in batch]))
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                else:
+                    self._run_each(batch)
+                continue
+            if self.metrics is not None:
+                self.metrics.record_batch(sum(sizes))
+            for (_, future), part in zip(batch, np.split(predictions, np.cumsum(sizes)[:-1])):
+                future.set_result(part)
+
+
+class PredictionService:
+    """Model, grid index and micro-batcher shared by all requests"""
+
+    def __init__(self, resolution=None, max_batch=SERVICE_MAX_BATCH,
+                 max_wait_ms=SERVICE_BATCH_WAIT_MS):
+        model_path = best_model_path(resolution)
+        features_path = resolution_path(FEATURES_PARQUET, resolution)
+
+        self.model = load_model(model_path)
+        gdf = read_geoparquet(features_path, columns=['cell_id', TARGET_COLUMN] + MODEL_FEATURES)
+        self.index = GridIndex(gdf)
+        self.resolution = resolution
+        self.metrics = ServiceMetrics()
+        self.batcher = MicroBatcher(
+            self._predict, max_batch=max_batch,
+            max_wait=max_wait_ms / 1000, metrics=self.metrics
+        )
+
+    def _predict(self, X):
+        # Keep the feature names the model was trained with
+        return self.model.predict(pd.DataFrame(X, columns=MODEL_FEATURES))
+
+    def close(self):
+        self.batcher.close()
+
+    def predict_features(self, rows):
+        """Predictions for feature rows (dicts by name or lists in MODEL_FEATURES order)"""
+        if not isinstance(rows, list) or not rows:
+            raise ValueError("'features' must be a non-empty list")
+        if all(isinstance(row, dict) for row in rows):
+            missing = set(MODEL_FEATURES) - set().union(*rows)
+            if missing:
+                raise ValueError(f"Missing features: {sorted(missing)}")
+            rows = [[row[name] for name in MODEL_FEATURES] for row in rows]
+        X = np.array(rows, dtype=float)
+        if X.ndim != 2 or X.shape[1] != len(MODEL_FEATURES):
+            raise ValueError(f"Each row needs {len(MODEL_FEATURES)} values: {MODEL_FEATURES}")
+        # Reject NaN/Infinity here so one bad row cannot fail a whole micro-batch
+        bad_rows = np.flatnonzero(~np.isfinite(X).all(axis=1))
+        if len(bad_rows):
+            raise ValueError(f"Non-finite feature values in rows: {bad_rows.tolist()}")
+        predictions = self.batcher.submit(X).result()
+        return {'predictions': predictions.tolist()}
+
+    def predict_locations(self, locations):
+        """Predictions for the cells containing [lat, lon] locations"""
+        if not isinstance(locations, list) or not locations:
+            raise ValueError("'locations' must be a non-empty list")
+        coords = np.array(
+            [[p['lat'], p['lon']] if isinstance(p, dict) else p for p in locations],
+            dtype=float
+        )
+        if coords.ndim != 2 or coords.shape[1] != 2:
+            raise ValueError("Each location must be [lat, lon] or {'lat': .., 'lon': ..}")
+
+        idx = self.index.locate(coords[:, 0], coords[:, 1])
+        inside = idx >= 0
+        predictions = np.full(len(idx), np.nan)
+        if inside.any():
+            predictions[inside] = self.batcher.submit(self.index.features[idx[inside]]).result()
+
+        results = []
+        for (lat, lon), i, pred in zip(coords, idx, predictions):
+            if i < 0:
+                results.append({'lat': lat, 'lon': lon, 'cell_id': None, 'prediction': None})
+                continue
+            observed = self.index.observed[i]
+            results.append({
+                'lat': lat,
+                'lon': lon,
+                'cell_id': int(self.index.cell_ids[i]),
+                'prediction': float(pred),
+                'observed': None if np.isnan(observed) else float(observed)
+            })
+        return {'cells': results}
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    """JSON request handler; the service lives on the server object"""
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, route):
+        start = time.perf_counter()
+        service = self.server.service
+        rows = 0
+        try:
+            payload = route(service)
+            rows = len(payload.get('predictions', payload.get('cells', [])))
+            self._send_json(200, payload)
+            error = False
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {'error': f'Bad request: {e}'})
+            error = True
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            error = True
+        service.metrics.record_request(time.perf_counter() - start, rows, error)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            service = self.server.service
+            self._send_json(200, {
+                'status': 'ok',
+                'cells': len(service.index),
+                'resolution': service.resolution,
+                'features': MODEL_FEATURES
+            })
+        elif url.path == '/metrics':
+            self._send_json(200, self.server.service.metrics.snapshot())
+        elif url.path == '/predict':
+            query = parse_qs(url.query)
+            self._handle(lambda service: service.predict_locations(
+                [[float(query['lat'][0]), float(query['lon'][0])]]
+            ))
+        else:
+            self._send_json(404, {'error': f'Unknown path: {url.path}'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == '/predict':
+            self._handle(lambda service: service.predict_features(self._read_json()['features']))
+        elif url.path == '/predict/location':
+            self._handle(lambda service: service.predict_locations(self._read_json()['locations']))
+        else:
+            self._send_json(404, {'error': f'Unknown path: {url.path}'})
+
+    def log_message(self, format, *args):
+        pass  # per-request logging would dominate at high request rates
+
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog; the default of 5 stalls bursts of clients
+
+
+def create_server(host=SERVICE_HOST, port=SERVICE_PORT, resolution=None, **batch_kwargs):
+    """HTTP server with a loaded PredictionService (call serve_forever to run)"""
+    server = PredictionServer((host, port), PredictionHandler)
+    server.service = PredictionService(resolution, **batch_kwargs)
+    return server
+
+
+def run_service(host=SERVICE_HOST, port=SERVICE_PORT, resolution=None):
+    """Serve predictions until interrupted"""
+    print("=" * 60)
+    print("UHI PREDICTION SERVICE")
+    print("=" * 60)
+
+    server = create_server(host, port, resolution)
+    print(f"✓ Loaded model and {len(server.service.index)} grid cells")
+    print(f"✓ Listening on http://{host}:{server.server_address[1]}")
+    print("  Press Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+        server.service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve UHI predictions over HTTP")
+    parser.add_argument('--host', default=SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    parser.add_argument('--resolution', default=None,
+                        help='Grid pyramid level to serve (e.g. 1km)')
+    args = parser.parse_args()
+    run_service(args.host, args.port, args.resolution)
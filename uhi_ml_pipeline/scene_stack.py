@@ -0,0 +1,234 @@
+"""Scene stack module: Per-date raster features for many Landsat acquisitions
+
+Reads dated LST/NDVI scenes from a manifest (CSV with date, band, path
+columns) or from a directory of files named ``<band>_<date>.tif`` and
+writes a (cell, date) feature table: one Parquet file per date under
+SCENE_FEATURES_DIR, read back as a single table with load_scene_table.
+
+Which pixels belong to which grid cell depends only on the raster's pixel
+grid (CRS, transform and size), which scenes of the same path/row share.
+The stored cell-to-pixel index (pixel_index.py) of every distinct pixel
+grid is loaded or built once; each date is then a sparse product over its
+pixels, with all bands on a pixel grid reduced together. Dates are
+processed in parallel; workers load the indexes from PIXEL_INDEX_DIR
+rather than receiving copies. Bands a date's output file already has
+are skipped, and bands that arrive later are added to it.
+"""
+
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import rasterio
+
+from config import (
+    GRID_PARQUET,
+    PIXEL_INDEX_DIR,
+    SCENE_DIR,
+    SCENE_MANIFEST,
+    SCENE_BANDS,
+    SCENE_FEATURES_DIR,
+    SCENE_WORKERS
+)
+from artifacts import read_geoparquet
+from raster_zonal import new_accumulator, finalize
+from pixel_index import (
+    grid_digest, raster_grid_key, get_pixel_index, index_path, load_pixel_index, index_zonal_stats
+)
+
+
+# Scene files in SCENE_DIR: <band>_<YYYY-MM-DD or YYYYMMDD>.tif
+SCENE_FILE_PATTERN = re.compile(r'^([a-z]+)_(\d{4}-?\d{2}-?\d{2})\.tiff?$', re.IGNORECASE)
+
+
+def _iso_date(value):
+    return pd.Timestamp(str(value)).date().isoformat()
+
+
+def discover_scenes(manifest=SCENE_MANIFEST, scene_dir=SCENE_DIR):
+    """Scenes by date: {'YYYY-MM-DD': {feature prefix: raster path}}
+
+    Uses the manifest when it exists (relative paths are relative to it),
+    otherwise the scene files in ``scene_dir``. Bands not in SCENE_BANDS
+    are ignored.
+    """
+    entries = []
+    if manifest and os.path.exists(manifest):
+        base = os.path.dirname(os.path.abspath(manifest))
+        for row in pd.read_csv(manifest).itertuples(index=False):
+            entries.append((row.date, row.band, os.path.join(base, row.path)))
+    elif scene_dir and os.path.isdir(scene_dir):
+        for name in sorted(os.listdir(scene_dir)):
+            match = SCENE_FILE_PATTERN.match(name)
+            if match:
+                entries.append((match.group(2), match.group(1), os.path.join(scene_dir, name)))
+
+    scenes = {}
+    for date, band, path in entries:
+        prefix = SCENE_BANDS.get(str(band).lower())
+        if prefix is not None:
+            scenes.setdefault(_iso_date(date), {})[prefix] = path
+    return dict(sorted(scenes.items()))
+
+
+def build_indexes(grid_gdf, scenes, index_dir=PIXEL_INDEX_DIR):
+    """Stored index file of every distinct raster pixel grid among the scenes
+
+    Returns {pixel grid key: index file name in ``index_dir``}, None for
+    pixel grids that do not overlap the grid. Missing indexes are built.
+    """
+    grid_hash = grid_digest(grid_gdf)
+    indexes = {}
+    for bands in scenes.values():
+        for path in bands.values():
+            with rasterio.open(path) as src:
+                key = raster_grid_key(src)
+                if key not in indexes:
+                    try:
+                        get_pixel_index(grid_gdf, src, grid_hash, index_dir=index_dir)
+                        indexes[key] = os.path.basename(index_path(src, grid_hash, index_dir=index_dir))
+                    except ValueError:
+                        indexes[key] = None  # scene does not overlap the grid
+    return indexes
+
+
+def scene_path(date, out_dir=SCENE_FEATURES_DIR):
+    return os.path.join(out_dir, f'{date}.parquet')
+
+
+def missing_bands(date, bands, out_dir=SCENE_FEATURES_DIR):
+    """Bands of a date that its output file does not have yet"""
+    import pyarrow.parquet as pq
+
+    path = scene_path(date, out_dir)
+    if not os.path.exists(path):
+        return dict(bands)
+    columns = set(pq.read_schema(path).names)
+    return {prefix: band_path for prefix, band_path in bands.items()
+            if f'{prefix}_mean' not in columns}
+
+
+# Worker state, set once per process by _init_scene_worker
+_worker_state = {}
+
+
+def _init_scene_worker(index_files, cell_ids, out_dir, index_dir):
+    _worker_state.update(index_files=index_files, indexes={}, cell_ids=cell_ids,
+                         out_dir=out_dir, index_dir=index_dir)
+
+
+def _worker_index(key):
+    """Index of a pixel grid, read from the index directory on first use"""
+    indexes = _worker_state['indexes']
+    if key not in indexes:
+        name = _worker_state['index_files'][key]
+        indexes[key] = None if name is None else load_pixel_index(
+            os.path.join(_worker_state['index_dir'], name)
+        )
+    return indexes[key]
+
+
+def process_date(date, bands):
+    """Write the feature table of one date; returns (date, cells with data)
+
+    Columns of other bands already in the date's file are kept.
+    """
+    cell_ids = _worker_state['cell_ids']
+    sources = {prefix: rasterio.open(path) for prefix, path in sorted(bands.items())}
+    try:
+        # Bands on the same pixel grid are reduced in one sparse product
+        groups = {}
+        for prefix, src in sources.items():
+            groups.setdefault(raster_grid_key(src), []).append(prefix)
+        stats = {}
+        for key, prefixes in groups.items():
+            index = _worker_index(key)
+            if index is None:
+                stats.update({prefix: finalize(new_accumulator(len(cell_ids))) for prefix in prefixes})
+            else:
+                stats.update(index_zonal_stats(index, {prefix: sources[prefix] for prefix in prefixes}))
+    finally:
+        for src in sources.values():
+            src.close()
+
+    table = pd.DataFrame({'cell_id': cell_ids, 'date': pd.Timestamp(date)})
+    for prefix in sources:
+        table[f'{prefix}_mean'] = stats[prefix]['mean']
+        table[f'{prefix}_std'] = stats[prefix]['std']
+        table[f'{prefix}_count'] = stats[prefix]['count']
+
+    path = scene_path(date, _worker_state['out_dir'])
+    if os.path.exists(path):
+        existing = pd.read_parquet(path)
+        existing = existing.drop(columns=[c for c in table.columns if c not in ('cell_id', 'date')],
+                                 errors='ignore')
+        table = existing.merge(table, on=['cell_id', 'date'], how='outer')
+
+    # Write-then-rename, so an interrupted run leaves no partial date behind
+    table.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+    has_data = table.filter(like='_count').gt(0).any(axis=1)
+    return date, int(has_data.sum())
+
+
+def stack_scenes(manifest=SCENE_MANIFEST, scene_dir=SCENE_DIR, out_dir=SCENE_FEATURES_DIR,
+                 grid_path=GRID_PARQUET, n_workers=SCENE_WORKERS, force=False,
+                 index_dir=PIXEL_INDEX_DIR):
+    """Extract per-cell features for every scene band not yet in ``out_dir``"""
+    print("=" * 60)
+    print("SCENE STACK: PER-DATE RASTER FEATURES")
+    print("=" * 60)
+
+    scenes = discover_scenes(manifest, scene_dir)
+    if not scenes:
+        print(f"No scenes found (manifest: {manifest}, directory: {scene_dir})")
+        return []
+
+    os.makedirs(out_dir, exist_ok=True)
+    todo = {date: bands if force else missing_bands(date, bands, out_dir)
+            for date, bands in scenes.items()}
+    todo = {date: bands for date, bands in todo.items() if bands}
+    print(f"✓ {len(scenes)} scene dates, {len(scenes) - len(todo)} already extracted")
+    if not todo:
+        return []
+
+    grid_gdf = read_geoparquet(grid_path)
+    indexes = build_indexes(grid_gdf, todo, index_dir)
+    print(f"✓ Cell-to-pixel indexes for {len(indexes)} raster grid(s), {len(grid_gdf)} cells")
+
+    done = []
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_init_scene_worker,
+        initargs=(indexes, grid_gdf['cell_id'].to_numpy(), out_dir, index_dir)
+    ) as executor:
+        futures = [executor.submit(process_date, date, bands) for date, bands in todo.items()]
+        for future in as_completed(futures):
+            date, n_cells = future.result()
+            done.append(date)
+            print(f"  ✓ {date}: {n_cells} cells with data")
+
+    print(f"✓ Scene features saved to: {out_dir}\n")
+    return sorted(done)
+
+
+def load_scene_table(out_dir=SCENE_FEATURES_DIR):
+    """The (cell, date) feature table of all extracted dates"""
+    files = sorted(f for f in os.listdir(out_dir) if f.endswith('.parquet'))
+    table = pd.concat([pd.read_parquet(os.path.join(out_dir, f)) for f in files],
+                      ignore_index=True)
+    return table.sort_values(['date', 'cell_id'], ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract per-date features from a stack of scenes")
+    parser.add_argument('--manifest', default=SCENE_MANIFEST,
+                        help='CSV with date, band and path columns')
+    parser.add_argument('--scene-dir', default=SCENE_DIR,
+                        help='Directory of <band>_<date>.tif files (used without a manifest)')
+    parser.add_argument('--workers', type=int, default=SCENE_WORKERS)
+    parser.add_argument('--force', action='store_true', help='Re-extract dates already present')
+    args = parser.parse_args()
+    stack_scenes(args.manifest, args.scene_dir, n_workers=args.workers, force=args.force)
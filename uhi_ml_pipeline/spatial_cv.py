@@ -0,0 +1,213 @@
+"""Spatial CV module: Spatial block cross-validation
+
+Neighbouring grid cells have similar features and temperatures, so a
+random train/test split scores models on cells that are almost copies of
+training cells. Spatial block CV groups cells into square blocks of
+SPATIAL_CV_BLOCK_DEGREES by centroid and keeps whole blocks on one side
+of every split.
+
+All (fold, model) fits run in parallel worker processes. The feature
+matrix is written once to a .npy file that every worker memory-maps, so
+workers share the operating system's copy instead of each unpickling
+their own. Once SPATIAL_CV_TIME_BUDGET is spent no new fits start, and
+the summary covers the folds that finished.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+from threadpoolctl import threadpool_limits
+
+from config import (
+    MODEL_CANDIDATES,
+    SPATIAL_CV_FOLDS,
+    SPATIAL_CV_BLOCK_DEGREES,
+    SPATIAL_CV_TIME_BUDGET,
+    SPATIAL_CV_WORKERS,
+    SPATIAL_CV_FOLDS_CSV,
+    SPATIAL_CV_SUMMARY_CSV
+)
+from artifacts import resolution_path
+
+
+METRICS = ['R2', 'RMSE', 'MAE']
+
+
+def spatial_blocks(lat, lon, block_size=SPATIAL_CV_BLOCK_DEGREES):
+    """Block id of every cell: the square of ``block_size`` degrees holding its centroid"""
+    block_row = np.floor(np.asarray(lat) / block_size).astype(np.int64)
+    block_col = np.floor(np.asarray(lon) / block_size).astype(np.int64)
+    _, blocks = np.unique(np.column_stack([block_row, block_col]), axis=0, return_inverse=True)
+    return blocks.ravel()
+
+
+def block_folds(blocks, n_folds=SPATIAL_CV_FOLDS):
+    """Test-row indices of each fold; every block lies in exactly one fold
+
+    Folds are balanced by row count (GroupKFold). Fewer folds are returned
+    when there are fewer blocks than folds, and none for a single block.
+    """
+    from sklearn.model_selection import GroupKFold
+    
+    n_folds = min(n_folds, len(np.unique(blocks)))
+    if n_folds < 2:
+        return []
+    splitter = GroupKFold(n_splits=n_folds)
+    return [test for _, test in splitter.split(blocks, groups=blocks)]
+
+
+# Worker state, set once per process by _init_cv_worker
+_worker_state = {}
+
+
+def _init_cv_worker(X_path, y_path, fold_of_row):
+    _worker_state['X'] = np.load(X_path, mmap_mode='r')
+    _worker_state['y'] = np.load(y_path, mmap_mode='r')
+    _worker_state['fold_of_row'] = fold_of_row
+
+
+def _score(y_true, y_pred):
+    from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error
+    return {
+        'R2': r2_score(y_true, y_pred),
+        'RMSE': np.sqrt(mean_squared_error(y_true, y_pred)),
+        'MAE': mean_absolute_error(y_true, y_pred)
+    }
+
+
+def run_fold(task):
+    """Fit one candidate on all folds but one and score it on the held-out fold"""
+    # Imported here so worker processes only pay for what they use
+    from model_training import build_model
+
+    fold, name, estimator, params = task
+    X, y = _worker_state['X'], _worker_state['y']
+    test = _worker_state['fold_of_row'] == fold
+
+    start = time.perf_counter()
+    with threadpool_limits(limits=1):
+        model = build_model(estimator, params, n_jobs=1)
+        model.fit(X[~test], y[~test])
+        train_scores = _score(y[~test], model.predict(X[~test]))
+        test_scores = _score(y[test], model.predict(X[test]))
+
+    result = {'Model': name, 'Fold': fold, 'Train_rows': int((~test).sum()),
+              'Test_rows': int(test.sum())}
+    for metric in METRICS:
+        result[f'Train_{metric}'] = train_scores[metric]
+        result[f'Test_{metric}'] = test_scores[metric]
+    result['Fit_seconds'] = time.perf_counter() - start
+    return result
+
+
+def summarize_folds(folds_df):
+    """Mean and standard deviation of every metric over each model's folds"""
+    columns = [f'{split}_{metric}' for split in ('Train', 'Test') for metric in METRICS]
+    grouped = folds_df.groupby('Model', sort=False)
+    summary = grouped[columns].mean()
+    for column in columns:
+        if column.startswith('Test_'):
+            summary[f'{column}_std'] = grouped[column].std(ddof=0)
+    summary.insert(0, 'Folds', grouped.size())
+    return summary.reset_index()
+
+
+def spatial_cross_validate(X, y, lat, lon, candidates=MODEL_CANDIDATES,
+                           n_folds=SPATIAL_CV_FOLDS, block_size=SPATIAL_CV_BLOCK_DEGREES,
+                           time_budget=SPATIAL_CV_TIME_BUDGET, n_workers=SPATIAL_CV_WORKERS):
+    """Run every candidate on every spatial fold; returns (folds_df, summary_df)
+
+    Fits are queued fold by fold, so a budget cut leaves complete folds
+    for all candidates rather than all folds for some. ``time_budget`` is
+    in seconds of wall clock; None disables it. summary_df is None when
+    no fit finished within the budget.
+    """
+    blocks = spatial_blocks(lat, lon, block_size)
+    fold_of_row = np.empty(len(blocks), dtype=np.int32)
+    folds = block_folds(blocks, n_folds)
+    for fold, test in enumerate(folds):
+        fold_of_row[test] = fold
+    print(f"  {len(folds)} folds over {len(np.unique(blocks))} blocks")
+
+    tasks = [
+        (fold, name, estimator, params)
+        for fold in range(len(folds))
+        for name, (estimator, params) in candidates.items()
+    ]
+
+    deadline = time.perf_counter() + time_budget if time_budget else None
+    results = []
+    workdir = tempfile.mkdtemp(prefix='spatial_cv_')
+    try:
+        X_path = os.path.join(workdir, 'X.npy')
+        y_path = os.path.join(workdir, 'y.npy')
+        np.save(X_path, np.ascontiguousarray(X, dtype=np.float64))
+        np.save(y_path, np.asarray(y, dtype=np.float64))
+
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_cv_worker,
+            initargs=(X_path, y_path, fold_of_row)
+        ) as executor:
+            # Keep at most n_workers fits in flight, so the budget check
+            # happens before each new fit starts
+            pending = iter(tasks)
+            running = set()
+            while True:
+                while len(running) < n_workers and (deadline is None or time.perf_counter() < deadline):
+                    task = next(pending, None)
+                    if task is None:
+                        break
+                    running.add(executor.submit(run_fold, task))
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                results.extend(future.result() for future in done)
+    finally:
+        shutil.rmtree(workdir)
+
+    if len(results) < len(tasks):
+        print(f"  Time budget reached: {len(results)} of {len(tasks)} fits completed")
+
+    # Fold order, candidates in their configured order within each fold
+    order = list(candidates)
+    results.sort(key=lambda r: (r['Fold'], order.index(r['Model'])))
+    folds_df = pd.DataFrame(results)
+    if folds_df.empty:
+        return folds_df, None
+
+    # Compare candidates on the same folds: after a budget cut, summarize
+    # only the folds every candidate finished (if there are any)
+    fits_per_fold = folds_df.groupby('Fold')['Model'].transform('size')
+    complete = fits_per_fold == len(candidates)
+    return folds_df, summarize_folds(folds_df[complete] if complete.any() else folds_df)
+
+
+def run_spatial_cv(X, y, lat, lon, candidates=MODEL_CANDIDATES, resolution=None):
+    """Spatial block CV of the candidates, with per-fold and summary CSVs"""
+    print(f"\nSpatial block cross-validation: up to {SPATIAL_CV_FOLDS} folds, "
+          f"{SPATIAL_CV_BLOCK_DEGREES}° blocks ({SPATIAL_CV_WORKERS} workers)...")
+    start = time.perf_counter()
+    folds_df, summary_df = spatial_cross_validate(X, y, lat, lon, candidates)
+    print(f"✓ {len(folds_df)} fits in {time.perf_counter() - start:.1f}s")
+
+    folds_path = resolution_path(SPATIAL_CV_FOLDS_CSV, resolution)
+    summary_path = resolution_path(SPATIAL_CV_SUMMARY_CSV, resolution)
+    folds_df.to_csv(folds_path, index=False)
+    if summary_df is None:
+        print("  No spatial CV fit finished; using the holdout split")
+        print(f"✓ Spatial CV folds saved to: {folds_path}")
+        return folds_df, None
+    summary_df.to_csv(summary_path, index=False)
+
+    for _, row in summary_df.iterrows():
+        print(f"  {row['Model']} ({row['Folds']} folds): "
+              f"Test R² {row['Test_R2']:.4f} ± {row['Test_R2_std']:.4f} | "
+              f"Test RMSE {row['Test_RMSE']:.4f} ± {row['Test_RMSE_std']:.4f}")
+    print(f"✓ Spatial CV results saved to: {folds_path}, {summary_path}")
+    return folds_df, summary_df
@@ -0,0 +1,67 @@
+"""Shared fixtures: a small regular grid and a raster aligned with it"""
+
+import os
+import sys
+
+# Make the pipeline modules importable when run from any directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import geopandas as gpd
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+from shapely.geometry import box
+
+
+# 4 x 3 cells of 0.01°, each covering 4 x 4 pixels of 0.0025°; no pixel
+# centre lies on a cell edge, so every engine assigns pixels the same way
+X0, Y0, CELL, PIXEL = 77.5, 12.9, 0.01, 0.0025
+N_COLS, N_ROWS = 4, 3
+
+
+@pytest.fixture
+def grid_gdf():
+    """Grid with one cell missing, in row-major order from the south-west"""
+    cells = [
+        box(X0 + col * CELL, Y0 + row * CELL, X0 + (col + 1) * CELL, Y0 + (row + 1) * CELL)
+        for row in range(N_ROWS) for col in range(N_COLS)
+    ]
+    del cells[5]
+    return gpd.GeoDataFrame(
+        {'cell_id': np.arange(len(cells)), 'geometry': cells}, crs='EPSG:4326'
+    )
+
+
+def write_raster(path, shift=0.0):
+    """Noisy float32 raster one pixel larger than the grid, with nodata pixels
+
+    ``shift`` moves the raster west and north by that share of a pixel, so
+    the grid edges fall inside pixels.
+    """
+    width = N_COLS * int(round(CELL / PIXEL)) + 2
+    height = N_ROWS * int(round(CELL / PIXEL)) + 2
+    rng = np.random.default_rng(0)
+    data = (30 + 5 * rng.standard_normal((height, width))).astype(np.float32)
+    data[rng.random((height, width)) < 0.1] = -9999
+
+    offset = (1 + shift) * PIXEL
+    transform = from_origin(X0 - offset, Y0 + N_ROWS * CELL + offset, PIXEL, PIXEL)
+    with rasterio.open(
+        path, 'w', driver='GTiff', height=height, width=width, count=1,
+        dtype=data.dtype, crs='EPSG:4326', transform=transform, nodata=-9999
+    ) as dst:
+        dst.write(data, 1)
+    return path
+
+
+@pytest.fixture
+def raster_path(tmp_path):
+    """Raster whose pixels are aligned with the cell edges"""
+    return write_raster(str(tmp_path / 'raster.tif'))
+
+
+@pytest.fixture
+def shifted_raster_path(tmp_path):
+    """Raster shifted by a fraction of a pixel against the cell edges"""
+    return write_raster(str(tmp_path / 'shifted.tif'), shift=0.6)
@@ -0,0 +1,50 @@
+"""Pyramid levels against features extracted directly on the coarse grid"""
+
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import LineString, box
+
+from grid_pyramid import aggregate_level, build_pyramid
+from osm_features import road_density_from_network
+
+from conftest import X0, Y0, CELL
+
+
+def test_road_columns_match_direct_extraction(tmp_path):
+    fine = gpd.GeoDataFrame(
+        {'cell_id': np.arange(16)},
+        geometry=[box(X0 + col * CELL, Y0 + row * CELL, X0 + (col + 1) * CELL, Y0 + (row + 1) * CELL)
+                  for row in range(4) for col in range(4)],
+        crs='EPSG:4326'
+    )
+    # Roads crossing several fine cells of a block, following a fine cell
+    # edge inside a block, and crossing blocks diagonally
+    roads = gpd.GeoDataFrame(
+        {'highway': ['residential', 'primary', 'residential', 'secondary']},
+        geometry=[
+            LineString([(X0 + 0.1 * CELL, Y0 + 0.5 * CELL), (X0 + 1.9 * CELL, Y0 + 0.5 * CELL)]),
+            LineString([(X0 + CELL, Y0 + 2.2 * CELL), (X0 + CELL, Y0 + 3.7 * CELL)]),
+            LineString([(X0 + 0.3 * CELL, Y0 + 0.2 * CELL), (X0 + 3.6 * CELL, Y0 + 3.9 * CELL)]),
+            LineString([(X0 + 3.5 * CELL, Y0 + 0.5 * CELL), (X0 + 2.5 * CELL, Y0 + 1.5 * CELL),
+                        (X0 + 0.5 * CELL, Y0 + 1.5 * CELL)])
+        ],
+        crs='EPSG:4326'
+    )
+    path = str(tmp_path / 'roads.gpkg')
+    roads.to_file(path)
+
+    stats = road_density_from_network(fine, path, count_factors=[2])
+    for col, values in stats.items():
+        fine[col] = values
+    coarse = aggregate_level(fine, 2)
+    direct = road_density_from_network(coarse[['cell_id', 'geometry']], path)
+
+    np.testing.assert_array_equal(coarse['road_count'], direct['road_count'])
+    for col in ['road_length', 'road_length_primary', 'road_length_secondary', 'road_length_residential']:
+        np.testing.assert_allclose(coarse[col], direct[col], rtol=1e-9, atol=1e-6)
+    # Summing fine counts would count edges once per fine cell
+    assert fine['road_count'].sum() > coarse['road_count'].sum()
+
+    # The per-level counts are bookkeeping, not features of any level
+    for level_gdf, _ in build_pyramid(fine, {'fine': 1, 'coarse': 2}).values():
+        assert not any(col.startswith('road_count_x') for col in level_gdf.columns)
@@ -0,0 +1,43 @@
+"""Compact forest artifacts against the sklearn forests they were saved from"""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+
+from model_store import CompactForest, flatten_forest, load_model, save_model
+
+
+FEATURES = ['a', 'b', 'c', 'd']
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.random((300, len(FEATURES)))
+    y = X @ [1.0, -2.0, 0.5, 3.0] + 0.1 * rng.standard_normal(len(X))
+    return X, y
+
+
+@pytest.mark.parametrize('forest', [RandomForestRegressor, ExtraTreesRegressor])
+def test_compact_forest_matches_sklearn(forest, data, tmp_path):
+    X, y = data
+    model = forest(n_estimators=8, max_depth=6, random_state=0).fit(X, y)
+
+    path = str(tmp_path / 'model')
+    save_model(model, path, FEATURES)
+    compact = load_model(path)
+
+    assert isinstance(compact, CompactForest)
+    np.testing.assert_allclose(compact.predict(X), model.predict(X), rtol=1e-12)
+    np.testing.assert_allclose(compact.feature_importances_, model.feature_importances_)
+
+
+def test_compact_forest_chunks(data):
+    X, y = data
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)
+    arrays = flatten_forest(model)
+    compact = CompactForest(arrays, arrays['roots'], FEATURES)
+
+    # Chunks of a few rows must give the same predictions as one pass
+    np.testing.assert_allclose(compact.predict(X, max_pairs=17), model.predict(X), rtol=1e-12)
+    assert len(compact.predict(X[:0])) == 0
@@ -0,0 +1,43 @@
+"""Road network features on grids the lattice path does not handle"""
+
+import geopandas as gpd
+import numpy as np
+import pytest
+from shapely.geometry import LineString, Polygon
+
+from config import METRIC_CRS
+from grid_lattice import detect_lattice
+from osm_features import road_density_from_network
+
+from conftest import X0, Y0, CELL
+
+
+@pytest.fixture
+def triangle_grid():
+    """3 x 3 squares, each split along its diagonal into two triangles"""
+    cells = []
+    for row in range(3):
+        for col in range(3):
+            x, y = X0 + col * CELL, Y0 + row * CELL
+            cells += [Polygon([(x, y), (x + CELL, y), (x + CELL, y + CELL)]),
+                      Polygon([(x, y), (x + CELL, y + CELL), (x, y + CELL)])]
+    return gpd.GeoDataFrame({'cell_id': np.arange(len(cells))}, geometry=cells, crs='EPSG:4326')
+
+
+def test_road_touching_cell_corner(triangle_grid, tmp_path):
+    # Bends on a corner shared by six triangles, touching some only there
+    road = LineString([(X0 + 0.2 * CELL, Y0 + 1.5 * CELL), (X0 + CELL, Y0 + CELL),
+                       (X0 + 2.5 * CELL, Y0 + 0.3 * CELL)])
+    path = str(tmp_path / 'roads.gpkg')
+    gpd.GeoDataFrame({'highway': ['residential']}, geometry=[road], crs='EPSG:4326').to_file(path)
+    assert detect_lattice(triangle_grid) is None
+
+    stats = road_density_from_network(triangle_grid, path)
+
+    cells = triangle_grid.to_crs(METRIC_CRS).geometry
+    road_metric = gpd.GeoSeries([road], crs='EPSG:4326').to_crs(METRIC_CRS).iloc[0]
+    expected = cells.intersection(road_metric).length.to_numpy()
+    np.testing.assert_allclose(stats['road_length'], expected, rtol=1e-6, atol=1e-6)
+    np.testing.assert_allclose(stats['road_length'].sum(), road_metric.length, rtol=1e-9)
+    np.testing.assert_array_equal(stats['road_count'], expected > 0)
+    np.testing.assert_allclose(stats['road_length_residential'], stats['road_length'])
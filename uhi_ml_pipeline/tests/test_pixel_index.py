@@ -0,0 +1,36 @@
+"""Stored cell-to-pixel index against the lattice engine"""
+
+import numpy as np
+import pytest
+import rasterio
+
+from grid_lattice import detect_lattice
+from raster_zonal import lattice_zonal_stats
+from pixel_index import build_pixel_index, index_zonal_stats, zonal_stats_by_index
+
+
+def _assert_same_stats(stats, expected):
+    np.testing.assert_array_equal(stats['count'], expected['count'])
+    np.testing.assert_allclose(stats['mean'], expected['mean'], rtol=1e-9)
+    np.testing.assert_allclose(stats['std'], expected['std'], rtol=1e-6, atol=1e-9)
+
+
+@pytest.mark.parametrize('raster', ['raster_path', 'shifted_raster_path'])
+def test_index_matches_lattice(grid_gdf, raster, request):
+    raster_path = request.getfixturevalue(raster)
+    expected = lattice_zonal_stats(detect_lattice(grid_gdf), raster_path, grid_gdf.crs)
+
+    with rasterio.open(raster_path) as src:
+        index = build_pixel_index(grid_gdf, src)
+        stats = index_zonal_stats(index, {'band': src})['band']
+    _assert_same_stats(stats, expected)
+
+
+def test_stored_index_matches_lattice(grid_gdf, raster_path, tmp_path):
+    expected = lattice_zonal_stats(detect_lattice(grid_gdf), raster_path, grid_gdf.crs)
+    index_dir = str(tmp_path / 'pixel_index')
+
+    # First call builds and stores the index, the second loads it
+    for _ in range(2):
+        stats = zonal_stats_by_index(grid_gdf, {'band': raster_path}, index_dir=index_dir)['band']
+        _assert_same_stats(stats, expected)
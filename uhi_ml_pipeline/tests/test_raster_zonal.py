@@ -0,0 +1,33 @@
+"""Lattice zonal statistics engines against rasterstats and each other"""
+
+import numpy as np
+import pytest
+from rasterstats import zonal_stats
+
+from grid_lattice import detect_lattice
+from raster_zonal import lattice_zonal_stats, stream_zonal_stats
+
+
+def test_lattice_matches_rasterstats(grid_gdf, raster_path):
+    lattice = detect_lattice(grid_gdf)
+    assert lattice is not None
+
+    stats = lattice_zonal_stats(lattice, raster_path, grid_gdf.crs)
+    expected = zonal_stats(grid_gdf, raster_path, stats=['mean', 'std', 'count'], nodata=-9999)
+
+    np.testing.assert_array_equal(stats['count'], [s['count'] for s in expected])
+    np.testing.assert_allclose(stats['mean'], [s['mean'] for s in expected], rtol=1e-6)
+    np.testing.assert_allclose(stats['std'], [s['std'] for s in expected], rtol=1e-5)
+
+
+@pytest.mark.parametrize('raster', ['raster_path', 'shifted_raster_path'])
+@pytest.mark.parametrize('window_size', [None, 5])
+def test_stream_matches_lattice(grid_gdf, raster, window_size, request):
+    path = request.getfixturevalue(raster)
+    lattice = detect_lattice(grid_gdf)
+    expected = lattice_zonal_stats(lattice, path, grid_gdf.crs)
+
+    stats = stream_zonal_stats(lattice, {'band': path}, grid_gdf.crs, window_size=window_size)['band']
+    np.testing.assert_array_equal(stats['count'], expected['count'])
+    np.testing.assert_allclose(stats['mean'], expected['mean'], rtol=1e-9)
+    np.testing.assert_allclose(stats['std'], expected['std'], rtol=1e-6, atol=1e-9)
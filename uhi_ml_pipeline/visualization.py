@@ -1,36 +1,74 @@
-"""Visualization module: Generate UHI intensity maps"""
+"""Visualization module: Generate UHI intensity maps
 
+Prediction and rendering are separate steps: predict_uhi scores every cell
+with the best model and stores the predictions, create_visualizations
+draws the maps from the stored predictions without loading the model.
+matplotlib and folium are imported by the functions that draw.
+"""
+
+import os
 import geopandas as gpd
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
-from matplotlib.patches import Patch
-import folium
-from folium import plugins
-import joblib
+import shapely
 import warnings
 warnings.filterwarnings('ignore')
 
 from config import (
-    FEATURES_CSV,
+    FEATURES_PARQUET,
+    PREDICTIONS_FEATHER,
+    MODEL_FEATURES,
+    TARGET_COLUMN,
     OUTPUT_DIR,
     UHI_HEATMAP_PNG,
-    UHI_INTERACTIVE_MAP
+    UHI_INTERACTIVE_MAP,
+    STATIC_HEATMAP_MODE,
+    STATIC_HEATMAP_EDGES,
+    MAP_COORD_PRECISION,
+    MAP_COLOR_STEPS,
+    EXPORT_MAP_TILES,
+    MAP_USE_TILES,
+    UHI_TILES_DIR,
+    TILE_ZOOM_LEVELS,
+    TILE_WORKERS
 )
+from artifacts import read_geoparquet, write_model_matrix, read_model_matrix, resolution_path
+from map_tiles import export_tiles
+from model_store import load_model, best_model_path
+from grid_lattice import detect_lattice
+from instrumentation import measure
+
+
+# Colormap for all UHI maps (blue=cool, red=hot)
+UHI_CMAP = 'RdYlBu_r'
+
+# Stored per cell by predict_uhi
+PREDICTION_COLUMNS = ['cell_id', 'LST_predicted', 'UHI_intensity']
+
+# Feature columns the maps show besides the predictions (popups)
+MAP_COLUMNS = ['cell_id', 'NDVI_mean', 'building_count', 'road_count']
 
 
-def load_data_and_model():
+def get_colormap(cmap=UHI_CMAP):
+    """matplotlib colormap from a colormap or its name"""
+    if isinstance(cmap, str):
+        import matplotlib
+        return matplotlib.colormaps[cmap]
+    return cmap
+
+
+def load_data_and_model(resolution=None):
     """Load features with geometry and trained model"""
     print("Loading data and model...")
     
-    # Load features with geometry
-    features_geojson = FEATURES_CSV.replace('.csv', '.geojson')
-    gdf = gpd.read_file(features_geojson)
+    # Load features with geometry (only the columns the maps use)
+    gdf = read_geoparquet(
+        resolution_path(FEATURES_PARQUET, resolution),
+        columns=['cell_id', TARGET_COLUMN] + MODEL_FEATURES
+    )
     
     # Load best model
-    model_path = f"{OUTPUT_DIR}/best_model.pkl"
-    model = joblib.load(model_path)
+    model = load_model(best_model_path(resolution))
     
     print(f"✓ Loaded {len(gdf)} grid cells and trained model")
     
@@ -41,13 +79,8 @@ def make_predictions(gdf, model):
     """Make UHI predictions for all grid cells"""
     print("Making UHI predictions...")
     
-    # Define feature columns (same as in training)
-    feature_cols = [
-        'NDVI_mean', 'NDVI_std',
-        'building_count', 'building_area',
-        'road_count', 'road_length',
-        'impervious_surface_proxy', 'vegetation_cover_proxy'
-    ]
+    # Feature columns (same as in training)
+    feature_cols = MODEL_FEATURES
     
     # Prepare features
     X = gdf[feature_cols].fillna(gdf[feature_cols].mean())
@@ -66,30 +99,122 @@ def make_predictions(gdf, model):
     return gdf
 
 
-def create_static_heatmap(gdf):
-    """Create static heatmap using matplotlib"""
+def save_predictions(gdf, path=PREDICTIONS_FEATHER):
+    """Write the per-cell predictions as Feather"""
+    write_model_matrix(pd.DataFrame(gdf[PREDICTION_COLUMNS]), path)
+    print(f"✓ Predictions saved to: {path}")
+
+
+def load_predictions(resolution=None):
+    """Cell geometries and map columns joined with the stored predictions"""
+    print("Loading predictions...")
+    gdf = read_geoparquet(resolution_path(FEATURES_PARQUET, resolution), columns=MAP_COLUMNS)
+    predictions = read_model_matrix(resolution_path(PREDICTIONS_FEATHER, resolution))
+    gdf = gdf.merge(predictions, on='cell_id', how='left')
+    print(f"✓ Loaded predictions for {len(gdf)} grid cells")
+    return gdf
+
+
+def _plot_cells_raster(gdf, lattice, ax, cmap, edges=False):
+    """Draw cell values as one image on the grid lattice
+    
+    Values are scattered into a (row, col) array and drawn with a single
+    imshow over the grid's geographic extent, so drawing time barely
+    depends on the number of cells. ``edges`` overlays the cell outlines.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+    
+    image = np.full((lattice.n_rows, lattice.n_cols), np.nan)
+    image[lattice.rows, lattice.cols] = gdf['UHI_intensity'].to_numpy(dtype=float)
+    
+    x1 = lattice.x0 + lattice.n_cols * lattice.cell_size
+    y1 = lattice.y0 + lattice.n_rows * lattice.cell_size
+    im = ax.imshow(
+        np.ma.masked_invalid(image),
+        cmap=cmap,
+        origin='lower',  # row 0 is the southernmost row
+        extent=(lattice.x0, x1, lattice.y0, y1),
+        interpolation='nearest',
+        alpha=0.8
+    )
+    
+    if edges:
+        # Unique cell edges as one line collection
+        size = lattice.cell_size
+        horizontal = np.unique(np.concatenate([
+            np.stack([lattice.rows, lattice.cols], axis=1),
+            np.stack([lattice.rows + 1, lattice.cols], axis=1)
+        ]), axis=0)
+        vertical = np.unique(np.concatenate([
+            np.stack([lattice.rows, lattice.cols], axis=1),
+            np.stack([lattice.rows, lattice.cols + 1], axis=1)
+        ]), axis=0)
+        hx = lattice.x0 + horizontal[:, 1] * size
+        hy = lattice.y0 + horizontal[:, 0] * size
+        vx = lattice.x0 + vertical[:, 1] * size
+        vy = lattice.y0 + vertical[:, 0] * size
+        segments = np.concatenate([
+            np.stack([np.stack([hx, hy], 1), np.stack([hx + size, hy], 1)], axis=1),
+            np.stack([np.stack([vx, vy], 1), np.stack([vx, vy + size], 1)], axis=1)
+        ])
+        ax.add_collection(LineCollection(segments, colors='gray', linewidths=0.2))
+    
+    # Same limits and aspect geopandas uses for geographic coordinates
+    mx = (x1 - lattice.x0) * plt.rcParams['axes.xmargin']
+    my = (y1 - lattice.y0) * plt.rcParams['axes.ymargin']
+    ax.set_xlim(lattice.x0 - mx, x1 + mx)
+    ax.set_ylim(lattice.y0 - my, y1 + my)
+    ax.set_aspect(1 / np.cos(np.radians((lattice.y0 + y1) / 2)))
+    
+    # Opaque colorbar, like the polygon legend
+    plt.colorbar(
+        plt.cm.ScalarMappable(norm=im.norm, cmap=cmap), ax=ax,
+        label='Land Surface Temperature (°C)', orientation='vertical', shrink=0.7
+    )
+
+
+def create_static_heatmap(gdf, output_path=UHI_HEATMAP_PNG,
+                          mode=STATIC_HEATMAP_MODE, edges=STATIC_HEATMAP_EDGES):
+    """Create static heatmap using matplotlib
+    
+    ``mode='raster'`` draws the regular grid as a single image, 'polygons'
+    draws every cell as a patch; 'auto' uses the raster mode when the grid
+    is a regular lattice. ``edges`` outlines the cells in raster mode
+    (polygons always have outlines).
+    """
     print("\nCreating static heatmap...")
+    import matplotlib.pyplot as plt
     
     fig, ax = plt.subplots(figsize=(14, 10))
     
     # Define colormap (blue=cool, red=hot)
-    cmap = plt.cm.RdYlBu_r
+    cmap = get_colormap()
     
-    # Plot
-    gdf.plot(
-        column='UHI_intensity',
-        cmap=cmap,
-        linewidth=0.2,
-        edgecolor='gray',
-        alpha=0.8,
-        legend=True,
-        legend_kwds={
-            'label': 'Land Surface Temperature (°C)',
-            'orientation': 'vertical',
-            'shrink': 0.7
-        },
-        ax=ax
-    )
+    if mode not in ('auto', 'raster', 'polygons'):
+        raise ValueError(f"Unknown static heatmap mode: {mode}")
+    lattice = detect_lattice(gdf) if mode != 'polygons' else None
+    if mode == 'raster' and lattice is None:
+        raise ValueError("Grid is not a regular lattice; use mode='polygons'")
+    
+    if lattice is not None:
+        _plot_cells_raster(gdf, lattice, ax, cmap, edges=edges)
+    else:
+        # Plot
+        gdf.plot(
+            column='UHI_intensity',
+            cmap=cmap,
+            linewidth=0.2,
+            edgecolor='gray',
+            alpha=0.8,
+            legend=True,
+            legend_kwds={
+                'label': 'Land Surface Temperature (°C)',
+                'orientation': 'vertical',
+                'shrink': 0.7
+            },
+            ax=ax
+        )
     
     # Styling
     ax.set_title(
@@ -119,18 +244,113 @@ def create_static_heatmap(gdf):
     )
     
     plt.tight_layout()
-    plt.savefig(UHI_HEATMAP_PNG, dpi=300, bbox_inches='tight')
-    print(f"✓ Static heatmap saved to: {UHI_HEATMAP_PNG}")
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    print(f"✓ Static heatmap saved to: {output_path}")
     plt.close()
 
 
-def create_interactive_map(gdf):
-    """Create interactive HTML map using folium"""
+def color_index(values, vmin, vmax, steps=MAP_COLOR_STEPS):
+    """Bin values into ``steps`` colormap entries, like matplotlib's lookup
+    
+    With ``steps`` equal to the colormap size the colors are identical to
+    calling the colormap on normalized values.
+    """
+    if vmax > vmin:
+        norm = (np.asarray(values, dtype=float) - vmin) / (vmax - vmin)
+    else:
+        norm = np.full(len(values), 0.5)
+    idx = np.floor(np.nan_to_num(norm, nan=0.5) * steps).astype(np.int64)
+    return np.clip(idx, 0, steps - 1)
+
+
+def colormap_lut(cmap=UHI_CMAP, steps=MAP_COLOR_STEPS):
+    """RGBA colors (floats in 0-1) sampled at the centre of each bin"""
+    return get_colormap(cmap)((np.arange(steps) + 0.5) / steps)
+
+
+def color_lookup(values, vmin, vmax, cmap=UHI_CMAP, steps=MAP_COLOR_STEPS):
+    """Map values to hex colors through a precomputed colormap lookup table"""
+    import matplotlib.colors as mcolors
+    lut = np.array([mcolors.rgb2hex(rgba) for rgba in colormap_lut(cmap, steps)])
+    return lut[color_index(values, vmin, vmax, steps)]
+
+
+def round_coordinates(geometries, precision=MAP_COORD_PRECISION):
+    """Round all vertex coordinates to ``precision`` decimals"""
+    return shapely.transform(np.asarray(geometries), lambda coords: np.round(coords, precision))
+
+
+def _add_cell_layer(m, gdf, min_uhi, max_uhi):
+    """Add all grid cells to the map as one GeoJSON layer with popups"""
+    import folium
+    
+    # Popup fields, rounded for display and a smaller file
+    cells = gpd.GeoDataFrame(
+        {
+            'cell_id': gdf['cell_id'] if 'cell_id' in gdf.columns else gdf.index,
+            'lst': gdf['UHI_intensity'].round(2),
+            'ndvi': gdf['NDVI_mean'].round(3),
+            'buildings': gdf['building_count'].round().astype('Int64'),
+            'roads': gdf['road_count'].round().astype('Int64'),
+            'fill': color_lookup(gdf['UHI_intensity'], min_uhi, max_uhi)
+        },
+        geometry=round_coordinates(gdf.geometry.values),
+        crs=gdf.crs
+    ).reset_index(drop=True)
+    
+    folium.GeoJson(
+        cells.to_json(na='null'),
+        name='UHI intensity',
+        style_function=lambda feature: {
+            'fillColor': feature['properties']['fill'],
+            'color': 'gray',
+            'weight': 0.5,
+            'fillOpacity': 0.7
+        },
+        popup=folium.GeoJsonPopup(
+            fields=['cell_id', 'lst', 'ndvi', 'buildings', 'roads'],
+            aliases=['Cell ID:', 'LST (°C):', 'NDVI:', 'Buildings:', 'Roads:'],
+            style='font-family: Arial; font-size: 12px;',
+            max_width=300
+        )
+    ).add_to(m)
+
+
+def create_map_tiles(gdf, tiles_dir=UHI_TILES_DIR):
+    """Render UHI intensity into an XYZ PNG tile pyramid
+    
+    Tiles whose cells kept their colors since the last run are skipped.
+    """
+    print("\nRendering map tiles...")
+    
+    idx = color_index(gdf['UHI_intensity'], gdf['UHI_intensity'].min(), gdf['UHI_intensity'].max())
+    lut = np.round(colormap_lut() * 255).astype(np.uint8)
+    
+    rendered, skipped = export_tiles(
+        gdf, idx, lut, tiles_dir, TILE_ZOOM_LEVELS, n_workers=TILE_WORKERS
+    )
+    print(f"✓ Map tiles saved to: {tiles_dir}")
+    print(f"  Zoom levels {min(TILE_ZOOM_LEVELS)}-{max(TILE_ZOOM_LEVELS)}: "
+          f"{rendered} tiles rendered, {skipped} unchanged")
+
+
+def create_interactive_map(gdf, output_path=UHI_INTERACTIVE_MAP, tiles_dir=None):
+    """Create interactive HTML map using folium
+    
+    All cells go into a single GeoJSON layer. Fill colors come from a
+    colormap lookup table and are stored as a feature property; popups use
+    one shared template over the feature properties.
+    
+    With ``tiles_dir``, the map loads the pre-rendered tile pyramid from
+    that directory instead, so its size does not grow with the grid.
+    """
     print("\nCreating interactive map...")
+    import folium
     
     # Calculate center
-    center_lat = gdf.geometry.centroid.y.mean()
-    center_lon = gdf.geometry.centroid.x.mean()
+    minx, miny, maxx, maxy = gdf.total_bounds
+    center_lat = (miny + maxy) / 2
+    center_lon = (minx + maxx) / 2
     
     # Create map
     m = folium.Map(
@@ -139,48 +359,24 @@ def create_interactive_map(gdf):
         tiles='OpenStreetMap'
     )
     
-    # Normalize UHI intensity for color mapping
+    # Normalize UHI intensity for color mapping (blue=cool, red=hot)
     min_uhi = gdf['UHI_intensity'].min()
     max_uhi = gdf['UHI_intensity'].max()
     
-    # Define color function
-    def get_color(uhi_value):
-        """Map UHI intensity to color"""
-        # Normalize to 0-1
-        norm_value = (uhi_value - min_uhi) / (max_uhi - min_uhi) if max_uhi > min_uhi else 0.5
-        
-        # Use RdYlBu_r colormap (blue=cool, red=hot)
-        cmap = plt.cm.RdYlBu_r
-        rgba = cmap(norm_value)
-        
-        # Convert to hex
-        hex_color = mcolors.rgb2hex(rgba)
-        return hex_color
-    
-    # Add grid cells to map
-    for idx, row in gdf.iterrows():
-        # Create popup with information
-        popup_html = f"""
-        <div style="font-family: Arial; font-size: 12px;">
-            <b>Cell ID:</b> {row.get('cell_id', idx)}<br>
-            <b>LST:</b> {row['UHI_intensity']:.2f}°C<br>
-            <b>NDVI:</b> {row['NDVI_mean']:.3f}<br>
-            <b>Buildings:</b> {row['building_count']:.0f}<br>
-            <b>Roads:</b> {row['road_count']:.0f}<br>
-        </div>
-        """
-        
-        # Add polygon
-        folium.GeoJson(
-            row.geometry,
-            style_function=lambda x, color=get_color(row['UHI_intensity']): {
-                'fillColor': color,
-                'color': 'gray',
-                'weight': 0.5,
-                'fillOpacity': 0.7
-            },
-            popup=folium.Popup(popup_html, max_width=300)
+    if tiles_dir is not None:
+        # Tile URLs are relative, so the HTML and tiles can be moved together
+        tiles_url = os.path.relpath(tiles_dir, os.path.dirname(os.path.abspath(output_path)))
+        folium.TileLayer(
+            tiles=tiles_url.replace(os.sep, '/') + '/{z}/{x}/{y}.png',
+            attr='UHI intensity',
+            name='UHI intensity',
+            overlay=True,
+            opacity=0.7,
+            min_zoom=min(TILE_ZOOM_LEVELS),
+            max_native_zoom=max(TILE_ZOOM_LEVELS)
         ).add_to(m)
+    else:
+        _add_cell_layer(m, gdf, min_uhi, max_uhi)
     
     # Add title
     title_html = '''
@@ -195,28 +391,72 @@ def create_interactive_map(gdf):
     m.get_root().html.add_child(folium.Element(title_html))
     
     # Save map
-    m.save(UHI_INTERACTIVE_MAP)
-    print(f"✓ Interactive map saved to: {UHI_INTERACTIVE_MAP}")
+    m.save(output_path)
+    print(f"✓ Interactive map saved to: {output_path}")
     print(f"  Open this file in a web browser to explore the map")
 
 
-def create_visualizations():
-    """Main function to create all visualizations"""
+def predict_uhi(resolution=None):
+    """Predict UHI intensity for every grid cell and store the predictions
+    
+    ``resolution`` selects a grid pyramid level (None = single-resolution
+    artifacts).
+    """
     print("=" * 60)
-    print("PHASE 4: VISUALIZATION")
+    print("PHASE 4: PREDICTION")
+    if resolution is not None:
+        print(f"Resolution: {resolution}")
     print("=" * 60)
     
     # Load data and model
-    gdf, model = load_data_and_model()
+    with measure('load_data_and_model') as step:
+        gdf, model = load_data_and_model(resolution)
+        step['rows'] = len(gdf)
     
     # Make predictions
-    gdf = make_predictions(gdf, model)
+    with measure('predict', rows=len(gdf)):
+        gdf = make_predictions(gdf, model)
+    
+    with measure('save_predictions', rows=len(gdf)):
+        save_predictions(gdf, resolution_path(PREDICTIONS_FEATHER, resolution))
+    
+    return gdf
+
+
+def create_visualizations(resolution=None):
+    """Main function to create all visualizations from the stored predictions
+    
+    ``resolution`` selects a grid pyramid level (None = single-resolution
+    artifacts).
+    """
+    print("=" * 60)
+    print("PHASE 5: VISUALIZATION")
+    if resolution is not None:
+        print(f"Resolution: {resolution}")
+    print("=" * 60)
+    
+    # Load cells and predictions
+    with measure('load_predictions') as step:
+        gdf = load_predictions(resolution)
+        step['rows'] = len(gdf)
     
     # Create static heatmap
-    create_static_heatmap(gdf)
+    with measure('render:static_heatmap', rows=len(gdf)):
+        create_static_heatmap(gdf, resolution_path(UHI_HEATMAP_PNG, resolution))
+    
+    # Render tile pyramid
+    tiles_dir = resolution_path(UHI_TILES_DIR, resolution)
+    if EXPORT_MAP_TILES:
+        with measure('render:map_tiles', rows=len(gdf)):
+            create_map_tiles(gdf, tiles_dir)
     
     # Create interactive map
-    create_interactive_map(gdf)
+    with measure('render:interactive_map', rows=len(gdf)):
+        create_interactive_map(
+            gdf,
+            resolution_path(UHI_INTERACTIVE_MAP, resolution),
+            tiles_dir=tiles_dir if EXPORT_MAP_TILES and MAP_USE_TILES else None
+        )
     
     print("\n✓ All visualizations created successfully!\n")
     
@@ -224,4 +464,5 @@ def create_visualizations():
 
 
 if __name__ == "__main__":
+    predict_uhi()
     gdf = create_visualizations()